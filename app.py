@@ -1,12 +1,21 @@
 from flask import Flask, session
 from flask_session import Session
+import logging
 import os
 from app.routes.main_routes import main
 from app.routes.stock_routes import stock_bp
+from app.routes.metrics_routes import metrics_bp
+from app.utils.market_data import use_market_data_endpoint
 from datetime import timedelta
 
 def create_app():
     """Create and configure the Flask application."""
+    # Diagnostics go through logging; LOG_LEVEL=DEBUG restores the verbose traces
+    logging.basicConfig(
+        level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+
     app = Flask(__name__, 
                 template_folder='app/templates',
                 static_folder='app/static')
@@ -23,6 +32,10 @@ def create_app():
         os.makedirs(session_dir)
     
     Session(app)
+
+    # Point yfinance at a stub market-data server (load tests)
+    if os.environ.get('MARKET_DATA_URL'):
+        use_market_data_endpoint(os.environ['MARKET_DATA_URL'])
     
     # Add custom filters for Indian number formatting
     @app.template_filter('indian_currency')
@@ -71,6 +84,7 @@ def create_app():
     # Register blueprints
     app.register_blueprint(main)
     app.register_blueprint(stock_bp)
+    app.register_blueprint(metrics_bp)
     
     return app
 
@@ -1,3 +1,4 @@
+import logging
 import json
 import numpy as np
 import pandas as pd
@@ -6,6 +7,10 @@ from flask import Blueprint, render_template, jsonify
 from ..utils.portfolio_analytics import PortfolioAnalytics
 from ..utils.data_store import portfolio_store
 from ..utils.performance_analytics import PerformanceAnalytics
+from ..utils.batch_analytics import BatchAnalytics
+from ..utils.value_snapshots import snapshot_store
+
+logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__, template_folder='../templates')
 
@@ -106,10 +111,24 @@ def portfolio():
                 'largest_holding_pct': float((portfolio_df['value'].max() / total_value) * 100)
             })
         
+        # Value actually held over time; written at most once per trading day
+        try:
+            snapshot_store.refresh(portfolio_store.portfolio_id, portfolio_df)
+            snapshots = snapshot_store.get_series(portfolio_store.portfolio_id)
+        except Exception as e:
+            logger.error(f"Snapshot update error: {e}")
+            snapshots = {'index': [], 'values': [], 'flows': [], 'twr': []}
+        
         # Get performance data with safe conversion
         try:
-            perf = PerformanceAnalytics()
-            raw_performance = perf.get_portfolio_returns(portfolio_df)
+            # Prefer the stored snapshots, then results precomputed by the offline batch job;
+            # the full valuation only runs until a portfolio has two days of snapshots
+            raw_performance = PerformanceAnalytics().get_snapshot_returns(snapshots)
+            if raw_performance is None:
+                raw_performance = BatchAnalytics().load_result(portfolio_df)
+            if raw_performance is None:
+                perf = PerformanceAnalytics()
+                raw_performance = perf.get_portfolio_returns(portfolio_df)
             
             # Ensure all values are JSON serializable
             performance_data = {
@@ -130,10 +149,11 @@ def portfolio():
                     'var_99_percent': float(raw_performance['metrics'].get('var_99_percent', 0)),
                     'var_99_value': float(raw_performance['metrics'].get('var_99_value', 0)),
                     'correlation': float(raw_performance['metrics'].get('correlation', 0))
-                }
+                },
+                'stale_symbols': [str(s) for s in raw_performance.get('stale_symbols', [])]
             }
         except Exception as e:
-            print(f"Performance calculation error: {e}")
+            logger.error(f"Performance calculation error: {e}")
             performance_data = {
                 'portfolio_hist': {'index': [], 'values': []},
                 'benchmark_hist': {'index': [], 'values': []},
@@ -146,9 +166,13 @@ def portfolio():
                     'var_99_percent': 0.0,
                     'var_99_value': 0.0,
                     'correlation': 0.0
-                }
+                },
+                'stale_symbols': []
             }
         
+        performance_data['snapshot_hist'] = snapshots
+        performance_data['metrics']['time_weighted_return'] = float(snapshots['twr'][-1]) if snapshots['twr'] else 0.0
+        
         # Convert portfolio to list of dicts with safe conversion
         portfolio_list = []
         if not portfolio_df.empty:
@@ -170,7 +194,7 @@ def portfolio():
                     }
                     portfolio_list.append(portfolio_item)
                 except Exception as e:
-                    print(f"Error converting row {idx}: {e}")
+                    logger.warning(f"Error converting row {idx}: {e}")
                     continue
         
         # Convert everything to basic Python types (not strings) for JSON safety
@@ -212,9 +236,9 @@ def portfolio():
                 'portfolio': portfolio_safe,
                 'performance': performance_safe
             })
-            print("JSON serialization successful!")
+            logger.debug("JSON serialization successful!")
         except Exception as e:
-            print(f"Still failing JSON serialization: {e}")
+            logger.warning(f"Still failing JSON serialization: {e}")
             # Fallback to string conversion
             analytics_safe = {k: str(v) for k, v in analytics.items()}
             portfolio_safe = [{k: str(v) for k, v in item.items()} for item in portfolio_list]
@@ -238,9 +262,7 @@ def portfolio():
         )
         
     except Exception as e:
-        print(f"Portfolio error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Portfolio error: {str(e)}", exc_info=True)
         
         # Return safe default values
         return render_template(
@@ -278,6 +300,10 @@ def analysis():
 def risk_metrics():
     return render_template('risk_metrics.html')
 
+@main.route('/strategies')
+def strategies():
+    return render_template('strategies.html')
+
 @main.route('/broad_market')
 def broad_market():
     return render_template('broad_market.html')
@@ -0,0 +1,37 @@
+import time
+from flask import Blueprint, Response, g, request, before_render_template, template_rendered
+from ..utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    """Stamp the request start for latency histograms"""
+    g.request_start = time.perf_counter()
+
+@metrics_bp.after_app_request
+def record_request_latency(response):
+    """Record route latency keyed by the URL rule, not the raw path"""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        route=route, method=request.method, status=response.status_code)
+    return response
+
+def _start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+def _record_render_time(sender, template, context, **extra):
+    start = g.pop('render_start', None)
+    if start is not None:
+        metrics.observe('template_render_seconds', time.perf_counter() - start,
+                        template=template.name or 'inline')
+
+before_render_template.connect(_start_render_timer)
+template_rendered.connect(_record_render_time)
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Expose collected metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,13 +1,30 @@
-from flask import Blueprint, jsonify, request, session, send_file
-from ..utils.data_store import portfolio_store
+from flask import Blueprint, Response, current_app, jsonify, request, session, send_file, stream_with_context
+from ..utils.data_store import LedgerSyncError, portfolio_store
 from ..utils.stock import get_current_price, get_stock_with_benchmark_fallback
 from ..utils.performance_analytics import PerformanceAnalytics
-import yfinance as yf
+from ..utils.risk_engine import RiskEngine, risk_engine
+from ..utils.rolling_metrics import RollingMetrics
+from ..utils.risk_attribution import RiskAttribution
+from ..utils.market_data import UpstreamUnavailableError, fetch_history
+from ..utils.symbol_metadata import symbol_metadata
+from ..utils.fx import fx_service
+from ..utils.symbol_index import symbol_index
+from ..utils.upstream import upstream_executor
+from ..utils.quote_table import quote_table
+from ..utils.price_cache import price_cache
+from ..utils.http_cache import conditional, content_etag
+from ..utils.value_snapshots import snapshot_store
+from ..utils.ledger import COST_METHODS, ledger
+from ..utils.return_table import ReturnTable, return_table
+from ..utils.screener import SIGNAL_COLUMNS, screener
+from ..utils.broad_market import INDEX_SOURCES, broad_market
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
+import math
 import os
 import io
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -18,164 +35,574 @@ def load_portfolio():
     """Load portfolio data before each request"""
     portfolio_store.load_from_session()
 
-@stock_bp.route('/stock/<symbol>', methods=['GET'])
-def get_stock_data(symbol):
-    try:
-        # Use enhanced stock data fetching with benchmark fallback
-        stock_data_enhanced = get_stock_with_benchmark_fallback(symbol.upper())
-        
-        # Create Ticker object for additional info
-        stock = yf.Ticker(symbol.upper())
-        
-        try:
-            # Get current price from enhanced data if available
-            if not stock_data_enhanced.empty:
-                current_price = float(stock_data_enhanced['Close'].iloc[-1])
-                hist = stock_data_enhanced
-            else:
-                # Fallback to original method
-                hist = stock.history(period='2d')
-                if hist.empty:
-                    raise ValueError("No historical data available")
-                current_price = float(hist['Close'].iloc[-1])
-                
-        except Exception as e:
-            logger.error(f"Error fetching history for {symbol}: {e}")
-            return jsonify({'error': f'Failed to fetch data for {symbol}'}), 404
+def build_stock_data(symbol, hist, metadata, enhanced, stale=False, quantity=0):
+    """Build the /api/stock response from price history and symbol metadata"""
+    current_price = float(hist['Close'].iloc[-1])
+    currency = metadata['currency']
+    
+    # Convert the whole history to INR, each day at that day's rate
+    closes = fx_service.convert_history(hist['Close'], currency)
+    price_in_inr = float(closes.iloc[-1])
+    if currency != 'INR':
+        logger.debug(f"Converting {current_price} {currency} to {price_in_inr} INR")
 
-        # Get additional info
-        info = stock.info
-        currency = info.get('currency', 'USD')
-        
-        # Convert to INR if necessary
-        price_in_inr = current_price
-        if currency == 'USD':
-            usd_to_inr = 83.0  # You might want to fetch real-time forex rates
-            price_in_inr = current_price * usd_to_inr
-            logger.debug(f"Converting {current_price} USD to {price_in_inr} INR")
-
-        # Calculate returns using enhanced historical data
-        day_return = 0
-        year_return = 0
-
-        # Calculate 1-day return
-        if len(hist) >= 2:
-            try:
-                yesterday_close = float(hist['Close'].iloc[-2])
-                if currency == 'USD':
-                    yesterday_close *= usd_to_inr
-                day_return = ((price_in_inr - yesterday_close) / yesterday_close) * 100
-                logger.debug(f"Day return calculation: {day_return}%")
-            except Exception as e:
-                logger.error(f"Error calculating day return: {e}")
-
-        # Calculate 1-year return using enhanced data
+    # Calculate returns using enhanced historical data
+    day_return = 0
+    year_return = 0
+
+    # Calculate 1-day return
+    if len(closes) >= 2:
         try:
-            if len(hist) >= 252:  # At least 1 year of trading days
-                year_ago_price = float(hist['Close'].iloc[-252])
-            else:
-                year_ago_price = float(hist['Close'].iloc[0])
-                
-            if currency == 'USD':
-                year_ago_price *= usd_to_inr
-            year_return = ((price_in_inr - year_ago_price) / year_ago_price) * 100
-            logger.debug(f"Year return calculation: {year_return}%")
+            yesterday_close = float(closes.iloc[-2])
+            day_return = ((price_in_inr - yesterday_close) / yesterday_close) * 100
+            logger.debug(f"Day return calculation: {day_return}%")
         except Exception as e:
-            logger.error(f"Error calculating year return: {e}")
-
-        # Create response data
-        stock_data = {
-            'symbol': symbol,
-            'price': round(float(price_in_inr), 2),
-            'originalPrice': round(float(current_price), 2),
-            'originalCurrency': currency,
-            'dayReturn': round(float(day_return), 2),
-            'yearReturn': round(float(year_return), 2),
-            'name': info.get('longName', symbol),
-            'currency': 'INR',
-            'quantity': int(request.args.get('quantity', 0)),
-            'dataQuality': 'enhanced' if not stock_data_enhanced.empty else 'basic'
+            logger.error(f"Error calculating day return: {e}")
+
+    # Calculate 1-year return using enhanced data
+    try:
+        if len(closes) >= 252:  # At least 1 year of trading days
+            year_ago_price = float(closes.iloc[-252])
+        else:
+            year_ago_price = float(closes.iloc[0])
+            
+        year_return = ((price_in_inr - year_ago_price) / year_ago_price) * 100
+        logger.debug(f"Year return calculation: {year_return}%")
+    except Exception as e:
+        logger.error(f"Error calculating year return: {e}")
+
+    # Horizon returns from the symbol's own closes; back-filled proxy prices would invent 1Y/3Y/5Y returns
+    returns = return_table.get(symbol, currency) if enhanced else ReturnTable.compute(closes)
+
+    # Create response data
+    stock_data = {
+        'symbol': symbol,
+        'price': round(float(price_in_inr), 2),
+        'originalPrice': round(float(current_price), 2),
+        'originalCurrency': currency,
+        'dayReturn': round(float(day_return), 2),
+        'yearReturn': round(float(year_return), 2),
+        'returns': {h: (round(r, 2) if r is not None else None) for h, r in returns.items()},
+        'name': metadata['name'],
+        'currency': 'INR',
+        'quantity': quantity,
+        'dataQuality': 'enhanced' if enhanced else 'basic',
+        'stale': bool(stale)
+    }
+
+    return stock_data
+
+def current_price_inr(symbol):
+    """Latest quote converted to INR, as holdings and ledger lots are stored, or None without a quote"""
+    price = get_current_price(symbol)
+    if price is None:
+        return None
+    portfolio = portfolio_store.get_portfolio()
+    stored = portfolio.loc[portfolio['symbol'] == symbol, 'quote_currency'] if not portfolio.empty else []
+    currency = fx_service.holding_currency(symbol, stored.iloc[0] if len(stored) else None)
+    return price * fx_service.get_rate(currency)
+
+def reject_unknown_symbol(symbol):
+    """404 response for symbols not worth an upstream fetch, or None if the symbol may be valid"""
+    if symbol_index.validate(symbol.upper()):
+        return None
+    return jsonify({
+        'error': f'Unknown symbol {symbol}',
+        'suggestions': symbol_index.suggest(symbol)
+    }), 404
+
+def upstream_unavailable(symbol):
+    """503 response for when the market data provider cannot be reached"""
+    logger.warning(f"Market data provider unavailable while fetching {symbol}")
+    return jsonify({'error': 'Market data is temporarily unavailable, please try again shortly'}), 503
+
+@stock_bp.route('/symbols', methods=['GET'])
+def search_symbols():
+    """Autocomplete symbols from the local listing index"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify({'query': query, 'results': symbol_index.search(query, limit)})
+
+@stock_bp.route('/screener', methods=['GET'])
+def screen_universe():
+    """Filter and sort the universe on precomputed signals, e.g. ?min_rsi=30&max_rsi=70&sort=momentum"""
+    sort = request.args.get('sort', 'momentum')
+    if sort not in SIGNAL_COLUMNS:
+        return jsonify({'error': f'Sort must be one of {", ".join(SIGNAL_COLUMNS)}'}), 400
+    try:
+        filters = {
+            column: (request.args.get(f'min_{column}', type=float), request.args.get(f'max_{column}', type=float))
+            for column in SIGNAL_COLUMNS
+            if f'min_{column}' in request.args or f'max_{column}' in request.args
         }
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        rows, as_of, refreshing = screener.query(filters, sort, request.args.get('order', 'desc') != 'asc', limit)
+    except Exception as e:
+        logger.error(f"Error running screener query: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to run screener'}), 500
+    return jsonify({'as_of': as_of, 'refreshing': refreshing, 'signals': list(SIGNAL_COLUMNS), 'results': rows})
 
-        logger.debug(f"Processed data for {symbol}: {stock_data}")
-        
-        if stock_data['quantity'] > 0:
-            portfolio_store.add_stock(stock_data)
-        
+@stock_bp.route('/broad_market', methods=['GET'])
+def get_broad_market():
+    """Get returns, breadth and sector aggregates for an index's constituents"""
+    index = request.args.get('index', 'NIFTY 50').upper()
+    if index not in INDEX_SOURCES:
+        return jsonify({'error': f'Index must be one of {", ".join(INDEX_SOURCES)}'}), 400
+    try:
+        return jsonify(broad_market.snapshot(index))
+    except UpstreamUnavailableError:
+        return upstream_unavailable(index)
+    except Exception as e:
+        logger.error(f"Error building broad market snapshot for {index}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to load broad market data'}), 500
+
+def fetch_stock_data(symbol, quantity=0):
+    """(stock_data, None) for a symbol, or (None, error response) when it has no history
+
+    Raises UpstreamUnavailableError when the market data provider cannot be reached.
+    """
+    # Fetch history (with benchmark fallback) and metadata concurrently
+    history_future = upstream_executor.submit(get_stock_with_benchmark_fallback, symbol.upper())
+    metadata = symbol_metadata.get_metadata(symbol.upper())
+    stock_data_enhanced, stale = history_future.result()
+    
+    try:
+        # Use enhanced data if available
+        if not stock_data_enhanced.empty:
+            hist = stock_data_enhanced
+        else:
+            # Fallback to original method
+            hist = fetch_history(symbol.upper(), period='2d')
+            if hist.empty:
+                symbol_index.record_miss(symbol)
+                raise ValueError("No historical data available")
+            
+    except UpstreamUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching history for {symbol}: {e}")
+        return None, (jsonify({'error': f'Failed to fetch data for {symbol}'}), 404)
+
+    stock_data = build_stock_data(symbol, hist, metadata, enhanced=not stock_data_enhanced.empty, stale=stale,
+                                  quantity=quantity)
+    logger.debug(f"Processed data for {symbol}: {stock_data}")
+    return stock_data, None
+
+@stock_bp.route('/stock/<symbol>', methods=['GET'])
+def get_stock_data(symbol):
+    """Get a symbol's price and returns in INR; read-only, buying goes through POST /portfolio/<symbol>/buy"""
+    rejected = reject_unknown_symbol(symbol)
+    if rejected is not None:
+        return rejected
+
+    try:
+        stock_data, error = fetch_stock_data(symbol)
+        if error is not None:
+            return error
         return jsonify(stock_data)
         
+    except UpstreamUnavailableError:
+        return upstream_unavailable(symbol)
     except Exception as e:
         logger.error(f"Error processing {symbol}: {str(e)}", exc_info=True)
         return jsonify({'error': f'Failed to fetch data for {symbol}'}), 500
 
+@stock_bp.route('/portfolio/<symbol>/buy', methods=['POST'])
+def buy_stock(symbol):
+    """Buy a quantity of a symbol at its current price"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        quantity = float(payload.get('quantity', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid quantity'}), 400
+    if not math.isfinite(quantity) or quantity <= 0:
+        return jsonify({'error': 'Quantity must be a positive number'}), 400
+
+    rejected = reject_unknown_symbol(symbol)
+    if rejected is not None:
+        return rejected
+
+    try:
+        stock_data, error = fetch_stock_data(symbol, quantity)
+        if error is not None:
+            return error
+        portfolio_store.add_stock(stock_data)
+        return jsonify(stock_data)
+        
+    except UpstreamUnavailableError:
+        return upstream_unavailable(symbol)
+    except LedgerSyncError as e:
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        logger.error(f"Error buying {symbol}: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Failed to buy {symbol}'}), 500
+
+def build_portfolio_payload():
+    """Build the /api/portfolio response for the session's portfolio"""
+    portfolio = portfolio_store.get_portfolio()
+    
+    if portfolio.empty:
+        return {
+            'data': [],
+            'total_value': 0,
+            'day_return': 0,
+            'year_return': 0,
+            'day_return_value': 0,
+            'benchmark_day_return': 0,
+            'benchmark_day_return_value': 0,
+            'var_99_percent': 0,
+            'var_99_value': 0,
+            'stale_symbols': []
+        }
+    
+    # Get benchmark day return
+    perf = PerformanceAnalytics()
+    benchmark_day_return_pct = perf.get_benchmark_day_return()
+    
+    # Calculate portfolio returns
+    portfolio_returns = portfolio_store.get_returns()
+    day_return_pct = portfolio_returns[0]
+    year_return_pct = portfolio_returns[1]
+    
+    # Calculate value-based returns
+    total_value = portfolio_store.get_total_value()
+    portfolio_day_return_value = (total_value * day_return_pct) / 100
+    benchmark_day_return_value = (total_value * benchmark_day_return_pct) / 100
+    
+    # Calculate VaR in value terms (quick calculation for current portfolio value)
+    performance_data = perf.get_portfolio_returns(portfolio)
+    var_99_percent = performance_data['metrics'].get('var_99_percent', 0)
+    var_99_value = performance_data['metrics'].get('var_99_value', 0)
+    
+    logger.debug(f"Portfolio API Response: total_value={total_value}, day_return_pct={day_return_pct}, day_return_value={portfolio_day_return_value}")
+    logger.debug(f"Benchmark: day_return_pct={benchmark_day_return_pct}, day_return_value={benchmark_day_return_value}")
+    logger.debug(f"VaR (99%): {var_99_percent:.2f}% (₹{var_99_value:.2f})")
+    return {
+        'data': portfolio.to_dict('records'),
+        'total_value': float(total_value),
+        'day_return': float(day_return_pct),
+        'year_return': float(year_return_pct),
+        'day_return_value': float(portfolio_day_return_value),
+        'benchmark_day_return': float(benchmark_day_return_pct),
+        'benchmark_day_return_value': float(benchmark_day_return_value),
+        'var_99_percent': float(var_99_percent),
+        'var_99_value': float(var_99_value),
+        'stale_symbols': performance_data.get('stale_symbols', [])
+    }
+
+def _validators(versions, portfolio):
+    """(etag, last_modified) over the holdings, the request and input versions; None if any input is uncached"""
+    if any(v is None for v in versions):
+        return None
+    holdings = portfolio.to_dict('records')
+    etag = content_etag(request.full_path, holdings, versions)
+    return etag, max([portfolio_store.updated_at, *versions])
+
+def _history_validators(extra_symbols):
+    """Validators over the holdings plus the cached histories (holdings, FX pairs, extras) they are valued from"""
+    portfolio = portfolio_store.get_portfolio()
+    if portfolio.empty:
+        return _validators([], portfolio)
+    symbols = sorted(set(portfolio['symbol']))
+    pairs = fx_service.pair_symbols(symbols)
+    if pairs is None:
+        return None
+    return _validators([price_cache.version(s) for s in [*extra_symbols, *symbols, *sorted(pairs)]], portfolio)
+
+def portfolio_validators():
+    """Validators for /api/portfolio, which also uses the benchmark history"""
+    return _history_validators([BENCHMARK_SYMBOL])
+
+def holdings_validators():
+    """Validators for responses computed from the holdings' own histories"""
+    return _history_validators([])
+
+def risk_model_validators():
+    """Validators for the risk endpoints: holdings plus the risk model they are computed from"""
+    portfolio = portfolio_store.get_portfolio()
+    if portfolio.empty:
+        return _validators([], portfolio)
+    return _validators([risk_engine.model_version(portfolio['symbol'])], portfolio)
+
 @stock_bp.route('/portfolio', methods=['GET'])
+@conditional(portfolio_validators)
 def get_portfolio():
     """Get current portfolio data with day return values and VaR"""
     try:
-        portfolio = portfolio_store.get_portfolio()
-        
-        if portfolio.empty:
-            return jsonify({
-                'data': [],
-                'total_value': 0,
-                'day_return': 0,
-                'year_return': 0,
-                'day_return_value': 0,
-                'benchmark_day_return': 0,
-                'benchmark_day_return_value': 0,
-                'var_99_percent': 0,
-                'var_99_value': 0
+        return jsonify(build_portfolio_payload())
+    except Exception as e:
+        logger.error(f"Error in get_portfolio: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# A comment line this often keeps proxies from closing idle streams and surfaces disconnects
+STREAM_HEARTBEAT_SECONDS = 15
+# Each open stream holds a worker thread; closing it after this long hands the
+# thread back and lets the browser's EventSource reconnect on its own
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', 300))
+# Reconnect delay sent just before a planned close, so the gap in updates stays short
+STREAM_RECONNECT_MS = 1000
+BENCHMARK_SYMBOL = '^NSEI'
+
+def live_portfolio_values(holdings, quotes, symbols=None):
+    """Holding values and day P&L at the latest quotes
+
+    Totals cover every holding (at its stored price when there is no quote
+    yet); the 'holdings' list only covers `symbols` (default: all).
+    """
+    total_value = day_return_value = 0.0
+    rows = []
+    for symbol, holding in holdings.items():
+        quantity = float(holding['quantity'])
+        quote = quotes.get(symbol)
+        if quote is None:
+            total_value += float(holding['value'])
+            continue
+        value = quantity * quote['price']
+        day_pnl = quantity * (quote['price'] - quote['previous_close'])
+        total_value += value
+        day_return_value += day_pnl
+        if symbols is None or symbol in symbols:
+            rows.append({
+                'symbol': symbol,
+                'price': quote['price'],
+                'value': round(value, 2),
+                'day_return': quote['day_return'],
+                'day_return_value': round(day_pnl, 2),
+                'stale': quote['stale'],
             })
-        
-        # Get benchmark day return
-        perf = PerformanceAnalytics()
-        benchmark_day_return_pct = perf.get_benchmark_day_return()
-        
-        # Calculate portfolio returns
-        portfolio_returns = portfolio_store.get_returns()
-        day_return_pct = portfolio_returns[0]
-        year_return_pct = portfolio_returns[1]
-        
-        # Calculate value-based returns
-        total_value = portfolio_store.get_total_value()
-        portfolio_day_return_value = (total_value * day_return_pct) / 100
-        benchmark_day_return_value = (total_value * benchmark_day_return_pct) / 100
-        
-        # Calculate VaR in value terms (quick calculation for current portfolio value)
+
+    benchmark = quotes.get(BENCHMARK_SYMBOL)
+    benchmark_day_return = benchmark['day_return'] if benchmark else 0.0
+    return {
+        'holdings': rows,
+        'total_value': round(total_value, 2),
+        'day_return_value': round(day_return_value, 2),
+        'day_return': round(day_return_value / (total_value - day_return_value) * 100, 2) if total_value - day_return_value else 0.0,
+        'benchmark_day_return': benchmark_day_return,
+        'benchmark_day_return_value': round(total_value * benchmark_day_return / 100, 2),
+    }
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+@stock_bp.route('/portfolio/stream', methods=['GET'])
+def stream_portfolio():
+    """Server-sent events for the session's portfolio
+
+    Opens with a 'snapshot' event (the /api/portfolio payload at live
+    prices), then sends a 'quotes' event with the holdings whose quote
+    moved and the new totals whenever the shared quote table changes.
+    Clients reconnect after changing their holdings.
+
+    A stream occupies a worker thread while open, so it is closed after
+    STREAM_MAX_SECONDS and the client reconnects. Serve it with threaded
+    or gevent workers regardless: with sync workers every open tab still
+    pins a whole worker process until then.
+    """
+    try:
+        snapshot = build_portfolio_payload()
+    except Exception as e:
+        logger.error(f"Error building portfolio snapshot: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    holdings = {row['symbol']: row for row in snapshot['data']}
+    symbols = list(holdings) + [BENCHMARK_SYMBOL]
+
+    def events():
+        quote_table.watch(symbols)
+        try:
+            yield f"retry: {STREAM_HEARTBEAT_SECONDS * 1000}\n\n"
+            version = quote_table.version
+            quotes = quote_table.get(symbols)
+            live = live_portfolio_values(holdings, quotes)
+            for row in live['holdings']:
+                holdings[row['symbol']].update(price=row['price'], value=row['value'], day_return=row['day_return'])
+            snapshot.update({k: v for k, v in live.items() if k != 'holdings'})
+            yield _sse('snapshot', snapshot)
+            sent = {symbol: quote['version'] for symbol, quote in quotes.items()}
+
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield f"retry: {STREAM_RECONNECT_MS}\n\n"
+                    return
+                new_version = quote_table.wait_for_change(version, min(STREAM_HEARTBEAT_SECONDS, remaining))
+                if new_version == version:
+                    yield ": keep-alive\n\n"
+                    continue
+                version = new_version
+                quotes = quote_table.get(symbols)
+                moved = {s for s, quote in quotes.items() if quote['version'] > sent.get(s, 0)}
+                if not moved:
+                    continue
+                sent.update({s: quotes[s]['version'] for s in moved})
+                yield _sse('quotes', live_portfolio_values(holdings, quotes, moved))
+        finally:
+            quote_table.unwatch(symbols)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@stock_bp.route('/portfolio/var', methods=['GET'])
+@conditional(risk_model_validators)
+def get_portfolio_var():
+    """Get VaR and Expected Shortfall across methods, confidence levels and horizons"""
+    try:
+        confidence_levels = [float(x) for x in request.args.get('confidence', '0.95,0.99').split(',')]
+        horizons = [int(x) for x in request.args.get('horizon', '1,10').split(',')]
+        methods = request.args.get('method', ','.join(RiskEngine.METHODS)).split(',')
+    except ValueError:
+        return jsonify({'error': 'Invalid confidence or horizon'}), 400
+
+    if not all(0 < c < 1 for c in confidence_levels) or not all(h > 0 for h in horizons):
+        return jsonify({'error': 'Confidence must be in (0, 1) and horizon positive'}), 400
+    unknown = [m for m in methods if m not in RiskEngine.METHODS]
+    if unknown:
+        return jsonify({'error': f'Unknown methods: {", ".join(unknown)}'}), 400
+
+    try:
         portfolio_df = portfolio_store.get_portfolio()
-        if not portfolio_df.empty:
-            # Get historical returns for VaR calculation
-            performance_data = perf.get_portfolio_returns(portfolio_df)
-            var_99_percent = performance_data['metrics'].get('var_99_percent', 0)
-            var_99_value = performance_data['metrics'].get('var_99_value', 0)
-        else:
-            var_99_percent = 0
-            var_99_value = 0
-        
-        print(f"Portfolio API Response: total_value={total_value}, day_return_pct={day_return_pct}, day_return_value={portfolio_day_return_value}")
-        print(f"Benchmark: day_return_pct={benchmark_day_return_pct}, day_return_value={benchmark_day_return_value}")
-        print(f"VaR (99%): {var_99_percent:.2f}% (₹{var_99_value:.2f})")
-        
+        return jsonify(risk_engine.value_at_risk(portfolio_df, confidence_levels, horizons, methods))
+    except Exception as e:
+        logger.error(f"Error calculating portfolio VaR: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to calculate VaR'}), 500
+
+@stock_bp.route('/portfolio/attribution', methods=['GET'])
+@conditional(risk_model_validators)
+def get_portfolio_attribution():
+    """Get marginal VaR, component VaR and beta contribution per holding"""
+    try:
+        confidence = float(request.args.get('confidence', 0.99))
+        horizon = int(request.args.get('horizon', 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid confidence or horizon'}), 400
+    if not 0 < confidence < 1 or horizon <= 0:
+        return jsonify({'error': 'Confidence must be in (0, 1) and horizon positive'}), 400
+
+    try:
+        portfolio_df = portfolio_store.get_portfolio()
+        return jsonify(RiskAttribution().get_attribution(portfolio_df, confidence, horizon))
+    except Exception as e:
+        logger.error(f"Error calculating risk attribution: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to calculate risk attribution'}), 500
+
+@stock_bp.route('/risk_metrics/rolling', methods=['GET'])
+@conditional(risk_model_validators)
+def get_rolling_metrics():
+    """Get rolling beta, volatility, Sharpe ratio and drawdown series"""
+    try:
+        windows = [int(x) for x in request.args.get('windows', '30,90,252').split(',')]
+    except ValueError:
+        return jsonify({'error': 'Invalid windows'}), 400
+    if not all(w > 1 for w in windows):
+        return jsonify({'error': 'Windows must be greater than 1'}), 400
+
+    try:
+        portfolio_df = portfolio_store.get_portfolio()
+        return jsonify(RollingMetrics().get_rolling_metrics(portfolio_df, windows))
+    except Exception as e:
+        logger.error(f"Error calculating rolling metrics: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to calculate rolling metrics'}), 500
+
+@stock_bp.route('/portfolio/snapshots', methods=['GET'])
+def get_portfolio_snapshots():
+    """Get the stored daily value series and time-weighted return of the session's portfolio"""
+    try:
+        portfolio_id = portfolio_store.portfolio_id
+        snapshot_store.refresh(portfolio_id, portfolio_store.get_portfolio())
+        series = snapshot_store.get_series(portfolio_id)
+        since = request.args.get('since')
+        return jsonify({**series, 'time_weighted_return': snapshot_store.time_weighted_return(portfolio_id, since)})
+    except Exception as e:
+        logger.error(f"Error loading portfolio snapshots: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to load portfolio snapshots'}), 500
+
+@stock_bp.route('/portfolio/returns', methods=['GET'])
+@conditional(holdings_validators)
+def get_portfolio_returns_table():
+    """Get 1D..5Y and CAGR returns per holding and for the portfolio as a whole"""
+    try:
+        portfolio = portfolio_store.get_portfolio()
+        if portfolio.empty:
+            return jsonify({'horizons': list(return_table.table([]).columns), 'holdings': {}, 'portfolio': {}})
+        weights = portfolio.groupby('symbol')['value'].sum()
+        table = return_table.table(weights.index, portfolio.groupby('symbol')['quote_currency'].last().to_dict())
+        holdings = {
+            symbol: {h: (float(r) if pd.notna(r) else None) for h, r in row.items()}
+            for symbol, row in table.iterrows()
+        }
         return jsonify({
-            'data': portfolio.to_dict('records'),
-            'total_value': float(total_value),
-            'day_return': float(day_return_pct),
-            'year_return': float(year_return_pct),
-            'day_return_value': float(portfolio_day_return_value),
-            'benchmark_day_return': float(benchmark_day_return_pct),
-            'benchmark_day_return_value': float(benchmark_day_return_value),
-            'var_99_percent': float(var_99_percent),
-            'var_99_value': float(var_99_value)
+            'horizons': list(table.columns),
+            'holdings': holdings,
+            'portfolio': return_table.portfolio_returns(weights, table)
         })
     except Exception as e:
-        print(f"Error in get_portfolio: {e}")
+        logger.error(f"Error building return table: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to build return table'}), 500
+
+@stock_bp.route('/portfolio/<symbol>/sell', methods=['POST'])
+def sell_stock(symbol):
+    """Sell part of a holding at the current price"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        quantity = float(payload.get('quantity', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid quantity'}), 400
+    if not math.isfinite(quantity) or quantity <= 0:
+        return jsonify({'error': 'Quantity must be a positive number'}), 400
+
+    try:
+        price = current_price_inr(symbol)
+        if price is None:
+            # Never book a sale at a made-up price
+            return upstream_unavailable(symbol)
+        portfolio_store.sell_stock(symbol, quantity, price)
+    except LedgerSyncError as e:
         return jsonify({'error': str(e)}), 500
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error selling {symbol}: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Failed to sell {symbol}'}), 500
+    return jsonify({
+        'message': f'Sold {quantity:g} {symbol}',
+        'data': portfolio_store.get_portfolio().to_dict('records'),
+        'total_value': portfolio_store.get_total_value()
+    })
+
+@stock_bp.route('/portfolio/ledger', methods=['GET'])
+def get_ledger():
+    """Get cost basis and realized/unrealized P&L per position, plus recent transactions"""
+    method = request.args.get('method', 'fifo')
+    if method not in COST_METHODS:
+        return jsonify({'error': f'Method must be one of {", ".join(COST_METHODS)}'}), 400
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+
+    try:
+        portfolio_id = portfolio_store.portfolio_id
+        if portfolio_id is None:
+            return jsonify({'method': method, 'positions': [], 'transactions': []})
+        # Value open positions at the holdings' last stored prices; no upstream calls
+        portfolio = portfolio_store.get_portfolio()
+        prices = dict(zip(portfolio['symbol'], portfolio['price'].astype(float)))
+        positions = ledger.positions(portfolio_id, prices, method)
+        return jsonify({
+            'method': method,
+            'positions': positions,
+            'realized_pnl': sum(p['realized_pnl'] for p in positions),
+            'unrealized_pnl': sum(p['unrealized_pnl'] or 0.0 for p in positions),
+            'transactions': ledger.transactions(portfolio_id, request.args.get('symbol'), limit)
+        })
+    except Exception as e:
+        logger.error(f"Error loading ledger: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to load ledger'}), 500
 
 @stock_bp.route('/portfolio/<symbol>', methods=['DELETE'])
 def remove_stock(symbol):
     """Remove stock from portfolio"""
     try:
-        portfolio_store.remove_stock(symbol)
+        portfolio_store.remove_stock(symbol, current_price_inr(symbol))
         # Return updated portfolio data after deletion
         return jsonify({
             'message': f'Removed {symbol} from portfolio',
@@ -330,9 +757,8 @@ def load_portfolio():
         if missing_columns:
             return jsonify({'error': f'Missing columns: {", ".join(missing_columns)}'}), 400
             
-        # Update portfolio store
-        portfolio_store._portfolio = df
-        portfolio_store.save_to_session()
+        # Update portfolio store, booking the changes in the ledger
+        portfolio_store.replace_portfolio(df)
         
         return jsonify({
             'message': 'Portfolio loaded successfully',
@@ -342,6 +768,10 @@ def load_portfolio():
             'year_return': portfolio_store.get_returns()[1]
         })
         
+    except LedgerSyncError as e:
+        return jsonify({'error': str(e)}), 500
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error loading portfolio: {str(e)}", exc_info=True)
         return jsonify({'error': 'Failed to load portfolio file'}), 500
\ No newline at end of file
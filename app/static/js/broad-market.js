@@ -0,0 +1,59 @@
+function formatPercent(value) {
+    return value === null || value === undefined ? '--' : `${value >= 0 ? '+' : ''}${value.toFixed(2)}%`;
+}
+
+function tileColor(dayReturn) {
+    // Saturate at +/-3% so one outlier does not wash out the rest
+    const strength = Math.min(Math.abs(dayReturn || 0) / 3, 1);
+    const alpha = 0.25 + 0.75 * strength;
+    return dayReturn >= 0 ? `rgba(25, 135, 84, ${alpha})` : `rgba(220, 53, 69, ${alpha})`;
+}
+
+function moverRows(rows) {
+    return rows.map(row => `
+        <tr>
+            <td>${row.symbol}<br><small class="text-muted">${row.sector}</small></td>
+            <td class="text-end">${row.close.toFixed(2)}</td>
+            <td class="text-end ${row.day_return >= 0 ? 'text-success' : 'text-danger'}">${formatPercent(row.day_return)}</td>
+        </tr>`).join('');
+}
+
+async function loadBroadMarket() {
+    const index = document.getElementById('marketIndex').value;
+    try {
+        const response = await fetch(`/api/broad_market?index=${encodeURIComponent(index)}`);
+        if (!response.ok) throw new Error(`Broad market request failed: ${response.status}`);
+        const data = await response.json();
+        const breadth = data.breadth;
+
+        document.getElementById('marketAsOf').textContent = `As of ${data.as_of}${data.stale ? ' (delayed)' : ''}`;
+        document.getElementById('indexLevel').textContent = data.index_level === null ? '--' : data.index_level.toLocaleString('en-IN');
+        const indexDay = document.getElementById('indexDayReturn');
+        indexDay.textContent = formatPercent(data.index_day_return);
+        indexDay.className = data.index_day_return >= 0 ? 'text-success' : 'text-danger';
+        document.getElementById('advancers').textContent = breadth.advancers;
+        document.getElementById('decliners').textContent = breadth.decliners;
+        document.getElementById('adRatio').textContent = breadth.advance_decline_ratio === null ? '--' : breadth.advance_decline_ratio.toFixed(2);
+        document.getElementById('above50').textContent = `${breadth.pct_above_50dma.toFixed(0)}%`;
+        document.getElementById('above200').textContent = `${breadth.pct_above_200dma.toFixed(0)}%`;
+        document.getElementById('highs').textContent = breadth.new_52w_highs;
+        document.getElementById('lows').textContent = breadth.new_52w_lows;
+        document.getElementById('pricedCount').textContent = `${data.priced} of ${data.constituents} priced`;
+
+        document.getElementById('sectorHeatmap').innerHTML = data.sectors.map(sector => `
+            <div class="sector-tile" style="background: ${tileColor(sector.day_return)}">
+                <strong>${sector.sector}</strong><br>
+                ${formatPercent(sector.day_return)}
+                <small class="d-block">${sector.advancers} up / ${sector.decliners} down of ${sector.count}</small>
+            </div>`).join('');
+        document.getElementById('topGainers').innerHTML = moverRows(data.top_gainers);
+        document.getElementById('topLosers').innerHTML = moverRows(data.top_losers);
+    } catch (error) {
+        console.error('Error loading broad market data:', error);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('marketIndex').addEventListener('change', loadBroadMarket);
+    loadBroadMarket();
+});
@@ -0,0 +1,49 @@
+const HORIZON_WINDOWS = { '1M': 21, '3M': 63, '6M': 126, '1Y': 252, '2Y': 504 };
+
+function lastValue(series) {
+    for (let i = series.length - 1; i >= 0; i--) {
+        if (series[i] !== null) return series[i];
+    }
+    return null;
+}
+
+function formatNumber(value, suffix = '') {
+    return value === null || value === undefined ? '--' : `${value.toFixed(2)}${suffix}`;
+}
+
+async function updateRiskSummary() {
+    const window = HORIZON_WINDOWS[document.getElementById('timeHorizon').value] || 126;
+    const confidence = parseInt(document.getElementById('confidenceLevel').value, 10) / 100;
+
+    try {
+        const [rollingResponse, varResponse] = await Promise.all([
+            fetch(`/api/risk_metrics/rolling?windows=${window}`),
+            fetch(`/api/portfolio/var?confidence=${confidence}&horizon=1&method=historical`)
+        ]);
+
+        if (rollingResponse.ok) {
+            const rolling = await rollingResponse.json();
+            const metrics = rolling.windows[String(window)];
+            if (metrics) {
+                document.getElementById('portfolio-volatility').textContent = formatNumber(lastValue(metrics.volatility), '%');
+                document.getElementById('portfolio-beta').textContent = formatNumber(lastValue(metrics.beta));
+                document.getElementById('sharpe-ratio').textContent = formatNumber(lastValue(metrics.sharpe_ratio));
+                const drawdowns = metrics.drawdown.filter(v => v !== null);
+                document.getElementById('max-drawdown').textContent = formatNumber(drawdowns.length ? Math.min(...drawdowns) : null, '%');
+            }
+        }
+
+        if (varResponse.ok) {
+            const risk = await varResponse.json();
+            const row = risk.results[0];
+            document.getElementById('var-95').textContent = row ? formatNumber(row.var_percent, '%') : '--';
+        }
+    } catch (error) {
+        console.error('Error loading risk metrics:', error);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('updateRiskMetrics').addEventListener('click', updateRiskSummary);
+    updateRiskSummary();
+});
@@ -0,0 +1,44 @@
+function formatSignal(value, digits = 2) {
+    return value === null || value === undefined ? '--' : value.toFixed(digits);
+}
+
+async function runScreener() {
+    const params = new URLSearchParams({
+        sort: document.getElementById('screenerSort').value,
+        order: document.getElementById('screenerOrder').value,
+        limit: 50
+    });
+    const minRsi = document.getElementById('screenerMinRsi').value;
+    const maxRsi = document.getElementById('screenerMaxRsi').value;
+    if (minRsi !== '') params.set('min_rsi', minRsi);
+    if (maxRsi !== '') params.set('max_rsi', maxRsi);
+
+    try {
+        const response = await fetch(`/api/screener?${params}`);
+        if (!response.ok) throw new Error(`Screener request failed: ${response.status}`);
+        const data = await response.json();
+
+        document.getElementById('screenerAsOf').textContent = data.as_of
+            ? `As of ${data.as_of}${data.refreshing ? ' (refreshing)' : ''}`
+            : (data.refreshing ? 'Computing signals, try again shortly' : 'No signals yet');
+        document.getElementById('screenerResults').innerHTML = data.results.map(row => `
+            <tr>
+                <td>${row.symbol}</td>
+                <td>${row.name || ''}</td>
+                <td class="text-end">${formatSignal(row.close)}</td>
+                <td class="text-end">${formatSignal(row.momentum === null ? null : row.momentum * 100)}%</td>
+                <td class="text-end">${formatSignal(row.value_ratio, 3)}</td>
+                <td class="text-end">${formatSignal(row.rsi, 1)}</td>
+                <td class="text-end">${formatSignal(row.bollinger_position)}</td>
+                <td class="text-end">${formatSignal(row.macd_rank)}</td>
+                <td class="text-end ${row.day_return >= 0 ? 'text-success' : 'text-danger'}">${formatSignal(row.day_return)}%</td>
+            </tr>`).join('');
+    } catch (error) {
+        console.error('Error running screener:', error);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('runScreener').addEventListener('click', runScreener);
+    runScreener();
+});
@@ -14,63 +14,61 @@ class PortfolioManager {
             minimumFractionDigits: 2,
             maximumFractionDigits: 2
         });
+        this.stream = null;
         this.initializeChart();
         this.bindEvents();
-        this.loadExistingPortfolio();
+        this.connectStream();
     }
 
-    async loadExistingPortfolio() {
-        try {
-            const response = await fetch('/api/portfolio');
-            if (response.ok) {
-                const data = await response.json();
-                console.log('Portfolio data loaded:', data);
-                
-                // Store return values from API response
-                this.portfolioDayReturnValue = data.day_return_value || 0;
-                this.benchmarkDayReturn = data.benchmark_day_return || 0;
-                this.benchmarkDayReturnValue = data.benchmark_day_return_value || 0;
-                this.var99Percent = data.var_99_percent || 0;  // Changed from var_95_percent
-                this.var99Value = data.var_99_value || 0;      // Changed from var_95_value
-                
-                // Load portfolio data
-                if (data.data && data.data.length > 0) {
-                    this.portfolio = new Map(
-                        data.data.map(stock => [stock.symbol, stock])
-                    );
-                    this.updateDisplay();
-                }
-                
-                // Update return displays
-                this.updateDayReturnValues();
-                this.updateVarDisplay();
-            }
-        } catch (error) {
-            console.error('Error loading portfolio:', error);
+    // Live updates: the server pushes a full snapshot on connect, then quote
+    // and P&L deltas. Reconnect whenever the holdings change.
+    connectStream() {
+        if (this.stream) {
+            this.stream.close();
         }
+        this.stream = new EventSource('/api/portfolio/stream');
+        this.stream.addEventListener('snapshot', (event) => {
+            this.applyPortfolioData(JSON.parse(event.data));
+        });
+        this.stream.addEventListener('quotes', (event) => {
+            this.applyQuoteUpdate(JSON.parse(event.data));
+        });
+        this.stream.onerror = () => {
+            console.warn('Portfolio stream interrupted, the browser will reconnect');
+        };
     }
 
-    async refreshPortfolioData() {
-        try {
-            const response = await fetch('/api/portfolio');
-            if (response.ok) {
-                const data = await response.json();
-                console.log('Refreshed portfolio data:', data);
-                
-                // Update return values
-                this.portfolioDayReturnValue = data.day_return_value || 0;
-                this.benchmarkDayReturn = data.benchmark_day_return || 0;
-                this.benchmarkDayReturnValue = data.benchmark_day_return_value || 0;
-                this.var99Percent = data.var_99_percent || 0;  // Changed from var_95_percent
-                this.var99Value = data.var_99_value || 0;      // Changed from var_95_value
-                
-                // Update return displays
-                this.updateDayReturnValues();
-                this.updateVarDisplay();
+    applyPortfolioData(data) {
+        console.log('Portfolio snapshot:', data);
+        this.portfolioDayReturnValue = data.day_return_value || 0;
+        this.benchmarkDayReturn = data.benchmark_day_return || 0;
+        this.benchmarkDayReturnValue = data.benchmark_day_return_value || 0;
+        this.var99Percent = data.var_99_percent || 0;  // Changed from var_95_percent
+        this.var99Value = data.var_99_value || 0;      // Changed from var_95_value
+
+        this.portfolio = new Map(
+            (data.data || []).map(stock => [stock.symbol, {...stock, dayReturn: stock.day_return, yearReturn: stock.year_return}])
+        );
+        this.updateDisplay();
+    }
+
+    applyQuoteUpdate(update) {
+        for (const quote of update.holdings) {
+            const stock = this.portfolio.get(quote.symbol);
+            if (stock) {
+                Object.assign(stock, {
+                    price: quote.price,
+                    value: quote.value,
+                    day_return: quote.day_return,
+                    dayReturn: quote.day_return,
+                    stale: quote.stale
+                });
             }
-        } catch (error) {
-            console.error('Error refreshing portfolio data:', error);
         }
+        this.portfolioDayReturnValue = update.day_return_value;
+        this.benchmarkDayReturn = update.benchmark_day_return;
+        this.benchmarkDayReturnValue = update.benchmark_day_return_value;
+        this.updateDisplay();
     }
 
     initializeChart() {
@@ -100,6 +98,14 @@ class PortfolioManager {
             await this.handleStockSubmit();
         });
 
+        // Symbol autocomplete from the local listing index
+        let searchTimer = null;
+        document.getElementById('tickerSymbol').addEventListener('input', (e) => {
+            clearTimeout(searchTimer);
+            const query = e.target.value.trim();
+            searchTimer = setTimeout(() => this.updateSymbolSuggestions(query), 150);
+        });
+
         // Add event delegation for delete buttons
         document.getElementById('holdingsTable').addEventListener('click', (e) => {
             if (e.target.classList.contains('delete-stock')) {
@@ -184,6 +190,7 @@ class PortfolioManager {
                     result.data.map(stock => [stock.symbol, stock])
                 );
                 this.updateDisplay();
+                this.connectStream();
                 
                 alert('Portfolio loaded successfully!');
                 
@@ -221,15 +228,15 @@ class PortfolioManager {
 
     async addStock(symbol, quantity) {
         try {
-            const stockData = await this.fetchStockData(symbol, quantity);
+            const stockData = await this.buyStock(symbol, quantity);
             // Store the returns with the stock data
             this.portfolio.set(symbol, {
                 ...stockData,
                 value: stockData.price * stockData.quantity
             });
             this.updateDisplay();
-            // Refresh portfolio data to get updated return values
-            await this.refreshPortfolioData();
+            // Reconnect so the stream covers the new holding and recomputes returns
+            this.connectStream();
         } catch (error) {
             throw new Error(`Failed to add ${symbol}: ${error.message}`);
         }
@@ -241,30 +248,14 @@ class PortfolioManager {
                 method: 'DELETE'
             });
             if (!response.ok) throw new Error('Failed to delete stock');
-            await this.updatePortfolio();
+            this.portfolio.delete(symbol);
+            this.updateDisplay();
+            this.connectStream();
         } catch (error) {
             throw new Error(`Failed to delete ${symbol}: ${error.message}`);
         }
     }
 
-    async updatePortfolio() {
-        const response = await fetch('/api/portfolio');
-        const data = await response.json();
-        
-        this.portfolio = new Map(
-            data.data.map(stock => [stock.symbol, stock])
-        );
-        
-        // Store additional return data
-        this.portfolioDayReturnValue = data.day_return_value || 0;
-        this.benchmarkDayReturn = data.benchmark_day_return || 0;
-        this.benchmarkDayReturnValue = data.benchmark_day_return_value || 0;
-        this.var99Percent = data.var_99_percent || 0;  // Changed from var_95_percent
-        this.var99Value = data.var_99_value || 0;      // Changed from var_95_value
-        
-        this.updateDisplay();
-    }
-
     updateTotalValue() {
         this.totalValue = Array.from(this.portfolio.values())
             .reduce((sum, stock) => sum + stock.value, 0);
@@ -450,16 +441,46 @@ class PortfolioManager {
         return weightedReturn;
     }
 
-    async fetchStockData(symbol, quantity) {
+    async updateSymbolSuggestions(query) {
+        const datalist = document.getElementById('symbolSuggestions');
+        if (!query) {
+            datalist.innerHTML = '';
+            return;
+        }
         try {
-            const response = await fetch(`/api/stock/${symbol}?quantity=${quantity}`);
+            const response = await fetch(`/api/symbols?q=${encodeURIComponent(query)}&limit=10`);
+            if (!response.ok) return;
+            const data = await response.json();
+            datalist.innerHTML = '';
+            data.results.forEach(listing => {
+                const option = document.createElement('option');
+                option.value = listing.symbol;
+                option.label = `${listing.name} (${listing.exchange})`;
+                datalist.appendChild(option);
+            });
+        } catch (error) {
+            console.error('Symbol search failed:', error);
+        }
+    }
+
+    async buyStock(symbol, quantity) {
+        try {
+            const response = await fetch(`/api/portfolio/${symbol}/buy`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ quantity })
+            });
             if (!response.ok) {
                 const error = await response.json();
-                throw new Error(error.error || 'Failed to fetch stock data');
+                let message = error.error || 'Failed to buy stock';
+                if (error.suggestions && error.suggestions.length) {
+                    message += `. Did you mean ${error.suggestions.map(s => s.symbol).join(', ')}?`;
+                }
+                throw new Error(message);
             }
             return await response.json();
         } catch (error) {
-            throw new Error(`Failed to fetch data for ${symbol}: ${error.message}`);
+            throw new Error(`Failed to buy ${symbol}: ${error.message}`);
         }
     }
 }
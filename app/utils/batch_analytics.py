@@ -0,0 +1,197 @@
+"""
+Offline performance analytics over every stored portfolio.
+
+Loads all portfolios from the filesystem session store, builds one price
+panel for the union of their symbols and computes the
+get_portfolio_returns payload for every portfolio as matrix operations.
+Results are persisted per holdings fingerprint so the /portfolio page can
+serve them without touching market data.
+
+Usage:
+    python -m app.utils.batch_analytics [session_dir] [output_dir]
+"""
+
+import logging
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import pandas as pd
+from .risk_engine import risk_engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_DIR = os.path.join(os.getcwd(), 'flask_session')
+DEFAULT_OUTPUT_DIR = os.path.join(os.getcwd(), 'analytics_cache')
+
+class BatchAnalytics:
+    def __init__(self, session_dir=DEFAULT_SESSION_DIR, output_dir=DEFAULT_OUTPUT_DIR, engine=None):
+        self.session_dir = session_dir
+        self.output_dir = output_dir
+        self.engine = engine if engine is not None else risk_engine
+        self.risk_free_rate = 0.0725  # Matches PerformanceAnalytics
+        self.initial_value = 100000
+
+    @staticmethod
+    def portfolio_fingerprint(portfolio_df):
+        """Stable key for a set of holdings, independent of row order"""
+        if portfolio_df.empty:
+            return None
+        holdings = sorted(
+            (str(row['symbol']), float(row['quantity']), round(float(row['value']), 2))
+            for _, row in portfolio_df.iterrows()
+        )
+        return hashlib.sha1(json.dumps(holdings).encode()).hexdigest()
+
+    def load_sessions(self):
+        """Read every unexpired session dict from the filesystem session store"""
+        sessions = {}
+        if not os.path.isdir(self.session_dir):
+            return sessions
+
+        now = time.time()
+        for name in os.listdir(self.session_dir):
+            path = os.path.join(self.session_dir, name)
+            try:
+                with open(path, 'rb') as f:
+                    # cachelib layout: 4-byte expiry timestamp followed by a pickle
+                    expires = int.from_bytes(f.read(4), sys.byteorder)
+                    data = pickle.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable session file {name}: {e}")
+                continue
+
+            if expires and expires < now:
+                continue
+            if isinstance(data, dict):
+                sessions[name] = data
+        return sessions
+
+    def load_session_portfolios(self):
+        """Read every unexpired portfolio from the filesystem session store"""
+        portfolios = {}
+        for name, data in self.load_sessions().items():
+            if data.get('portfolio'):
+                df = pd.DataFrame(data['portfolio'])
+                if {'symbol', 'quantity', 'value'}.issubset(df.columns):
+                    portfolios[name] = df
+        return portfolios
+
+    def _performance_metrics(self, curves, benchmark_curve):
+        """Vectorized _calculate_performance_metrics for a (n_days, n_books) value matrix"""
+        returns = curves[1:] / curves[:-1] - 1
+        benchmark_returns = benchmark_curve[1:] / benchmark_curve[:-1] - 1
+        n_days, n_books = curves.shape
+
+        running_max = np.maximum.accumulate(curves, axis=0)
+        max_drawdown = ((curves - running_max) / running_max).min(axis=0) * 100
+
+        demeaned = returns - returns.mean(axis=0)
+        benchmark_demeaned = benchmark_returns - benchmark_returns.mean()
+        covariance = benchmark_demeaned @ demeaned / len(returns)
+        portfolio_std = returns.std(axis=0)
+        benchmark_std = benchmark_returns.std()
+        beta = covariance / benchmark_std ** 2 if benchmark_std > 0 else np.ones(n_books)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.nan_to_num(covariance / (portfolio_std * benchmark_std))
+
+        var_index = int(0.01 * len(returns))
+        var_returns = np.partition(returns, var_index, axis=0)[var_index]
+
+        daily_rf = self.risk_free_rate / 252
+        if n_days >= 252:
+            one_year_return = (curves[-1] / curves[-252] - 1) * 100
+            window = returns[-251:]
+        else:
+            years = (n_days - 1) / 252.0
+            one_year_return = ((curves[-1] / curves[0]) ** (1 / years) - 1) * 100
+            window = returns
+        window_std = window.std(axis=0)
+        volatility = window_std * np.sqrt(252) * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(window_std > 0, (window.mean(axis=0) - daily_rf) / window_std * np.sqrt(252), 0.0)
+
+        return [
+            {
+                'one_year_return': float(one_year_return[b]),
+                'volatility': float(volatility[b]),
+                'sharpe_ratio': float(sharpe[b]),
+                'max_drawdown': float(max_drawdown[b]),
+                'beta': float(beta[b]),
+                'var_99_percent': float(var_returns[b] * 100),
+                'var_99_value': float(curves[-1, b] * var_returns[b]),
+                'correlation': float(correlation[b])
+            }
+            for b in range(n_books)
+        ]
+
+    def run(self):
+        """Compute and persist analytics for every stored portfolio"""
+        portfolios = self.load_session_portfolios()
+        books = {}
+        for df in portfolios.values():
+            fingerprint = self.portfolio_fingerprint(df)
+            if fingerprint is not None:
+                books.setdefault(fingerprint, df)
+        if not books:
+            logger.warning("No stored portfolios found")
+            return 0
+
+        fingerprints = list(books)
+        positions = [books[f].groupby('symbol')['value'].sum() for f in fingerprints]
+        symbols = sorted(set().union(*(p.index for p in positions)))
+        model = self.engine.get_model(symbols)
+        if model is None:
+            logger.warning("Benchmark data unavailable, nothing computed")
+            return 0
+
+        # One row of position values per portfolio over the shared symbol universe
+        values = np.vstack([p.reindex(model['symbols']).fillna(0).to_numpy(dtype=float) for p in positions])
+        curves = self.engine.buy_and_hold_values(model, values, self.initial_value)
+        benchmark_curve = self.initial_value * np.concatenate([[1.0], np.cumprod(1 + model['benchmark_returns'])])
+        metrics = self._performance_metrics(curves, benchmark_curve)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        dates = [d.strftime('%Y-%m-%d') for d in model['index']]
+        benchmark_values = benchmark_curve.tolist()
+        generated_at = time.time()
+        for b, fingerprint in enumerate(fingerprints):
+            result = {
+                'generated_at': generated_at,
+                'portfolio_hist': {'index': dates, 'values': curves[:, b].tolist()},
+                'benchmark_hist': {'index': dates, 'values': benchmark_values},
+                'metrics': metrics[b]
+            }
+            path = os.path.join(self.output_dir, f"{fingerprint}.json")
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+
+        logger.info(f"Computed analytics for {len(fingerprints)} portfolios over {len(symbols)} symbols")
+        return len(fingerprints)
+
+    def load_result(self, portfolio_df, max_age_seconds=24*3600):
+        """Get the persisted analytics for a portfolio, or None if missing or stale"""
+        fingerprint = self.portfolio_fingerprint(portfolio_df)
+        if fingerprint is None:
+            return None
+        path = os.path.join(self.output_dir, f"{fingerprint}.json")
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            metrics.record_cache('batch_analytics', hit=False)
+            return None
+        fresh = time.time() - result.get('generated_at', 0) <= max_age_seconds
+        metrics.record_cache('batch_analytics', hit=fresh)
+        return result if fresh else None
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    args = sys.argv[1:]
+    BatchAnalytics(*args).run()
@@ -0,0 +1,237 @@
+import csv
+import io
+import logging
+import os
+import threading
+import time
+import urllib.request
+import numpy as np
+import pandas as pd
+from .market_data import fetch_closes
+from .metrics import metrics
+from .single_flight import upstream_flight
+from .symbol_index import symbol_index
+
+logger = logging.getLogger(__name__)
+
+# NSE publishes each index's constituents as CSV (Company Name, Industry, Symbol, Series, ISIN Code)
+INDEX_SOURCES = {
+    'NIFTY 50': {'symbol': '^NSEI', 'url': 'https://archives.nseindia.com/content/indices/ind_nifty50list.csv'},
+    'NIFTY 500': {'symbol': '^CRSLDX', 'url': 'https://archives.nseindia.com/content/indices/ind_nifty500list.csv'},
+}
+
+CONSTITUENTS_DIR = os.environ.get('CONSTITUENTS_DIR', os.path.join(os.getcwd(), 'index_constituents'))
+
+# Constituents change at the semi-annual rebalance; a weekly re-download is plenty
+CONSTITUENTS_TTL_SECONDS = 7 * 24 * 3600
+
+BROAD_MARKET_REFRESH_SECONDS = float(os.environ.get('BROAD_MARKET_REFRESH_SECONDS', 900))
+
+UNCLASSIFIED = 'Unclassified'
+
+def _slug(index):
+    return index.lower().replace(' ', '_')
+
+class BroadMarketService:
+    """Index-wide returns, breadth and sector aggregates from one batched download
+
+    Constituent closes for the whole index come from a single batched
+    request, and every statistic is a column-wise operation on the
+    resulting date x symbol frame. Snapshots are cached for one refresh
+    cycle and concurrent builds of the same index share one download.
+    """
+
+    def __init__(self, refresh_seconds=BROAD_MARKET_REFRESH_SECONDS, constituents_dir=CONSTITUENTS_DIR):
+        self.refresh_seconds = refresh_seconds
+        self.constituents_dir = constituents_dir
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _download_constituents(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.read().decode('utf-8')
+
+    @staticmethod
+    def _parse_constituents(text):
+        constituents = []
+        for row in csv.DictReader(io.StringIO(text)):
+            row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+            if row.get('Symbol'):
+                constituents.append({
+                    'symbol': f"{row['Symbol']}.NS",
+                    'name': row.get('Company Name') or row['Symbol'],
+                    'sector': row.get('Industry') or UNCLASSIFIED,
+                })
+        return constituents
+
+    def constituents(self, index):
+        """Constituent listings (symbol, name, sector) of an index
+
+        Read from the on-disk copy while it is fresh, re-downloaded from NSE
+        weekly, and the old copy kept if the download fails. Without any copy
+        the NSE listings in the symbol index stand in, without sectors.
+        """
+        path = os.path.join(self.constituents_dir, f"{_slug(index)}.csv")
+        try:
+            fresh = time.time() - os.path.getmtime(path) < CONSTITUENTS_TTL_SECONDS
+        except OSError:
+            fresh = False
+
+        text = None
+        if not fresh:
+            try:
+                text = self._download_constituents(INDEX_SOURCES[index]['url'])
+                os.makedirs(self.constituents_dir, exist_ok=True)
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                logger.warning(f"Could not download {index} constituents: {e}")
+        if text is None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                pass
+
+        constituents = self._parse_constituents(text) if text else []
+        if not constituents:
+            logger.warning(f"No constituent list for {index}, using the NSE listings in the symbol index")
+            constituents = [
+                {'symbol': listing['symbol'], 'name': listing['name'], 'sector': UNCLASSIFIED}
+                for listing in symbol_index.listings('NSE') if not listing['symbol'].startswith('^')
+            ]
+        return constituents
+
+    @staticmethod
+    def compute(closes, sectors):
+        """Per-symbol returns plus breadth and sector aggregates from a date x symbol close frame"""
+        closes = closes.astype(float).ffill()
+        closes = closes.loc[:, closes.iloc[-1].notna()]
+        last = closes.iloc[-1]
+        index = pd.DatetimeIndex(closes.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+
+        def return_since(position):
+            return (last / closes.iloc[max(position, 0)] - 1) * 100
+
+        def return_from(date):
+            return return_since(int(np.searchsorted(index, date, side='right')) - 1)
+
+        year_start = pd.Timestamp(year=index[-1].year, month=1, day=1)
+        stats = pd.DataFrame({
+            'close': last,
+            'day_return': return_since(len(closes) - 2),
+            'week_return': return_from(index[-1] - pd.DateOffset(weeks=1)),
+            'month_return': return_from(index[-1] - pd.DateOffset(months=1)),
+            'ytd_return': return_since(int(np.searchsorted(index, year_start, side='left')) - 1),
+            'year_return': return_from(index[-1] - pd.DateOffset(years=1)),
+            'above_50dma': last > closes.rolling(50, min_periods=50).mean().iloc[-1],
+            'above_200dma': last > closes.rolling(200, min_periods=200).mean().iloc[-1],
+            'at_52w_high': last >= closes.iloc[-252:].max(),
+            'at_52w_low': last <= closes.iloc[-252:].min(),
+        })
+        stats['sector'] = pd.Series(sectors).reindex(stats.index).fillna(UNCLASSIFIED)
+
+        day = stats['day_return']
+        breadth = {
+            'advancers': int((day > 0).sum()),
+            'decliners': int((day < 0).sum()),
+            'unchanged': int((day == 0).sum()),
+            'pct_above_50dma': float(stats['above_50dma'].mean() * 100),
+            'pct_above_200dma': float(stats['above_200dma'].mean() * 100),
+            'new_52w_highs': int(stats['at_52w_high'].sum()),
+            'new_52w_lows': int(stats['at_52w_low'].sum()),
+        }
+        breadth['advance_decline_ratio'] = (
+            float(breadth['advancers'] / breadth['decliners']) if breadth['decliners'] else None
+        )
+
+        grouped = stats.groupby('sector')
+        sectors_table = pd.DataFrame({
+            'count': grouped.size(),
+            'day_return': grouped['day_return'].mean(),
+            'month_return': grouped['month_return'].mean(),
+            'ytd_return': grouped['ytd_return'].mean(),
+            'year_return': grouped['year_return'].mean(),
+            'advancers': (day > 0).groupby(stats['sector']).sum(),
+            'decliners': (day < 0).groupby(stats['sector']).sum(),
+        }).sort_values('day_return', ascending=False)
+        return stats, breadth, sectors_table
+
+    def _build(self, index):
+        source = INDEX_SOURCES[index]
+        constituents = self.constituents(index)
+        symbols = [c['symbol'] for c in constituents]
+        closes = fetch_closes(symbols + [source['symbol']], period='1y')
+        if closes.empty:
+            raise ValueError(f"No market data for {index}")
+
+        index_closes = closes[source['symbol']].dropna()
+        with metrics.timer('analytics_compute_seconds', engine='broad_market'):
+            stats, breadth, sectors = self.compute(
+                closes[symbols], {c['symbol']: c['sector'] for c in constituents})
+
+        names = {c['symbol']: c['name'] for c in constituents}
+
+        def records(frame):
+            return [
+                {'symbol': symbol, 'name': names.get(symbol, symbol), 'sector': row['sector'],
+                 'close': round(float(row['close']), 2), 'day_return': round(float(row['day_return']), 2)}
+                for symbol, row in frame.iterrows()
+            ]
+
+        def clean(value):
+            return None if pd.isna(value) else round(float(value), 2)
+
+        by_day = stats.sort_values('day_return', ascending=False)
+        return {
+            'index': index,
+            'as_of': pd.Timestamp(closes.index[-1]).strftime('%Y-%m-%d'),
+            'generated_at': time.time(),
+            'stale': False,
+            'index_level': clean(index_closes.iloc[-1]) if len(index_closes) else None,
+            'index_day_return': clean((index_closes.iloc[-1] / index_closes.iloc[-2] - 1) * 100) if len(index_closes) > 1 else None,
+            'constituents': len(constituents),
+            'priced': len(stats),
+            'breadth': breadth,
+            'sectors': [
+                {'sector': sector, **{k: (int(v) if k in ('count', 'advancers', 'decliners') else clean(v)) for k, v in row.items()}}
+                for sector, row in sectors.iterrows()
+            ],
+            'top_gainers': records(by_day.head(5)),
+            'top_losers': records(by_day.tail(5).iloc[::-1]),
+            'returns': {
+                symbol: {k: clean(row[k]) for k in ('day_return', 'week_return', 'month_return', 'ytd_return', 'year_return')}
+                for symbol, row in stats.iterrows()
+            },
+        }
+
+    def snapshot(self, index='NIFTY 50'):
+        """Cached snapshot of an index, rebuilt once per refresh cycle"""
+        if index not in INDEX_SOURCES:
+            raise ValueError(f"Unknown index: {index}")
+        with self._lock:
+            entry = self._snapshots.get(index)
+        if entry is not None and time.time() - entry['generated_at'] < self.refresh_seconds:
+            metrics.record_cache('broad_market', hit=True)
+            return entry
+        metrics.record_cache('broad_market', hit=False)
+
+        try:
+            snapshot, _ = upstream_flight.do(('broad_market', index), self._build, index)
+        except Exception as e:
+            if entry is None:
+                raise
+            # Keep serving the previous cycle while the provider is unavailable
+            logger.warning(f"Broad market refresh for {index} failed, serving the previous snapshot: {e}")
+            metrics.inc('stale_served_total', cache='broad_market', reason='error')
+            return dict(entry, stale=True)
+        with self._lock:
+            self._snapshots[index] = snapshot
+        return snapshot
+
+# Create global instance
+broad_market = BroadMarketService()
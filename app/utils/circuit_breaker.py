@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+import time
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+RESET_TIMEOUT_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', 30))
+HALF_OPEN_MAX_CALLS = 3
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures, then probe it again
+
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls are rejected immediately until
+    `reset_timeout_seconds` have passed. Half-open: up to
+    `half_open_max_calls` trial calls go through (a page load makes several
+    at once); a success closes the circuit, a failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout_seconds=RESET_TIMEOUT_SECONDS,
+                 half_open_max_calls=HALF_OPEN_MAX_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def _transition(self, state):
+        # Caller holds the lock
+        if state != self._state:
+            logger.warning(f"Circuit for {self.name} is now {state}")
+            metrics.inc('circuit_breaker_transitions_total', breaker=self.name, state=state)
+        self._state = state
+
+    def allow(self):
+        """Whether a call may go through now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    return False
+                self._transition(self.HALF_OPEN)
+                self._trials = 0
+            if self._trials >= self.half_open_max_calls:
+                return False
+            self._trials += 1
+            return True
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        if not self.allow():
+            metrics.inc('circuit_breaker_rejections_total', breaker=self.name)
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+class CircuitBreakerRegistry:
+    """One breaker per upstream host, created on first use"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.breaker_options)
+            return breaker
+
+    def states(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.state for breaker in breakers}
+
+# Create global instance
+circuit_breakers = CircuitBreakerRegistry()
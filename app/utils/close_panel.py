@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PANEL_DIR = os.environ.get('PRICE_PANEL_DIR', os.path.join(os.getcwd(), 'price_panel'))
+DEFAULT_PANEL_DTYPE = os.environ.get('PRICE_PANEL_DTYPE', 'float32')
+
+class SharedClosePanel:
+    """Date x symbol close-price panel shared by every worker through memory-mapped files
+
+    Each publish writes an immutable snapshot (closes as one .npy matrix plus
+    its dates) and atomically swaps manifest.json to point at it. Readers map
+    the matrix read-only, so all workers share one copy in the page cache
+    instead of each holding float64 OHLCV frames per symbol; a request only
+    materializes the columns it asks for.
+    """
+
+    def __init__(self, directory=DEFAULT_PANEL_DIR, dtype=DEFAULT_PANEL_DTYPE, keep_versions=2):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.keep_versions = keep_versions
+        self._state = None
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    @contextmanager
+    def _publish_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current(self):
+        """Mapped state of the newest snapshot, remapping only when the manifest changed"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if self._state is not None and mtime == self._manifest_mtime:
+                return self._state
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            closes = np.load(os.path.join(self.directory, manifest['closes']), mmap_mode='r')
+            dates = pd.to_datetime(np.load(os.path.join(self.directory, manifest['dates'])), unit='ns', utc=True)
+            if manifest.get('tz'):
+                dates = dates.tz_convert(manifest['tz'])
+            else:
+                dates = dates.tz_localize(None)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not map shared close panel: {e}")
+            return None
+
+        state = {
+            'manifest': manifest,
+            'closes': closes,
+            'dates': dates,
+            'columns': {symbol: i for i, symbol in enumerate(manifest['symbols'])},
+        }
+        with self._lock:
+            self._state, self._manifest_mtime = state, mtime
+        return state
+
+    def get(self, symbols, max_age_seconds=None):
+        """Closes for `symbols` as a DataFrame, or None if any is missing or the panel is stale"""
+        state = self._current()
+        if state is None:
+            return None
+        positions = [state['columns'].get(symbol) for symbol in symbols]
+        if any(p is None for p in positions):
+            return None
+        if max_age_seconds is not None:
+            # Columns carried over by merges keep their own build time
+            built_at = state['manifest'].get('column_built_at') or [state['manifest']['built_at']] * len(state['columns'])
+            if time.time() - min(built_at[p] for p in positions) > max_age_seconds:
+                return None
+        return pd.DataFrame(state['closes'][:, positions], index=state['dates'], columns=list(symbols))
+
+    def publish(self, panel):
+        """Write a new snapshot of `panel` and make it current"""
+        with self._publish_lock():
+            self._write(panel)
+
+    def merge(self, panel):
+        """Publish `panel` together with the current snapshot's other symbols
+
+        Existing columns are kept only while the calendar is unchanged; after
+        a new trading day they are dropped. Kept columns retain the time they
+        were built, so a merge never makes them look fresh.
+        """
+        with self._publish_lock():
+            state = self._current()
+            built_at = None
+            if state is not None and state['dates'].equals(panel.index):
+                keep = [s for s in state['manifest']['symbols'] if s not in panel.columns]
+                if keep:
+                    previous = state['manifest'].get('column_built_at') or [state['manifest']['built_at']] * len(state['columns'])
+                    positions = [state['columns'][s] for s in keep]
+                    existing = pd.DataFrame(state['closes'][:, positions], index=panel.index, columns=keep)
+                    built_at = [previous[p] for p in positions] + [time.time()] * panel.shape[1]
+                    panel = pd.concat([existing, panel], axis=1)
+            self._write(panel, built_at)
+
+    def _write(self, panel, column_built_at=None):
+        version = str(time.time_ns())
+        closes_name, dates_name = f"closes-{version}.npy", f"dates-{version}.npy"
+        index = pd.DatetimeIndex(panel.index)
+        tz = str(index.tz) if index.tz is not None else None
+        utc_index = index.tz_convert('UTC') if tz else index
+        np.save(os.path.join(self.directory, closes_name), panel.to_numpy(dtype=self.dtype))
+        np.save(os.path.join(self.directory, dates_name), utc_index.as_unit('ns').asi8)
+
+        now = time.time()
+        manifest = {
+            'version': version,
+            'built_at': now,
+            'column_built_at': column_built_at or [now] * panel.shape[1],
+            'dtype': self.dtype.name,
+            'tz': tz,
+            'symbols': [str(s) for s in panel.columns],
+            'closes': closes_name,
+            'dates': dates_name,
+        }
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._remove_old_versions()
+        logger.info(f"Published close panel {version}: {len(index)} dates x {panel.shape[1]} symbols ({self.dtype.name})")
+
+    def _remove_old_versions(self):
+        # Mapped files stay readable after unlink, so older snapshots can go
+        versions = sorted({name.split('-', 1)[1].split('.')[0] for name in os.listdir(self.directory)
+                           if name.startswith(('closes-', 'dates-'))})
+        for version in versions[:-self.keep_versions]:
+            for prefix in ('closes', 'dates'):
+                try:
+                    os.remove(os.path.join(self.directory, f"{prefix}-{version}.npy"))
+                except OSError:
+                    pass
+
+# Create global instance
+shared_close_panel = SharedClosePanel()
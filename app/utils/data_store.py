@@ -1,6 +1,25 @@
+import logging
+import math
+import time
+import uuid
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from flask import session
+from .fx import fx_service
+from .ledger import ledger
+
+logger = logging.getLogger(__name__)
+
+def _timestamp(value):
+    """Epoch seconds of an ISO date_added, or now if it cannot be parsed"""
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return time.time()
+
+class LedgerSyncError(Exception):
+    """A trade could not be booked in the ledger, so the holdings were left unchanged"""
 
 class PortfolioDataStore:
     def __init__(self):
@@ -8,9 +27,11 @@ class PortfolioDataStore:
         self.columns = [
             'symbol', 'quantity', 'price', 'value', 
             'day_return', 'year_return', 'name', 
-            'currency', 'date_added'
+            'currency', 'date_added', 'quote_currency'
         ]
         self._portfolio = pd.DataFrame(columns=self.columns)
+        self.updated_at = 0.0
+        self.portfolio_id = None
     
     def load_from_session(self):
         """Load portfolio data from session"""
@@ -19,32 +40,92 @@ class PortfolioDataStore:
             self._portfolio = pd.DataFrame(portfolio_data, columns=self.columns)
         else:
             self._portfolio = pd.DataFrame(columns=self.columns)
+        self.updated_at = session.get('portfolio_updated_at', 0.0)
+        self.portfolio_id = session.get('portfolio_id')
+        if self.portfolio_id is None and 'portfolio' in session:
+            # Portfolios saved before snapshots existed get their id on first load
+            self._assign_portfolio_id()
+    
+    def _assign_portfolio_id(self):
+        """Stable id for the session's portfolio, used to key its value snapshots"""
+        self.portfolio_id = uuid.uuid4().hex
+        session['portfolio_id'] = self.portfolio_id
+        session.modified = True
     
     def save_to_session(self):
         """Save current portfolio state to session"""
         if hasattr(self, '_portfolio'):
+            self.updated_at = time.time()
+            if self.portfolio_id is None:
+                self._assign_portfolio_id()
             session['portfolio'] = self._portfolio.to_dict('records')
+            session['portfolio_updated_at'] = self.updated_at
             session.modified = True
     
+    def _record_trade(self, symbol, side, quantity, price, opening=None):
+        """Append a trade to the ledger, first booking any holding it has not seen as an opening balance
+
+        Raises LedgerSyncError on failure; callers book the trade before
+        touching the holdings, so the two never drift apart.
+        """
+        self._record_trades([(symbol, side, quantity, price, opening)])
+    
+    def _record_trades(self, trades):
+        """Book (symbol, side, quantity, price, opening) trades in one ledger transaction, or none of them"""
+        if self.portfolio_id is None:
+            self._assign_portfolio_id()
+        openings = [
+            (symbol, opening[0], opening[1], _timestamp(opening[2]))
+            for symbol, _, _, _, opening in trades if opening is not None
+        ]
+        # Zero-quantity trades only reconcile; anything else (negative, NaN) goes to the ledger to be rejected
+        booked = [(symbol, side, quantity, price, None) for symbol, side, quantity, price, _ in trades if quantity != 0]
+        try:
+            ledger.record_many(self.portfolio_id, booked, openings)
+        except Exception as e:
+            described = f"{trades[0][1]} of {trades[0][0]}" if len(trades) == 1 else f"{len(trades)} trades"
+            logger.error(f"Could not record {described} in the ledger: {e}")
+            raise LedgerSyncError(f"Could not record the {described}: {e}") from e
+    
+    def _holding(self, symbol):
+        """(quantity, price, date_added) of a held symbol, or None"""
+        mask = self._portfolio['symbol'] == symbol
+        if not mask.any():
+            return None
+        row = self._portfolio.loc[mask].iloc[0]
+        return float(row['quantity']), float(row['price']), row['date_added']
+    
+    def _update_row(self, symbol, fields):
+        """Overwrite fields of a holding (rebuilt from records so column dtypes can change)"""
+        records = self._portfolio.to_dict('records')
+        for record in records:
+            if record['symbol'] == symbol:
+                record.update(fields)
+        self._portfolio = pd.DataFrame(records, columns=self.columns)
+    
     def add_stock(self, stock_data):
-        """Add or update stock in portfolio"""
+        """Buy stock_data['quantity'] more of a symbol at its current price"""
+        symbol = stock_data['symbol']
+        holding = self._holding(symbol)
+        self._record_trade(symbol, 'buy', float(stock_data['quantity']), float(stock_data['price']), opening=holding)
+        quantity = stock_data['quantity'] + (holding[0] if holding is not None else 0)
         new_row = {
-            'symbol': stock_data['symbol'],
-            'quantity': stock_data['quantity'],
+            'symbol': symbol,
+            'quantity': quantity,
             'price': stock_data['price'],
-            'value': stock_data['price'] * stock_data['quantity'],
+            'value': stock_data['price'] * quantity,
             'day_return': stock_data.get('dayReturn', 0),
             'year_return': stock_data.get('yearReturn', 0),
-            'name': stock_data.get('name', stock_data['symbol']),
+            'name': stock_data.get('name', symbol),
             'currency': stock_data.get('currency', 'INR'),
-            'date_added': datetime.now().isoformat()
+            'date_added': holding[2] if holding is not None else datetime.now().isoformat(),
+            # Currency the symbol is quoted in; `price` and `currency` are already INR
+            'quote_currency': stock_data.get('originalCurrency') or fx_service.holding_currency(symbol)
         }
         
-        # Check if stock exists
-        mask = self._portfolio['symbol'] == stock_data['symbol']
-        if mask.any():
+        if holding is not None:
             # Update existing row
-            self._portfolio.loc[mask, self.columns] = list(new_row.values())
+            self._update_row(symbol, new_row)
         else:
             # Append new row
             new_df = pd.DataFrame([new_row], columns=self.columns)
@@ -52,13 +133,61 @@ class PortfolioDataStore:
         
         self.save_to_session()
     
-    def remove_stock(self, symbol):
-        """Remove stock from portfolio"""
+    def sell_stock(self, symbol, quantity, price):
+        """Sell part of a holding at `price` (INR)"""
+        holding = self._holding(symbol)
+        if holding is None:
+            raise ValueError(f"{symbol} is not in the portfolio")
+        if not math.isfinite(quantity) or quantity <= 0 or quantity > holding[0]:
+            raise ValueError(f"Can sell between 0 and {holding[0]:g} {symbol}")
+        if price is None:
+            raise ValueError(f"No price to sell {symbol} at")
+        self._record_trade(symbol, 'sell', quantity, price, opening=holding)
+        
+        remaining = holding[0] - quantity
+        if remaining <= 0:
+            self._portfolio = self._portfolio[self._portfolio['symbol'] != symbol].reset_index(drop=True)
+        else:
+            self._update_row(symbol, {'quantity': remaining, 'price': price, 'value': remaining * price})
+        self.save_to_session()
+    
+    def remove_stock(self, symbol, price=None):
+        """Remove stock from portfolio, selling the whole holding at `price` (INR; default: its last stored price)"""
+        holding = self._holding(symbol)
+        if holding is not None:
+            self._record_trade(symbol, 'sell', holding[0], holding[1] if price is None else price, opening=holding)
         self._portfolio = self._portfolio[
             self._portfolio['symbol'] != symbol
         ].reset_index(drop=True)
         self.save_to_session()  # Save changes to session
     
+    def replace_portfolio(self, portfolio_df):
+        """Replace all holdings (file upload), booking the differences as trades at the file's prices"""
+        quantities = pd.to_numeric(portfolio_df['quantity'], errors='coerce')
+        prices = pd.to_numeric(portfolio_df['price'], errors='coerce')
+        if not (np.isfinite(quantities).all() and np.isfinite(prices).all()) or (quantities < 0).any():
+            raise ValueError("Every holding needs a finite, non-negative quantity and price")
+        new = portfolio_df.assign(quantity=quantities, price=prices).groupby('symbol').agg(
+            quantity=('quantity', 'sum'), price=('price', 'last'))
+        trades = []
+        for symbol in sorted(set(self._portfolio['symbol']) | set(new.index)):
+            holding = self._holding(symbol)
+            target = float(new.loc[symbol, 'quantity']) if symbol in new.index else 0.0
+            held = holding[0] if holding is not None else 0.0
+            price = float(new.loc[symbol, 'price']) if symbol in new.index else holding[1]
+            side = 'buy' if target > held else 'sell'
+            trades.append((symbol, side, abs(target - held), price, holding))
+        # One transaction, so a bad row leaves both the ledger and the holdings as they were
+        self._record_trades(trades)
+        portfolio_df = portfolio_df.reindex(columns=self.columns)
+        # Resolve each quote currency once here, so valuations never look it up
+        portfolio_df['quote_currency'] = [
+            currency if isinstance(currency, str) and currency else fx_service.currency_of(symbol)
+            for symbol, currency in zip(portfolio_df['symbol'], portfolio_df['quote_currency'])
+        ]
+        self._portfolio = portfolio_df
+        self.save_to_session()
+    
     def get_portfolio(self):
         """Get current portfolio with clean data"""
         if hasattr(self, '_portfolio') and not self._portfolio.empty:
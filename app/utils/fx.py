@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+from .price_cache import price_cache
+from .symbol_metadata import symbol_metadata
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'INR'
+
+# Quotes in minor units (pence, cents, agorot) are scaled to the major currency
+MINOR_UNITS = {'GBp': ('GBP', 0.01), 'GBX': ('GBP', 0.01), 'ZAc': ('ZAR', 0.01), 'ILA': ('ILS', 0.01)}
+
+# Last-resort rates when the FX series cannot be downloaded
+FALLBACK_RATES = {'USD': 83.0}
+
+# Exchange suffixes whose listings are always quoted in the base currency
+BASE_CURRENCY_SUFFIXES = ('.NS', '.BO')
+
+class FXService:
+    """Rates into the base currency (INR) and vectorized conversion of price histories
+
+    Daily FX series come from the provider's '<CCY>INR=X' pairs through the
+    shared price cache, so they refresh on the same TTL as stock histories.
+    Histories are converted day by day at that day's rate rather than at
+    today's rate.
+    """
+
+    def __init__(self, base=BASE_CURRENCY, ttl_seconds=900, cache=None):
+        self.base = base
+        self.ttl_seconds = ttl_seconds
+        self.cache = cache if cache is not None else price_cache
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def pair_symbol(self, currency):
+        return f"{currency}{self.base}=X"
+
+    @staticmethod
+    def _major(currency):
+        """Map a quote currency to (major currency, scale)"""
+        return MINOR_UNITS.get(currency, (currency, 1.0))
+
+    def suffix_currency(self, symbol):
+        """Quote currency implied by the exchange suffix, or None"""
+        if symbol.upper().endswith(BASE_CURRENCY_SUFFIXES) or symbol.startswith('^NSE'):
+            return self.base
+        return None
+
+    def cached_currency_of(self, symbol):
+        """Quote currency of a symbol if known without an upstream call, else None"""
+        # The suffix is authoritative, so it wins over any stored row
+        currency = self.suffix_currency(symbol)
+        if currency is not None:
+            return currency
+        # Listings don't change currency, so an expired row is still good here
+        row = symbol_metadata.get(symbol, include_expired=True)
+        return row['currency'] if row is not None else None
+
+    def currency_of(self, symbol):
+        """Quote currency of a symbol from the metadata table"""
+        currency = self.cached_currency_of(symbol)
+        if currency is not None:
+            return currency
+        try:
+            return symbol_metadata.get_metadata(symbol)['currency']
+        except Exception as e:
+            logger.warning(f"Currency lookup failed for {symbol}, assuming {self.base}: {e}")
+            return self.base
+
+    def holding_currency(self, symbol, quote_currency=None):
+        """Quote currency of a holding for valuation loops, never calling upstream
+
+        Prefers the currency stored with the holding when it was added, then
+        the cached metadata, then assumes the base currency.
+        """
+        if isinstance(quote_currency, str) and quote_currency not in ('', 'nan', 'None'):
+            return quote_currency
+        currency = self.cached_currency_of(symbol)
+        if currency is None:
+            logger.warning(f"Currency of {symbol} not resolved yet, assuming {self.base}")
+            return self.base
+        return currency
+
+    def get_rate_history(self, currency):
+        """Daily series of base-currency units per unit of `currency`"""
+        major, scale = self._major(currency)
+        if major == self.base:
+            return pd.Series(dtype=float)
+
+        history = self.cache.get_history(self.pair_symbol(major))
+        if history.empty:
+            return pd.Series(dtype=float)
+        rates = history['Close'].dropna()
+        rates.index = self._day_index(rates.index)
+        return rates[~rates.index.duplicated(keep='last')] * scale
+
+    def pair_symbols(self, symbols):
+        """FX series symbols needed to value `symbols`, or None if a currency is not known yet"""
+        pairs = set()
+        for symbol in symbols:
+            currency = self.cached_currency_of(symbol)
+            if currency is None:
+                return None
+            major = self._major(currency)[0]
+            if major != self.base:
+                pairs.add(self.pair_symbol(major))
+        return pairs
+
+    def get_rate(self, currency):
+        """Latest base-currency units per unit of `currency`"""
+        major, scale = self._major(currency)
+        if major == self.base:
+            return scale
+
+        now = time.time()
+        with self._lock:
+            entry = self._rates.get(currency)
+        if entry is not None and now - entry[0] < self.ttl_seconds:
+            return entry[1]
+
+        rates = self.get_rate_history(currency)
+        if not rates.empty:
+            rate = float(rates.iloc[-1])
+        elif entry is not None:
+            # Keep the last good rate rather than dropping to the fallback
+            return entry[1]
+        elif major in FALLBACK_RATES:
+            logger.warning(f"No FX data for {currency}, using fallback rate {FALLBACK_RATES[major]}")
+            return FALLBACK_RATES[major] * scale
+        else:
+            raise ValueError(f"No FX rate available for {currency}")
+
+        with self._lock:
+            self._rates[currency] = (now, rate)
+        return rate
+
+    @staticmethod
+    def _day_index(index):
+        """Calendar days of a (possibly tz-aware) DatetimeIndex, for matching across exchanges"""
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.normalize()
+
+    def _aligned_rates(self, index, currency):
+        """Rate for every date in `index`, carrying the last known rate over FX holidays"""
+        rates = self.get_rate_history(currency)
+        if rates.empty:
+            return np.full(len(index), self.get_rate(currency))
+        days = self._day_index(index)
+        aligned = rates.reindex(rates.index.union(days)).ffill().bfill().reindex(days)
+        return aligned.to_numpy(dtype=float)
+
+    def convert_history(self, prices, currency):
+        """Convert a price Series or DataFrame from `currency` into the base currency"""
+        major, scale = self._major(currency)
+        if major == self.base:
+            return prices * scale if scale != 1.0 else prices
+        rates = self._aligned_rates(prices.index, currency)
+        if isinstance(prices, pd.DataFrame):
+            return prices.mul(rates, axis=0)
+        return prices * rates
+
+    def convert_panel(self, panel, symbols, currencies=None):
+        """Convert a date x symbol close panel, one multiply per currency group
+
+        `currencies` maps symbols to their stored quote currency, if known.
+        """
+        converted = panel.copy()
+        currencies = currencies or {}
+        by_currency = {}
+        for symbol in symbols:
+            by_currency.setdefault(self.holding_currency(symbol, currencies.get(symbol)), []).append(symbol)
+        for currency, columns in by_currency.items():
+            if self._major(currency) == (self.base, 1.0):
+                continue
+            rates = self._aligned_rates(panel.index, currency)
+            converted[columns] = panel[columns].to_numpy(dtype=float) * rates[:, None]
+        return converted
+
+# Create global instance
+fx_service = FXService()
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def content_etag(*parts):
+    """Strong ETag for a response derived from the versions of everything it depends on"""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+def _http_date(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(microsecond=0)
+
+def conditional(validators):
+    """Answer conditional GETs with 304 before the view runs when its inputs have not changed
+
+    `validators` is called before the view and returns (etag, last_modified
+    timestamp), or None when some input is not cached yet and the response
+    cannot be versioned without computing it. It is called again after the
+    view has run, so a response that warmed the caches still carries
+    validators for the next request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                current = validators()
+            except Exception as e:
+                logger.warning(f"Could not compute validators for {request.path}: {e}")
+                current = None
+
+            if current is not None:
+                etag, last_modified = current
+                if not is_resource_modified(request.environ, etag=etag, last_modified=_http_date(last_modified)):
+                    metrics.inc('http_not_modified_total', endpoint=request.endpoint)
+                    response = make_response('', 304)
+                    _set_validators(response, etag, last_modified)
+                    return response
+
+            before = current
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                try:
+                    current = validators()
+                except Exception as e:
+                    logger.warning(f"Could not compute validators for {request.path}: {e}")
+                    current = None
+                # An input that changed while the view ran may not be reflected in the body
+                if current is not None and before in (None, current):
+                    _set_validators(response, *current)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = _http_date(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
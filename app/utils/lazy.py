@@ -0,0 +1,24 @@
+import importlib
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Import a module whose body only runs on first attribute access
+
+    Keeps heavy dependencies (yfinance pulls in requests, curl_cffi, etc.) off
+    the startup path for processes and requests that never touch them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        # Let the regular import raise the usual ModuleNotFoundError
+        return importlib.import_module(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
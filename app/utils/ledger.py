@@ -0,0 +1,227 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get('LEDGER_DB', os.path.join(os.getcwd(), 'ledger.db'))
+
+COST_METHODS = ('fifo', 'average')
+
+# Quantities closer than this to zero are treated as flat
+QUANTITY_EPSILON = 1e-9
+
+class TransactionLedger:
+    """Append-only trade ledger with running cost basis and P&L per position
+
+    Every buy and sell is appended to `transactions`. Buys open a lot; sells
+    close the oldest open lots first. A `positions` row per symbol keeps the
+    running quantity, cost basis and realized P&L under both FIFO and
+    average cost, updated in the same SQLite transaction as the trade. A
+    trade therefore costs O(1) amortized (each lot is closed at most once),
+    and reading P&L never replays the history.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        # Autocommit mode so trades can take the write lock up front with BEGIN IMMEDIATE
+        connection = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        if not self._initialized:
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS transactions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, portfolio_id TEXT, symbol TEXT, side TEXT, "
+                "quantity REAL, price REAL, executed_at REAL);"
+                "CREATE INDEX IF NOT EXISTS transactions_by_portfolio ON transactions (portfolio_id, symbol, id);"
+                "CREATE TABLE IF NOT EXISTS lots ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, portfolio_id TEXT, symbol TEXT, "
+                "quantity REAL, price REAL, opened_at REAL);"
+                "CREATE INDEX IF NOT EXISTS open_lots ON lots (portfolio_id, symbol, id);"
+                "CREATE TABLE IF NOT EXISTS positions ("
+                "portfolio_id TEXT, symbol TEXT, quantity REAL, fifo_cost REAL, average_cost REAL, "
+                "realized_fifo REAL, realized_average REAL, updated_at REAL, "
+                "PRIMARY KEY (portfolio_id, symbol))"
+            )
+            self._initialized = True
+        return connection
+
+    @staticmethod
+    def _position(connection, portfolio_id, symbol):
+        row = connection.execute(
+            "SELECT quantity, fifo_cost, average_cost, realized_fifo, realized_average "
+            "FROM positions WHERE portfolio_id = ? AND symbol = ?",
+            (portfolio_id, symbol)
+        ).fetchone()
+        return list(row) if row is not None else [0.0, 0.0, 0.0, 0.0, 0.0]
+
+    @staticmethod
+    def _validate(side, quantity, price):
+        """(quantity, price) as floats; raises ValueError for an unknown side or a non-finite, non-positive amount"""
+        if side not in ('buy', 'sell'):
+            raise ValueError(f"Unknown side: {side}")
+        quantity = float(quantity)
+        price = float(price)
+        if not (math.isfinite(quantity) and math.isfinite(price)) or quantity <= 0 or price < 0:
+            raise ValueError("Quantity must be positive and price non-negative")
+        return quantity, price
+
+    def _apply(self, connection, portfolio_id, symbol, side, quantity, price, executed_at):
+        """Append one validated trade and update its position inside the caller's transaction"""
+        held, fifo_cost, average_cost, realized_fifo, realized_average = self._position(connection, portfolio_id, symbol)
+        if side == 'buy':
+            connection.execute(
+                "INSERT INTO lots (portfolio_id, symbol, quantity, price, opened_at) VALUES (?, ?, ?, ?, ?)",
+                (portfolio_id, symbol, quantity, price, executed_at)
+            )
+            held += quantity
+            fifo_cost += quantity * price
+            average_cost += quantity * price
+        else:
+            if quantity > held + QUANTITY_EPSILON:
+                raise ValueError(f"Cannot sell {quantity:g} {symbol}, only {held:g} held")
+            quantity = min(quantity, held)
+            # Average cost: the sold units carry the position's mean cost
+            unit_cost = average_cost / held if held else 0.0
+            realized_average += quantity * (price - unit_cost)
+            average_cost -= quantity * unit_cost
+            # FIFO: close the oldest lots first
+            remaining = quantity
+            while remaining > QUANTITY_EPSILON:
+                # Read a few lots at a time so a sell only touches the lots it closes
+                lots = connection.execute(
+                    "SELECT id, quantity, price FROM lots WHERE portfolio_id = ? AND symbol = ? ORDER BY id LIMIT 32",
+                    (portfolio_id, symbol)
+                ).fetchall()
+                if not lots:
+                    break
+                for lot_id, lot_quantity, lot_price in lots:
+                    closed = min(lot_quantity, remaining)
+                    realized_fifo += closed * (price - lot_price)
+                    fifo_cost -= closed * lot_price
+                    remaining -= closed
+                    if lot_quantity - closed <= QUANTITY_EPSILON:
+                        connection.execute("DELETE FROM lots WHERE id = ?", (lot_id,))
+                    else:
+                        connection.execute("UPDATE lots SET quantity = ? WHERE id = ?", (lot_quantity - closed, lot_id))
+                    if remaining <= QUANTITY_EPSILON:
+                        break
+            held -= quantity
+            if held <= QUANTITY_EPSILON:
+                held, fifo_cost, average_cost = 0.0, 0.0, 0.0
+
+        connection.execute(
+            "INSERT INTO transactions (portfolio_id, symbol, side, quantity, price, executed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (portfolio_id, symbol, side, quantity, price, executed_at)
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO positions (portfolio_id, symbol, quantity, fifo_cost, average_cost, "
+            "realized_fifo, realized_average, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (portfolio_id, symbol, held, fifo_cost, average_cost, realized_fifo, realized_average, time.time())
+        )
+        return {'symbol': symbol, 'quantity': held, 'fifo_cost': fifo_cost, 'average_cost': average_cost,
+                'realized_fifo': realized_fifo, 'realized_average': realized_average}
+
+    def record(self, portfolio_id, symbol, side, quantity, price, executed_at=None):
+        """Append a buy or sell and update the position; returns the updated position"""
+        return self.record_many(portfolio_id, [(symbol, side, quantity, price, executed_at)])[0]
+
+    def record_many(self, portfolio_id, trades, openings=()):
+        """Book several trades in one transaction: all of them or, on any error, none
+
+        `trades` are (symbol, side, quantity, price, executed_at) tuples.
+        `openings` are (symbol, quantity, price, executed_at) balances the
+        ledger is first brought to, as reconcile() does, inside the same
+        transaction. Returns the updated position after each trade.
+        """
+        trades = [
+            (symbol, side, *self._validate(side, quantity, price), time.time() if executed_at is None else executed_at)
+            for symbol, side, quantity, price, executed_at in trades
+        ]
+
+        with self._lock, closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for symbol, quantity, price, executed_at in openings:
+                    difference = float(quantity) - self._position(connection, portfolio_id, symbol)[0]
+                    if not abs(difference) <= QUANTITY_EPSILON:
+                        side = 'buy' if difference > 0 else 'sell'
+                        opening_quantity, opening_price = self._validate(side, abs(difference), price)
+                        self._apply(connection, portfolio_id, symbol, side, opening_quantity, opening_price,
+                                    time.time() if executed_at is None else executed_at)
+                positions = [self._apply(connection, portfolio_id, *trade) for trade in trades]
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return positions
+
+    def held_quantity(self, portfolio_id, symbol):
+        with closing(self._connect()) as connection:
+            return self._position(connection, portfolio_id, symbol)[0]
+
+    def reconcile(self, portfolio_id, symbol, quantity, price, executed_at=None):
+        """Record the buy or sell that brings the ledger to `quantity` (opening balances for older holdings)"""
+        difference = float(quantity) - self.held_quantity(portfolio_id, symbol)
+        if difference > QUANTITY_EPSILON:
+            return self.record(portfolio_id, symbol, 'buy', difference, price, executed_at)
+        if difference < -QUANTITY_EPSILON:
+            return self.record(portfolio_id, symbol, 'sell', -difference, price, executed_at)
+        return None
+
+    def positions(self, portfolio_id, prices, method='fifo'):
+        """Cost basis and realized/unrealized P&L per symbol, valued at `prices` (symbol -> price)"""
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown cost method: {method}")
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT symbol, quantity, fifo_cost, average_cost, realized_fifo, realized_average "
+                "FROM positions WHERE portfolio_id = ? ORDER BY symbol",
+                (portfolio_id,)
+            ).fetchall()
+
+        positions = []
+        for symbol, quantity, fifo_cost, average_cost, realized_fifo, realized_average in rows:
+            cost_basis = fifo_cost if method == 'fifo' else average_cost
+            realized = realized_fifo if method == 'fifo' else realized_average
+            price = prices.get(symbol)
+            if quantity <= QUANTITY_EPSILON:
+                market_value = 0.0
+            else:
+                market_value = quantity * price if price is not None else None
+            positions.append({
+                'symbol': symbol,
+                'quantity': quantity,
+                'cost_basis': cost_basis,
+                'average_price': cost_basis / quantity if quantity else 0.0,
+                'market_value': market_value,
+                'realized_pnl': realized,
+                'unrealized_pnl': market_value - cost_basis if market_value is not None else None,
+            })
+        return positions
+
+    def transactions(self, portfolio_id, symbol=None, limit=100):
+        """Most recent transactions first"""
+        query = "SELECT id, symbol, side, quantity, price, executed_at FROM transactions WHERE portfolio_id = ?"
+        params = [portfolio_id]
+        if symbol is not None:
+            query += " AND symbol = ?"
+            params.append(symbol)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query, params).fetchall()
+        return [
+            {'id': r[0], 'symbol': r[1], 'side': r[2], 'quantity': r[3], 'price': r[4], 'executed_at': r[5]}
+            for r in rows
+        ]
+
+# Create global instance
+ledger = TransactionLedger()
@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+from datetime import date, datetime
+from numbers import Number
+from urllib.parse import urlsplit
+import pandas as pd
+from .circuit_breaker import CircuitOpenError, circuit_breakers
+from .lazy import lazy_import
+from .metrics import metrics
+from .single_flight import upstream_flight
+
+logger = logging.getLogger(__name__)
+yf = lazy_import('yfinance')
+
+YAHOO_DOMAIN = 'yahoo.com'
+
+# Upper bound on any single upstream request; yfinance's own defaults are 10-30s
+UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get('UPSTREAM_TIMEOUT_SECONDS', 5))
+
+# Cookie and consent hosts are optional for the data endpoints, so give up on them sooner
+HOST_TIMEOUTS = {
+    'fc.yahoo.com': 2.0,
+    'guce.yahoo.com': 2.0,
+    'consent.yahoo.com': 2.0,
+}
+
+class UpstreamUnavailableError(Exception):
+    """The provider could not be reached, as opposed to having no data"""
+
+_guard_lock = threading.Lock()
+_guard_installed = False
+_endpoint_base_url = None
+_request_state = threading.local()
+
+def _host_timeout(host):
+    return HOST_TIMEOUTS.get(host, UPSTREAM_TIMEOUT_SECONDS)
+
+def _record_upstream_failure(host):
+    metrics.inc('upstream_errors_total', host=host)
+    _request_state.failures = getattr(_request_state, 'failures', 0) + 1
+
+def install_upstream_guard():
+    """Wrap every yfinance HTTP request with a per-host timeout cap and circuit breaker
+
+    yfinance builds new sessions internally (yf.download does per call), so
+    the wrapper is installed on the HTTP backend's Session class rather than
+    one session. yfinance logs and swallows transport errors, returning an
+    empty frame; failures are therefore also noted per thread so the fetch
+    helpers can tell an outage from a symbol without data.
+    """
+    global _guard_installed
+    with _guard_lock:
+        if _guard_installed:
+            return
+        from yfinance._http import new_session
+
+        session_class = type(new_session())
+        original_request = session_class.request
+
+        def request(self, method, url, *args, **kwargs):
+            parts = urlsplit(url)
+            host = parts.hostname or ''
+            if _endpoint_base_url and host.endswith(YAHOO_DOMAIN):
+                url = _endpoint_base_url + (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+            limit = _host_timeout(host)
+            timeout = kwargs.get('timeout')
+            kwargs['timeout'] = min(timeout, limit) if isinstance(timeout, Number) and timeout > 0 else limit
+
+            breaker = circuit_breakers.get(host)
+            try:
+                breaker.check()
+            except CircuitOpenError:
+                _record_upstream_failure(host)
+                raise
+            try:
+                response = original_request(self, method, url, *args, **kwargs)
+            except Exception:
+                breaker.record_failure()
+                _record_upstream_failure(host)
+                raise
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+                _record_upstream_failure(host)
+            else:
+                breaker.record_success()
+            return response
+
+        session_class.request = request
+        _guard_installed = True
+
+def _guarded(download):
+    """Run a download, raising UpstreamUnavailableError if it came back empty because of upstream failures"""
+    install_upstream_guard()
+    _request_state.failures = 0
+    try:
+        result = download()
+    except Exception as e:
+        if _request_state.failures:
+            raise UpstreamUnavailableError(f"Market data provider unavailable: {e}") from e
+        raise
+    if (result is None or len(result) == 0) and _request_state.failures:
+        raise UpstreamUnavailableError(f"Market data provider unavailable ({_request_state.failures} failed requests)")
+    return result
+
+def _day(value):
+    """Calendar day of a start/end bound, so requests made moments apart share a key"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _download_history(symbol, kwargs):
+    with metrics.timer('upstream_fetch_seconds', endpoint='history'):
+        return _guarded(lambda: yf.Ticker(symbol).history(**kwargs))
+
+def fetch_history(symbol, period=None, interval='1d', start=None, end=None):
+    """Download a price history, sharing one download between concurrent identical requests
+
+    Requests for the same (symbol, period/range, interval) that arrive while
+    a download is in flight wait for it instead of starting their own.
+    Start and end are compared by calendar day. Callers that joined another
+    request's download get their own copy, since some callers modify it.
+    Raises UpstreamUnavailableError when the provider could not be reached.
+    """
+    kwargs = {'interval': interval}
+    if period is not None:
+        kwargs['period'] = period
+    if start is not None:
+        kwargs['start'] = start
+    if end is not None:
+        kwargs['end'] = end
+
+    key = ('history', symbol, period, interval, _day(start), _day(end))
+    history, shared = upstream_flight.do(key, _download_history, symbol, kwargs)
+    if shared:
+        metrics.inc('upstream_coalesced_total', endpoint='history')
+        return history.copy()
+    return history
+
+def _download_closes(symbols, kwargs):
+    with metrics.timer('upstream_fetch_seconds', endpoint='download'):
+        data = _guarded(lambda: yf.download(symbols, progress=False, threads=True, auto_adjust=True, **kwargs))
+    if data is None or data.empty:
+        return pd.DataFrame(columns=symbols)
+    if isinstance(data.columns, pd.MultiIndex):
+        closes = data['Close']
+    else:
+        closes = data[['Close']].set_axis(symbols[:1], axis=1)
+    return closes.reindex(columns=symbols)
+
+def fetch_closes(symbols, period='1y', interval='1d'):
+    """Download daily closes for many symbols in one batched request (date x symbol frame)
+
+    Symbols the provider had no data for come back as all-NaN columns.
+    Concurrent requests for the same symbol set share one download.
+    """
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return pd.DataFrame()
+    key = ('download', tuple(symbols), period, interval)
+    closes, shared = upstream_flight.do(key, _download_closes, symbols, {'period': period, 'interval': interval})
+    if shared:
+        metrics.inc('upstream_coalesced_total', endpoint='download')
+        return closes.copy()
+    return closes
+
+def _download_info(symbol):
+    with metrics.timer('upstream_fetch_seconds', endpoint='info'):
+        return _guarded(lambda: yf.Ticker(symbol).info)
+
+def fetch_info(symbol):
+    """Fetch a symbol's info payload, sharing one request between concurrent callers"""
+    info, shared = upstream_flight.do(('info', symbol), _download_info, symbol)
+    if shared:
+        metrics.inc('upstream_coalesced_total', endpoint='info')
+        return dict(info)
+    return info
+
+def use_market_data_endpoint(base_url):
+    """Send every yfinance request for a Yahoo host to base_url instead
+
+    Used to point the app at a local stub market-data server for load tests;
+    the request path and query string are kept as-is.
+    """
+    from yfinance.data import YfData
+
+    global _endpoint_base_url
+    _endpoint_base_url = base_url.rstrip('/')
+    install_upstream_guard()
+    # Drop any crumb fetched from the real endpoints before the switch
+    YfData()._crumb = None
+    logger.info(f"Market data requests redirected to {_endpoint_base_url}")
@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms rendered in Prometheus text format"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Record one observation in a histogram"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time a block into a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_cache(self, cache, hit):
+        """Count a cache lookup; hit ratio is hits / (hits + misses)"""
+        self.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        """Render every metric in the Prometheus exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+
+        lines = []
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), (bucket_counts, count, total) in sorted(histograms.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+# Create global instance
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'Route latency including template rendering')
+metrics.describe('template_render_seconds', 'Time spent rendering Jinja templates')
+metrics.describe('upstream_fetch_seconds', 'Market data download latency per endpoint (history, info, batch download)')
+metrics.describe('analytics_compute_seconds', 'Analytics computation time per engine')
+metrics.describe('cache_requests_total', 'Cache lookups by cache and result')
+metrics.describe('upstream_coalesced_total', 'Upstream fetches that joined an identical fetch already in flight')
+metrics.describe('upstream_errors_total', 'Failed or rejected upstream HTTP requests per host')
+metrics.describe('circuit_breaker_transitions_total', 'Circuit breaker state changes per upstream host')
+metrics.describe('circuit_breaker_rejections_total', 'Upstream requests rejected by an open circuit')
+metrics.describe('stale_served_total', 'Cached values served past their TTL, by reason')
+metrics.describe('http_not_modified_total', 'Conditional GETs answered with 304 before the view ran')
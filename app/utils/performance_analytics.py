@@ -1,7 +1,13 @@
+import logging
 import pandas as pd
 import numpy as np
-import yfinance as yf
-from datetime import datetime, timedelta
+from .metrics import metrics as analytics_metrics
+from .fx import fx_service
+from .market_data import UpstreamUnavailableError
+from .price_cache import price_cache
+from .proxy_model import proxy_model
+
+logger = logging.getLogger(__name__)
 
 class PerformanceAnalytics:
     def __init__(self):
@@ -12,21 +18,20 @@ class PerformanceAnalytics:
     def get_benchmark_day_return(self):
         """Get NIFTY 50 1-day return percentage"""
         try:
-            print("Fetching NIFTY 50 day return...")
-            nifty = yf.Ticker('^NSEI')
-            hist = nifty.history(period='5d')  # Get more days to ensure we have data
+            logger.debug("Fetching NIFTY 50 day return...")
+            hist = price_cache.get_history(self.benchmark)
             
             if len(hist) >= 2:
                 today_close = float(hist['Close'].iloc[-1])
                 yesterday_close = float(hist['Close'].iloc[-2])
                 day_return = ((today_close - yesterday_close) / yesterday_close) * 100
-                print(f"NIFTY day return: {day_return:.2f}%")
+                logger.debug(f"NIFTY day return: {day_return:.2f}%")
                 return float(day_return)
             else:
-                print("Not enough NIFTY data available")
+                logger.warning("Not enough NIFTY data available")
                 return 0.0
         except Exception as e:
-            print(f"Error getting benchmark day return: {e}")
+            logger.error(f"Error getting benchmark day return: {e}")
             return 0.0
 
     def calculate_max_drawdown(self, values):
@@ -50,7 +55,7 @@ class PerformanceAnalytics:
             return float(max_drawdown)
             
         except Exception as e:
-            print(f"Error calculating max drawdown: {e}")
+            logger.error(f"Error calculating max drawdown: {e}")
             return 0.0
 
     def calculate_portfolio_beta(self, portfolio_returns, benchmark_returns):
@@ -72,7 +77,7 @@ class PerformanceAnalytics:
                 return 1.0
                 
         except Exception as e:
-            print(f"Error calculating beta: {e}")
+            logger.error(f"Error calculating beta: {e}")
             return 1.0
 
     def calculate_value_at_risk(self, returns, portfolio_value, confidence_level=0.01):
@@ -81,15 +86,14 @@ class PerformanceAnalytics:
             if len(returns) < 2:
                 return {'var_percent': 0.0, 'var_value': 0.0}
             
-            # Sort returns in ascending order
-            sorted_returns = np.sort(returns)
-            
             # Find the percentile corresponding to the confidence level (1% for 99% confidence)
-            var_index = int(confidence_level * len(sorted_returns))
-            var_percent = sorted_returns[var_index] * 100  # Convert to percentage
+            # Partial partition is enough to place the VaR order statistic
+            var_index = int(confidence_level * len(returns))
+            var_return = np.partition(np.asarray(returns, dtype=float), var_index)[var_index]
+            var_percent = var_return * 100  # Convert to percentage
             
             # Calculate VaR in value terms
-            var_value = portfolio_value * sorted_returns[var_index]  # Actual currency loss
+            var_value = portfolio_value * var_return  # Actual currency loss
             
             return {
                 'var_percent': float(var_percent),
@@ -97,109 +101,81 @@ class PerformanceAnalytics:
             }
             
         except Exception as e:
-            print(f"Error calculating VaR: {e}")
+            logger.error(f"Error calculating VaR: {e}")
             return {'var_percent': 0.0, 'var_value': 0.0}
 
     def get_portfolio_returns(self, portfolio_df):
-        print(portfolio_df)
+        """Value the holdings' current weights over the benchmark's history
+
+        Closes come from the shared close panel (one memory-mapped matrix
+        for all workers) rather than per-holding history frames. Symbols
+        without history, or with history starting late, are filled in with
+        the proxy model; holdings the provider can't serve at all are left
+        out and reported in stale_symbols.
+        """
+        logger.debug("Computing performance for portfolio:\n%s", portfolio_df)
         try:
             if portfolio_df.empty:
                 return self._get_empty_data()
 
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=5*365)
-
-            # Get NIFTY 50 benchmark data first
-            nifty = yf.Ticker('^NSEI')
-            nifty_data = nifty.history(start=start_date, end=end_date)
+            # Get NIFTY 50 benchmark data first; cached copies are served while the provider is down
+            nifty_data, benchmark_stale = price_cache.lookup(self.benchmark)
+            stale_symbols = [self.benchmark] if benchmark_stale else []
             
             if nifty_data.empty:
                 return self._get_empty_data()
 
-            # Calculate benchmark returns for imputation
-            nifty_returns = nifty_data['Close'].pct_change().fillna(0)
+            weights = pd.to_numeric(portfolio_df['value'], errors='coerce').fillna(0).groupby(portfolio_df['symbol']).sum()
+            weights = weights / weights.sum()
+            currencies = {}
+            if 'quote_currency' in portfolio_df.columns:
+                currencies = portfolio_df.groupby('symbol')['quote_currency'].last().to_dict()
 
-            # Get portfolio stock data with imputation
-            portfolio_stocks = {}
-            for _, row in portfolio_df.iterrows():
-                symbol = row['symbol']
-                weight = row['value'] / portfolio_df['value'].sum()  # Portfolio weight
+            # Make sure each history is cached (or known to be unavailable) before the panel is built
+            symbols = []
+            for symbol in weights.index:
                 try:
-                    stock = yf.Ticker(symbol)
-                    stock_data = stock.history(start=start_date, end=end_date)
-                    
-                    if not stock_data.empty:
-                        # Align stock data with benchmark dates and impute missing values
-                        stock_data_aligned = self._align_and_impute_data(
-                            stock_data, nifty_data, nifty_returns, symbol
-                        )
-                        portfolio_stocks[symbol] = {
-                            'data': stock_data_aligned,
-                            'weight': weight
-                        }
-                    else:
-                        # If no stock data available, create synthetic data using benchmark
-                        print(f"No data for {symbol}, using benchmark as proxy")
-                        synthetic_data = self._create_synthetic_data(nifty_data, symbol)
-                        portfolio_stocks[symbol] = {
-                            'data': synthetic_data,
-                            'weight': weight
-                        }
-                except Exception as e:
-                    print(f"Error getting data for {symbol}: {e}")
-                    # Create synthetic data using benchmark as fallback
-                    synthetic_data = self._create_synthetic_data(nifty_data, symbol)
-                    portfolio_stocks[symbol] = {
-                        'data': synthetic_data,
-                        'weight': weight
-                    }
+                    _, stale = price_cache.lookup(symbol)
+                except UpstreamUnavailableError as e:
+                    # Neither fresh nor cached data: leave it out rather than value a proxy
+                    logger.warning(f"{symbol} left out of the performance history: {e}")
+                    stale_symbols.append(symbol)
+                    continue
+                if stale:
+                    stale_symbols.append(symbol)
+                symbols.append(symbol)
 
-            # Calculate portfolio and benchmark values for each date
-            portfolio_values = []
-            benchmark_values = []
-            dates = []
-            
-            # Get initial prices for normalization
-            initial_nifty_price = nifty_data['Close'].iloc[0]
-            
-            for i, date in enumerate(nifty_data.index):
-                dates.append(date.strftime('%Y-%m-%d'))
-                
-                # Calculate portfolio value on this date
-                portfolio_value = 0.0
-                total_weight = 0.0
-                
-                for symbol, stock_info in portfolio_stocks.items():
-                    stock_data = stock_info['data']
-                    weight = stock_info['weight']
-                    
-                    # Get stock price on this date
-                    if date in stock_data.index:
-                        # Calculate return from initial price
-                        initial_stock_price = stock_data['Close'].iloc[0]
-                        current_stock_price = stock_data.loc[date, 'Close']
-                        stock_return = (current_stock_price / initial_stock_price) - 1
-                        
-                        # Add weighted contribution to portfolio
-                        portfolio_value += self.initial_value * (1 + stock_return) * weight
-                        total_weight += weight
-                
-                # Normalize if we don't have complete weight coverage
-                if total_weight > 0 and total_weight != 1.0:
-                    portfolio_value = self.initial_value + (portfolio_value - self.initial_value) * (1 / total_weight)
-                elif total_weight == 0:
-                    portfolio_value = self.initial_value
-                
-                portfolio_values.append(float(portfolio_value))
-                
-                # Calculate benchmark value (NIFTY 50)
-                current_nifty_price = nifty_data['Close'].iloc[i]
-                nifty_return = (current_nifty_price / initial_nifty_price) - 1
-                benchmark_value = self.initial_value * (1 + nifty_return)
-                benchmark_values.append(float(benchmark_value))
+            panel, nifty_close = price_cache.get_close_panel(symbols, self.benchmark)
+            if nifty_close.empty:
+                return self._get_empty_data()
+            # Value foreign listings in INR at each day's rate
+            panel = fx_service.convert_panel(panel.astype(float), symbols, currencies)
+
+            with analytics_metrics.timer('analytics_compute_seconds', engine='portfolio_valuation'):
+                for symbol in symbols:
+                    column = panel[symbol]
+                    if column.isna().any():
+                        if column.isna().all():
+                            logger.warning(f"No data for {symbol}, using the proxy model")
+                        panel[symbol] = proxy_model.impute(symbol, column.dropna() if column.notna().any() else None, nifty_close)
+
+                # Each holding's growth since the first day, weighted by today's allocation
+                held = weights.reindex(symbols).to_numpy(dtype=float)
+                if len(symbols) and held.sum() > 0:
+                    closes = panel[symbols].to_numpy(dtype=float)
+                    growth = closes / closes[0]
+                    portfolio_values = self.initial_value * (growth @ held) / held.sum()
+                else:
+                    portfolio_values = np.full(len(nifty_close), float(self.initial_value))
+                benchmark_values = self.initial_value * nifty_close.to_numpy(dtype=float) / float(nifty_close.iloc[0])
+
+            dates = [date.strftime('%Y-%m-%d') for date in nifty_close.index]
+            portfolio_values = [float(v) for v in portfolio_values]
+            benchmark_values = [float(v) for v in benchmark_values]
 
             # Calculate performance metrics including max drawdown
-            metrics = self._calculate_performance_metrics(portfolio_values, benchmark_values)
+            with analytics_metrics.timer('analytics_compute_seconds', engine='performance_metrics'):
+                metrics = self._calculate_performance_metrics(portfolio_values, benchmark_values)
 
             return {
                 'portfolio_hist': {
@@ -210,103 +186,42 @@ class PerformanceAnalytics:
                     'index': dates,
                     'values': benchmark_values
                 },
-                'metrics': metrics
+                'metrics': metrics,
+                'stale_symbols': stale_symbols
             }
         except Exception as e:
-            print(f"Error in performance analytics: {e}")
+            logger.error(f"Error in performance analytics: {e}")
             return self._get_empty_data()
 
-    def _align_and_impute_data(self, stock_data, benchmark_data, benchmark_returns, symbol):
-        """Align stock data with benchmark and impute missing values using benchmark returns"""
-        try:
-            # Reindex stock data to match benchmark dates
-            stock_aligned = stock_data.reindex(benchmark_data.index)
-            
-            # Forward fill first to handle gaps
-            stock_aligned['Close'] = stock_aligned['Close'].fillna(method='ffill')
-            
-            # Calculate stock returns
-            stock_returns = stock_aligned['Close'].pct_change()
-            
-            # Find missing data points
-            missing_mask = stock_aligned['Close'].isna()
-            
-            if missing_mask.any():
-                print(f"Imputing {missing_mask.sum()} missing data points for {symbol}")
-                
-                # Get the last known price before missing data
-                last_known_price = None
-                imputed_prices = stock_aligned['Close'].copy()
-                
-                for i, (date, is_missing) in enumerate(missing_mask.items()):
-                    if is_missing:
-                        if last_known_price is None:
-                            # If missing from the start, use benchmark initial price scaled
-                            if i > 0:
-                                # Use previous benchmark return to estimate
-                                benchmark_return = benchmark_returns.iloc[i]
-                                prev_price = imputed_prices.iloc[i-1]
-                                if pd.notna(prev_price):
-                                    # Apply benchmark return to last known price
-                                    imputed_prices.iloc[i] = prev_price * (1 + benchmark_return)
-                                else:
-                                    # Use benchmark price as proxy
-                                    imputed_prices.iloc[i] = benchmark_data['Close'].iloc[i]
-                            else:
-                                imputed_prices.iloc[i] = benchmark_data['Close'].iloc[i]
-                        else:
-                            # Use benchmark return to estimate missing price
-                            benchmark_return = benchmark_returns.iloc[i]
-                            imputed_prices.iloc[i] = last_known_price * (1 + benchmark_return)
-                    else:
-                        last_known_price = imputed_prices.iloc[i]
-                
-                stock_aligned['Close'] = imputed_prices
-                
-                # Recalculate other OHLV data based on Close price
-                for col in ['Open', 'High', 'Low']:
-                    if col in stock_aligned.columns:
-                        stock_aligned[col] = stock_aligned[col].fillna(stock_aligned['Close'])
-                
-                if 'Volume' in stock_aligned.columns:
-                    # Use median volume for missing volume data
-                    median_volume = stock_aligned['Volume'].median()
-                    stock_aligned['Volume'] = stock_aligned['Volume'].fillna(median_volume)
-            
-            return stock_aligned
-            
-        except Exception as e:
-            print(f"Error in data alignment for {symbol}: {e}")
-            return stock_data
+    def get_snapshot_returns(self, snapshots):
+        """Performance from stored daily snapshots (value_snapshots.get_series), or None if too few
 
-    def _create_synthetic_data(self, benchmark_data, symbol):
-        """Create synthetic stock data using benchmark as a proxy"""
-        try:
-            synthetic_data = benchmark_data.copy()
-            
-            # Add some random variation to differentiate from pure benchmark
-            # This simulates stock-specific risk while maintaining market correlation
-            np.random.seed(hash(symbol) % 2**32)  # Consistent seed based on symbol
-            
-            # Generate random factors (mean 1, small standard deviation)
-            random_factors = np.random.normal(1, 0.1, len(benchmark_data))
-            
-            # Apply random factors to create stock-specific variation
-            for col in ['Open', 'High', 'Low', 'Close']:
-                if col in synthetic_data.columns:
-                    synthetic_data[col] = synthetic_data[col] * random_factors
-            
-            # Keep volume similar to benchmark but with variation
-            if 'Volume' in synthetic_data.columns:
-                volume_factors = np.random.normal(1, 0.3, len(benchmark_data))
-                synthetic_data['Volume'] = synthetic_data['Volume'] * np.abs(volume_factors)
-            
-            print(f"Created synthetic data for {symbol} based on benchmark")
-            return synthetic_data
-            
-        except Exception as e:
-            print(f"Error creating synthetic data for {symbol}: {e}")
-            return benchmark_data.copy()
+        The portfolio path is the time-weighted unit value, so positions
+        added later don't show up as gains; the benchmark is taken on the
+        same days.
+        """
+        dates = snapshots['index']
+        if len(dates) < 2:
+            return None
+        benchmark_history = price_cache.get_history(self.benchmark)
+        if benchmark_history.empty:
+            return None
+        closes = benchmark_history['Close'].dropna()
+        days = pd.DatetimeIndex(closes.index)
+        closes.index = (days.tz_localize(None) if days.tz is not None else days).strftime('%Y-%m-%d')
+        closes = closes[~closes.index.duplicated(keep='last')]
+        benchmark = closes.reindex(closes.index.union(dates)).ffill().bfill().reindex(dates)
+
+        portfolio_values = [float(self.initial_value * (1 + twr / 100)) for twr in snapshots['twr']]
+        benchmark_values = [float(v) for v in self.initial_value * benchmark / benchmark.iloc[0]]
+        with analytics_metrics.timer('analytics_compute_seconds', engine='performance_metrics'):
+            metrics = self._calculate_performance_metrics(portfolio_values, benchmark_values)
+        return {
+            'portfolio_hist': {'index': list(dates), 'values': portfolio_values},
+            'benchmark_hist': {'index': list(dates), 'values': benchmark_values},
+            'metrics': metrics,
+            'stale_symbols': []
+        }
 
     def _calculate_performance_metrics(self, portfolio_values, benchmark_values):
         """Calculate performance metrics from value series including VaR at 99% confidence"""
@@ -387,7 +302,7 @@ class PerformanceAnalytics:
                 'correlation': correlation
             }
         except Exception as e:
-            print(f"Error calculating metrics: {e}")
+            logger.error(f"Error calculating metrics: {e}")
             return {
                 'one_year_return': 0.0, 
                 'volatility': 0.0, 
@@ -412,5 +327,6 @@ class PerformanceAnalytics:
                 'var_99_percent': 0.0,  # Changed from var_95_percent
                 'var_99_value': 0.0,    # Changed from var_95_value
                 'correlation': 0.0
-            }
+            },
+            'stale_symbols': []
         }
\ No newline at end of file
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from datetime import datetime, timedelta
+from .metrics import metrics
+from .close_panel import shared_close_panel
+from .market_data import UpstreamUnavailableError, fetch_history
+from .upstream import upstream_executor
+
+logger = logging.getLogger(__name__)
+
+# Per-worker bound on cached histories; least recently used symbols are dropped first
+PRICE_CACHE_MAX_SYMBOLS = int(os.environ.get('PRICE_CACHE_MAX_SYMBOLS', 512))
+
+class PriceHistoryCache:
+    """In-process cache of daily close histories shared across requests
+
+    Only the Close column is kept (nothing reads the rest of OHLCV), for at
+    most `max_symbols` symbols, so a worker's footprint stays bounded.
+
+    Copies older than the TTL are served stale-while-revalidate: for up to
+    `stale_while_revalidate_seconds` past the TTL the cached copy is
+    returned at once and refreshed in the background. If a download fails,
+    the last good copy is served however old it is.
+    """
+
+    def __init__(self, ttl_seconds=900, lookback_days=5*365, shared_panel=None,
+                 stale_while_revalidate_seconds=900, max_symbols=PRICE_CACHE_MAX_SYMBOLS):
+        self.ttl_seconds = ttl_seconds
+        self.max_symbols = max_symbols
+        self.lookback_days = lookback_days
+        self.shared_panel = shared_panel if shared_panel is not None else shared_close_panel
+        self.stale_while_revalidate_seconds = stale_while_revalidate_seconds
+        self._histories = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get_history(self, symbol, force_refresh=False, max_age_seconds=None):
+        """Get daily close history (a one-column 'Close' frame) for a symbol, downloading only when stale
+
+        Empty when there is none, including when the provider is unreachable
+        and nothing is cached; lookup() tells those two apart.
+        """
+        try:
+            return self.lookup(symbol, force_refresh, max_age_seconds)[0]
+        except UpstreamUnavailableError:
+            return pd.DataFrame()
+
+    def lookup(self, symbol, force_refresh=False, max_age_seconds=None):
+        """Get (history, stale) for a symbol; stale is True when an old copy was served
+
+        Raises UpstreamUnavailableError when the provider is unreachable and
+        there is no copy to serve, so it is not mistaken for a symbol without data.
+        """
+        max_age = self.ttl_seconds if max_age_seconds is None else max_age_seconds
+        now = time.time()
+        with self._lock:
+            entry = self._histories.get(symbol)
+            if entry is not None:
+                self._histories.move_to_end(symbol)
+        if entry is not None and not force_refresh:
+            age = now - entry[0]
+            if age < max_age:
+                metrics.record_cache('price_history', hit=True)
+                return entry[1], False
+            if age < max_age + self.stale_while_revalidate_seconds:
+                metrics.inc('stale_served_total', cache='price_history', reason='revalidating')
+                self._revalidate(symbol)
+                return entry[1], True
+        metrics.record_cache('price_history', hit=False)
+
+        try:
+            history = self._download(symbol)
+        except Exception as e:
+            logger.error(f"Error downloading history for {symbol}: {e}")
+            if entry is None:
+                if isinstance(e, UpstreamUnavailableError):
+                    raise
+                return pd.DataFrame(), False
+            # Keep serving the previous copy rather than dropping to nothing
+            metrics.inc('stale_served_total', cache='price_history', reason='error')
+            return entry[1], True
+
+        history = self._store(symbol, now, history)
+        return history, False
+
+    def version(self, symbol):
+        """Fetch time of the cached history if it is fresh, else None"""
+        with self._lock:
+            entry = self._histories.get(symbol)
+        if entry is None or time.time() - entry[0] >= self.ttl_seconds:
+            return None
+        return entry[0]
+
+    def _store(self, symbol, fetched_at, history):
+        """Cache the Close column of a download, evicting the least recently used symbols"""
+        if 'Close' in history.columns:
+            history = history[['Close']]
+        with self._lock:
+            self._histories[symbol] = (fetched_at, history)
+            self._histories.move_to_end(symbol)
+            while len(self._histories) > self.max_symbols:
+                self._histories.popitem(last=False)
+        return history
+
+    def _download(self, symbol):
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=self.lookback_days)
+        return fetch_history(symbol, start=start_date, end=end_date)
+
+    def _revalidate(self, symbol):
+        """Refresh a symbol on the upstream pool unless a refresh is already running"""
+        with self._lock:
+            if symbol in self._refreshing:
+                return
+            self._refreshing.add(symbol)
+        try:
+            upstream_executor.submit(self._refresh, symbol)
+        except RuntimeError:
+            # Pool shut down during interpreter exit
+            with self._lock:
+                self._refreshing.discard(symbol)
+
+    def _refresh(self, symbol):
+        now = time.time()
+        try:
+            history = self._download(symbol)
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {symbol}, still serving the cached copy: {e}")
+        else:
+            if history.empty:
+                logger.warning(f"Background refresh for {symbol} returned no data, keeping the cached copy")
+                return
+            self._store(symbol, now, history)
+        finally:
+            with self._lock:
+                self._refreshing.discard(symbol)
+
+    def get_close_panel(self, symbols, benchmark='^NSEI'):
+        """Get a date x symbol panel of closes aligned to the benchmark calendar
+
+        Returns a tuple of (panel, benchmark_close). Symbols without any
+        history are returned as all-NaN columns so callers can decide how to
+        proxy them. Panels are served from the shared memory-mapped store
+        while it is fresh, and newly built ones are merged back into it.
+        """
+        symbols = list(symbols)
+        shared = self.shared_panel.get([benchmark] + symbols, max_age_seconds=self.ttl_seconds)
+        metrics.record_cache('close_panel', hit=shared is not None)
+        if shared is not None:
+            return shared[symbols], shared[benchmark].astype(float)
+
+        benchmark_hist = self.get_history(benchmark)
+        if benchmark_hist.empty:
+            return pd.DataFrame(columns=list(symbols)), pd.Series(dtype=float)
+
+        benchmark_close = benchmark_hist['Close']
+        columns = {}
+        for symbol in symbols:
+            history = self.get_history(symbol)
+            if history.empty:
+                columns[symbol] = pd.Series(index=benchmark_close.index, dtype=float)
+            else:
+                columns[symbol] = history['Close'].reindex(benchmark_close.index).ffill()
+
+        panel = pd.DataFrame(columns, index=benchmark_close.index)
+        try:
+            self.shared_panel.merge(pd.concat([benchmark_close.rename(benchmark), panel.drop(columns=[benchmark], errors='ignore')], axis=1))
+        except Exception as e:
+            logger.warning(f"Could not publish shared close panel: {e}")
+        # Same precision as panels read back from the store, so every worker agrees
+        dtype = self.shared_panel.dtype
+        return panel.astype(dtype), benchmark_close.astype(dtype).astype(float)
+
+    def invalidate(self, symbol=None):
+        """Drop one symbol (or everything) from the cache"""
+        with self._lock:
+            if symbol is None:
+                self._histories.clear()
+            else:
+                self._histories.pop(symbol, None)
+
+# Create global instance
+price_cache = PriceHistoryCache()
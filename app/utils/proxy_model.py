@@ -0,0 +1,143 @@
+import logging
+import threading
+import zlib
+import numpy as np
+import pandas as pd
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fitted beta/alpha/residual variance are shrunk toward the market (beta 1,
+# alpha 0, a typical single-stock residual) as if this many prior days had
+# been observed, so a handful of closes cannot produce an extreme proxy
+PRIOR_OBSERVATIONS = 60
+DEFAULT_IDIOSYNCRATIC_VOL = 0.015
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+def _splitmix64(values):
+    """Stateless 64-bit mix of each element (wrapping uint64 arithmetic)"""
+    z = values + _GOLDEN_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _uniform(keys):
+    """Uniform (0, 1] per key from the top 53 bits of its hash"""
+    return ((_splitmix64(keys) >> np.uint64(11)).astype(np.float64) + 1.0) / 2.0 ** 53
+
+def _day_numbers(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return (index.normalize() - pd.Timestamp('1970-01-01')).days.to_numpy(dtype=np.int64)
+
+def shocks(symbol, index):
+    """Standard normal shock per (symbol, calendar day)
+
+    The draw for a given day depends only on the symbol and the date, not on
+    the process (crc32 rather than the salted built-in hash) or on where the
+    window starts, so every worker and every window agrees on it.
+    """
+    seed = np.uint64(zlib.crc32(symbol.encode('utf-8')) << 32)
+    days = _day_numbers(index).astype(np.uint64) * np.uint64(2)
+    u1 = _uniform(seed ^ days)
+    u2 = _uniform(seed ^ (days + np.uint64(1)))
+    # Box-Muller
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+class ProxyModel:
+    """Single-factor proxy prices for holdings with missing or short histories
+
+    Each symbol's daily returns are regressed on the benchmark's over the
+    days both traded, giving alpha, beta and a residual volatility. Missing
+    days are filled with alpha + beta * benchmark return + a deterministic
+    residual shock. Fitted parameters are kept until the symbol or the
+    benchmark gets a new close.
+    """
+
+    def __init__(self, prior_observations=PRIOR_OBSERVATIONS, default_idiosyncratic_vol=DEFAULT_IDIOSYNCRATIC_VOL):
+        self.prior_observations = prior_observations
+        self.default_idiosyncratic_vol = default_idiosyncratic_vol
+        self._params = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, stock_returns, benchmark_returns):
+        """Shrunk (alpha, beta, idiosyncratic_vol, observations) from paired daily returns"""
+        paired = pd.concat([stock_returns, benchmark_returns], axis=1, join='inner').dropna().to_numpy(dtype=float)
+        paired = paired[np.isfinite(paired).all(axis=1)]
+        n = len(paired)
+        k = self.prior_observations
+        prior_variance = self.default_idiosyncratic_vol ** 2
+
+        alpha, beta, residual_variance = 0.0, 1.0, prior_variance
+        if n >= 3:
+            stock, market = paired[:, 0], paired[:, 1]
+            market_variance = market.var()
+            if market_variance > 0:
+                beta = float(((stock - stock.mean()) * (market - market.mean())).mean() / market_variance)
+            alpha = float(stock.mean() - beta * market.mean())
+            residual_variance = float((stock - alpha - beta * market).var(ddof=2))
+
+        return {
+            'alpha': n * alpha / (n + k),
+            'beta': (n * beta + k) / (n + k),
+            'idiosyncratic_vol': float(np.sqrt((n * residual_variance + k * prior_variance) / (n + k))),
+            'observations': n,
+        }
+
+    def fit(self, symbol, closes, benchmark_closes):
+        """Cached parameters for a symbol; refitted only when either series has a new close"""
+        closes = closes.dropna() if closes is not None else pd.Series(dtype=float)
+        benchmark_closes = benchmark_closes.dropna()
+        key = (
+            len(closes), closes.index[-1] if len(closes) else None, float(closes.iloc[-1]) if len(closes) else None,
+            len(benchmark_closes), benchmark_closes.index[-1] if len(benchmark_closes) else None,
+        )
+        with self._lock:
+            entry = self._params.get(symbol)
+        metrics.record_cache('proxy_model', hit=entry is not None and entry[0] == key)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        # Returns only between consecutive closes both series actually have
+        aligned = closes.reindex(benchmark_closes.index)
+        params = self.estimate(aligned.pct_change(fill_method=None), benchmark_closes.pct_change(fill_method=None))
+        logger.debug(f"Proxy model for {symbol}: {params}")
+        with self._lock:
+            self._params[symbol] = (key, params)
+        return params
+
+    def proxy_returns(self, symbol, params, benchmark_returns):
+        """Modelled daily returns on the benchmark's dates"""
+        market = benchmark_returns.fillna(0).to_numpy(dtype=float)
+        residual = params['idiosyncratic_vol'] * shocks(symbol, benchmark_returns.index)
+        returns = params['alpha'] + params['beta'] * market + residual
+        # A day's modelled loss can't exceed the whole position
+        return pd.Series(np.maximum(returns, -0.99), index=benchmark_returns.index)
+
+    def impute(self, symbol, closes, benchmark_closes):
+        """Closes on the benchmark's dates with gaps filled
+
+        Days before the first close are back-cast from it with the proxy
+        returns; later gaps (holidays, suspensions) carry the last close,
+        as a valuation would. Without any closes the proxy starts at the
+        benchmark's first level.
+        """
+        benchmark_closes = benchmark_closes.astype(float)
+        params = self.fit(symbol, closes, benchmark_closes)
+        path = (1 + self.proxy_returns(symbol, params, benchmark_closes.pct_change(fill_method=None))).cumprod()
+
+        observed = closes.reindex(benchmark_closes.index).astype(float) if closes is not None else None
+        if observed is None or observed.notna().sum() == 0:
+            return benchmark_closes.iloc[0] * path / path.iloc[0]
+
+        filled = observed.ffill()
+        leading = filled.isna()
+        if leading.any():
+            first = observed.first_valid_index()
+            filled[leading] = observed[first] * path[leading] / path[first]
+        return filled
+
+# Create global instance
+proxy_model = ProxyModel()
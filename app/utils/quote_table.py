@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+from .fx import fx_service
+from .market_data import fetch_history
+from .upstream import upstream_executor
+
+logger = logging.getLogger(__name__)
+
+QUOTE_REFRESH_SECONDS = float(os.environ.get('QUOTE_REFRESH_SECONDS', 15))
+
+class QuoteTable:
+    """Latest INR quote per symbol, refreshed in the background while anyone watches it
+
+    Live portfolio streams watch their holdings; one refresher thread per
+    process polls every watched symbol once per interval, however many
+    streams hold it, and wakes the streams when any quote changes. Each
+    quote carries the table version it last changed at, so a stream only
+    sends what moved since its last event.
+    """
+
+    def __init__(self, refresh_seconds=QUOTE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._quotes = {}
+        self._watchers = {}
+        self._version = 0
+        self._changed = threading.Condition()
+        self._thread = None
+
+    @property
+    def version(self):
+        with self._changed:
+            return self._version
+
+    def watch(self, symbols):
+        """Start refreshing symbols; symbols without a quote yet are fetched now"""
+        with self._changed:
+            for symbol in symbols:
+                self._watchers[symbol] = self._watchers.get(symbol, 0) + 1
+            missing = [s for s in symbols if s not in self._quotes]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quote-refresh', daemon=True)
+                self._thread.start()
+        if missing:
+            self.refresh(missing)
+
+    def unwatch(self, symbols):
+        with self._changed:
+            for symbol in symbols:
+                count = self._watchers.get(symbol, 0) - 1
+                if count > 0:
+                    self._watchers[symbol] = count
+                else:
+                    self._watchers.pop(symbol, None)
+
+    def get(self, symbols):
+        """Current quotes for the symbols that have one"""
+        with self._changed:
+            return {s: dict(self._quotes[s]) for s in symbols if s in self._quotes}
+
+    def wait_for_change(self, version, timeout):
+        """Block until the table moves past `version` or the timeout passes; returns the current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            return self._version
+
+    def refresh(self, symbols=None):
+        """Fetch quotes for `symbols` (default: everything watched) and publish the ones that moved"""
+        if symbols is None:
+            with self._changed:
+                symbols = list(self._watchers)
+        if not symbols:
+            return
+        fetched = dict(zip(symbols, upstream_executor.map(self._fetch_quote, symbols)))
+
+        with self._changed:
+            changed = False
+            for symbol, quote in fetched.items():
+                previous = self._quotes.get(symbol)
+                if quote is None:
+                    # Keep the last good quote, flagged, rather than dropping the holding
+                    if previous is None or previous['stale']:
+                        continue
+                    quote = dict(previous, stale=True)
+                elif previous is not None and all(previous[k] == quote[k] for k in ('price', 'previous_close', 'stale')):
+                    continue
+                self._version += 1
+                quote['version'] = self._version
+                self._quotes[symbol] = quote
+                changed = True
+            if changed:
+                self._changed.notify_all()
+
+    def _fetch_quote(self, symbol):
+        try:
+            closes = fetch_history(symbol, period='5d')['Close'].dropna()
+            if closes.empty:
+                return None
+            rate = fx_service.get_rate(fx_service.currency_of(symbol))
+            price = float(closes.iloc[-1]) * rate
+            previous_close = float(closes.iloc[-2]) * rate if len(closes) > 1 else price
+            return {
+                'price': round(price, 2),
+                'previous_close': round(previous_close, 2),
+                'day_return': round((price / previous_close - 1) * 100, 2) if previous_close else 0.0,
+                'updated_at': time.time(),
+                'stale': False,
+            }
+        except Exception as e:
+            logger.warning(f"Quote refresh failed for {symbol}: {e}")
+            return None
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Quote refresh loop error: {e}")
+
+# Create global instance
+quote_table = QuoteTable()
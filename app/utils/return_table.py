@@ -0,0 +1,115 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from .fx import fx_service
+from .metrics import metrics
+from .price_cache import price_cache
+
+logger = logging.getLogger(__name__)
+
+# Look-back per horizon; YTD and CAGR are handled separately
+HORIZON_OFFSETS = {
+    '1D': None,
+    '1W': pd.DateOffset(weeks=1),
+    '1M': pd.DateOffset(months=1),
+    '3M': pd.DateOffset(months=3),
+    'YTD': None,
+    '1Y': pd.DateOffset(years=1),
+    '3Y': pd.DateOffset(years=3),
+    '5Y': pd.DateOffset(years=5),
+    'CAGR': None,
+}
+HORIZONS = tuple(HORIZON_OFFSETS)
+
+# A horizon may start up to this many days before the first close (the cache holds 5*365 days, not 5 years)
+START_TOLERANCE = pd.Timedelta(days=7)
+
+class ReturnTable:
+    """Per-symbol INR returns over standard horizons, computed once per close
+
+    Rows are built from the shared price cache with one searchsorted per
+    horizon and kept until the symbol's latest close changes, so asking for
+    another horizon, or the same symbols again, never downloads or rescans
+    history. Portfolio returns over every horizon are a weighted sum of rows.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else price_cache
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compute(closes):
+        """Percent return per horizon from a close Series; None where history is too short"""
+        closes = closes.dropna()
+        row = dict.fromkeys(HORIZONS)
+        if len(closes) < 2:
+            return row
+
+        index = pd.DatetimeIndex(closes.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        values = closes.to_numpy(dtype=float)
+        last_date, last = index[-1], values[-1]
+
+        starts = {'1D': len(values) - 2}
+        targets = {h: last_date - offset for h, offset in HORIZON_OFFSETS.items() if offset is not None}
+        targets['YTD'] = pd.Timestamp(year=last_date.year, month=1, day=1)
+        for horizon, target in targets.items():
+            if target < index[0] - START_TOLERANCE:
+                continue
+            # Last close on or before the target date (YTD: the previous year's final close)
+            side = 'left' if horizon == 'YTD' else 'right'
+            starts[horizon] = max(int(np.searchsorted(index, target, side=side)) - 1, 0)
+
+        for horizon, position in starts.items():
+            if values[position]:
+                row[horizon] = float((last / values[position] - 1) * 100)
+
+        years = (last_date - index[0]).days / 365.25
+        if years > 0 and values[0] > 0:
+            row['CAGR'] = float(((last / values[0]) ** (1 / years) - 1) * 100)
+        return row
+
+    def get(self, symbol, currency=None):
+        """Return row for one symbol, recomputed only when a new close arrives"""
+        history = self.cache.get_history(symbol)
+        if history.empty:
+            return dict.fromkeys(HORIZONS)
+        closes = history['Close']
+        key = (closes.index[-1], float(closes.iloc[-1]))
+        with self._lock:
+            entry = self._rows.get(symbol)
+        metrics.record_cache('return_table', hit=entry is not None and entry[0] == key)
+        if entry is not None and entry[0] == key:
+            return dict(entry[1])
+
+        row = self.compute(fx_service.convert_history(closes, fx_service.holding_currency(symbol, currency)))
+        with self._lock:
+            self._rows[symbol] = (key, row)
+        return dict(row)
+
+    def table(self, symbols, currencies=None):
+        """symbol x horizon DataFrame of percent returns (NaN where unavailable)
+
+        `currencies` maps symbols to their stored quote currency, if known.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        currencies = currencies or {}
+        rows = [self.get(s, currencies.get(s)) for s in symbols]
+        return pd.DataFrame(rows, index=symbols, columns=list(HORIZONS), dtype=float)
+
+    def portfolio_returns(self, weights, table=None):
+        """Weighted return per horizon; holdings without that horizon are left out and the rest reweighted"""
+        weights = pd.Series(weights, dtype=float)
+        table = self.table(weights.index) if table is None else table
+        available = table.notna().to_numpy()
+        w = weights.reindex(table.index).fillna(0).to_numpy()[:, None] * available
+        totals = w.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.einsum('ij,ij->j', np.nan_to_num(table.to_numpy()), w) / totals
+        return {h: (float(r) if t > 0 else None) for h, r, t in zip(table.columns, returns, totals)}
+
+# Create global instance
+return_table = ReturnTable()
@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from .price_cache import price_cache
+from .metrics import metrics
+from .fx import fx_service
+
+logger = logging.getLogger(__name__)
+
+class RiskEngine:
+    """Historical, parametric and filtered Monte Carlo VaR with Expected Shortfall
+
+    The engine keeps a per-symbol-set risk model (aligned daily returns,
+    covariance, EWMA volatilities and standardized residuals) so a change in
+    quantities only re-weights the cached model instead of re-downloading
+    history. Position values may be a single book (n_assets,) or many books
+    (n_books, n_assets); every method is evaluated as a matrix operation.
+    """
+
+    METHODS = ('historical', 'parametric', 'monte_carlo')
+    MC_CHUNK_CELLS = 20_000_000  # simulated cells per batch of books, bounds peak memory
+
+    def __init__(self, benchmark='^NSEI', ewma_lambda=0.94, n_simulations=10000,
+                 seed=7, model_ttl_seconds=900, cache=None):
+        self.benchmark = benchmark
+        self.ewma_lambda = ewma_lambda
+        self.n_simulations = n_simulations
+        self.seed = seed
+        self.model_ttl_seconds = model_ttl_seconds
+        self.cache = cache if cache is not None else price_cache
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, symbols):
+        """Get (building if needed) the cached risk model for a set of symbols"""
+        key = tuple(sorted(set(symbols)))
+        now = time.time()
+        with self._lock:
+            entry = self._models.get(key)
+        if entry is not None and now - entry[0] < self.model_ttl_seconds:
+            metrics.record_cache('risk_model', hit=True)
+            return entry[1]
+        metrics.record_cache('risk_model', hit=False)
+
+        with metrics.timer('analytics_compute_seconds', engine='risk_model'):
+            model = self._build_model(list(key))
+        with self._lock:
+            self._models[key] = (now, model)
+        return model
+
+    def model_version(self, symbols):
+        """Build time of the cached model for a set of symbols if it is fresh, else None"""
+        key = tuple(sorted(set(symbols)))
+        with self._lock:
+            entry = self._models.get(key)
+        if entry is None or time.time() - entry[0] >= self.model_ttl_seconds:
+            return None
+        return entry[0]
+
+    def _build_model(self, symbols):
+        """Build aligned returns, covariance and EWMA-filtered residuals"""
+        panel, benchmark_close = self.cache.get_close_panel(symbols, self.benchmark)
+        if benchmark_close.empty or len(benchmark_close) < 3:
+            return None
+        # Returns in INR terms, so foreign listings carry their currency risk
+        panel = fx_service.convert_panel(panel, symbols)
+
+        close = panel[symbols].to_numpy(dtype=float)
+        benchmark_returns = benchmark_close.pct_change().to_numpy(dtype=float)[1:]
+        returns = close[1:] / close[:-1] - 1
+
+        # Missing history (pre-listing or no data at all) follows the benchmark
+        missing = ~np.isfinite(returns)
+        if missing.any():
+            returns = np.where(missing, benchmark_returns[:, None], returns)
+        returns = np.nan_to_num(returns)
+
+        # EWMA variance forecast for each day uses information up to the day before
+        ewma_var = pd.DataFrame(returns ** 2).ewm(alpha=1 - self.ewma_lambda, adjust=False).mean().to_numpy()
+        sample_var = np.maximum(returns.var(axis=0), 1e-12)
+        predicted_var = np.vstack([sample_var, ewma_var[:-1]])
+        predicted_var = np.maximum(predicted_var, 1e-12)
+
+        return {
+            'symbols': symbols,
+            'index': benchmark_close.index,
+            'dates': benchmark_close.index[1:],
+            'returns': returns,
+            'benchmark_returns': np.nan_to_num(benchmark_returns),
+            'mean': returns.mean(axis=0),
+            'cov': np.cov(returns, rowvar=False).reshape(len(symbols), len(symbols)),
+            'residuals': returns / np.sqrt(predicted_var),
+            'current_vol': np.sqrt(np.maximum(ewma_var[-1], 1e-12)),
+        }
+
+    def buy_and_hold_values(self, model, values, initial_value=100000):
+        """Value curves for books bought at the start of the model history
+
+        Mirrors get_portfolio_returns: today's weights applied to the first
+        day and left to drift. Returns an array of shape (n_days + 1, n_books).
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        totals = values.sum(axis=1, keepdims=True)
+        weights = np.divide(values, totals, out=np.zeros_like(values), where=totals != 0)
+        growth = np.vstack([np.ones(len(model['symbols'])), np.cumprod(1 + model['returns'], axis=0)])
+        return initial_value * (growth @ weights.T)
+
+    def compute(self, model, values, confidence_levels=(0.95, 0.99), horizons=(1, 10), methods=METHODS):
+        """Compute VaR/ES for position value vectors against a risk model
+
+        Returns a dict keyed by (method, confidence, horizon) holding
+        (var, es) arrays with one entry per book. Losses are negative, in
+        currency units, matching calculate_value_at_risk.
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        results = {}
+
+        if 'historical' in methods:
+            pnl = model['returns'] @ values.T
+            for confidence in confidence_levels:
+                var, es = self._tail_statistics(pnl, confidence)
+                for horizon in horizons:
+                    scale = np.sqrt(horizon)
+                    results[('historical', confidence, horizon)] = (var * scale, es * scale)
+
+        if 'parametric' in methods:
+            mu = values @ model['mean']
+            sigma = np.sqrt(np.maximum(np.einsum('bi,ij,bj->b', values, model['cov'], values), 0))
+            normal = NormalDist()
+            for confidence in confidence_levels:
+                alpha = 1 - confidence
+                z = normal.inv_cdf(confidence)
+                for horizon in horizons:
+                    drift = mu * horizon
+                    spread = sigma * np.sqrt(horizon)
+                    var = drift - z * spread
+                    es = drift - spread * normal.pdf(z) / alpha
+                    results[('parametric', confidence, horizon)] = (var, es)
+
+        if 'monte_carlo' in methods:
+            # Filtered historical simulation: bootstrap whole days of standardized
+            # residuals (keeps cross-asset dependence) rescaled by today's EWMA vol.
+            # P&L is linear in positions, so each historical day collapses to one
+            # scalar per book before resampling.
+            scenario_pnl = model['residuals'] @ (values * model['current_vol']).T
+            max_horizon = max(horizons)
+            rng = np.random.default_rng(self.seed)
+            draws = rng.integers(0, len(scenario_pnl), size=(self.n_simulations, max_horizon))
+            chunk = max(1, self.MC_CHUNK_CELLS // (self.n_simulations * max_horizon))
+            partial = {}
+            for start in range(0, len(values), chunk):
+                paths = np.cumsum(scenario_pnl[:, start:start + chunk][draws], axis=1)
+                for horizon in horizons:
+                    horizon_pnl = paths[:, horizon - 1, :]
+                    for confidence in confidence_levels:
+                        partial.setdefault((confidence, horizon), []).append(
+                            self._tail_statistics(horizon_pnl, confidence))
+            for (confidence, horizon), parts in partial.items():
+                results[('monte_carlo', confidence, horizon)] = (
+                    np.concatenate([var for var, _ in parts]),
+                    np.concatenate([es for _, es in parts]),
+                )
+
+        return results
+
+    def _tail_statistics(self, pnl, confidence):
+        """Lower-tail quantile and mean beyond it along axis 0 without a full sort"""
+        n = len(pnl)
+        k = min(int((1 - confidence) * n), n - 1)
+        partitioned = np.partition(pnl, k, axis=0)
+        return partitioned[k], partitioned[:k + 1].mean(axis=0)
+
+    def value_at_risk(self, portfolio_df, confidence_levels=(0.95, 0.99), horizons=(1, 10), methods=METHODS):
+        """Get VaR and Expected Shortfall for a portfolio in one call"""
+        empty = {'total_value': 0.0, 'results': []}
+        try:
+            if portfolio_df.empty:
+                return empty
+
+            positions = portfolio_df.groupby('symbol')['value'].sum()
+            model = self.get_model(positions.index)
+            if model is None:
+                return empty
+
+            values = positions.reindex(model['symbols']).fillna(0).to_numpy(dtype=float)
+            total_value = float(values.sum())
+            with metrics.timer('analytics_compute_seconds', engine='var'):
+                raw = self.compute(model, values, confidence_levels, horizons, methods)
+
+            results = []
+            for (method, confidence, horizon), (var, es) in raw.items():
+                var_value = float(var[0])
+                es_value = float(es[0])
+                results.append({
+                    'method': method,
+                    'confidence': float(confidence),
+                    'horizon_days': int(horizon),
+                    'var_value': var_value,
+                    'var_percent': var_value / total_value * 100 if total_value else 0.0,
+                    'es_value': es_value,
+                    'es_percent': es_value / total_value * 100 if total_value else 0.0,
+                })
+
+            return {'total_value': total_value, 'results': results}
+
+        except Exception as e:
+            logger.error(f"Error calculating risk engine VaR: {e}")
+            return empty
+
+# Create global instance
+risk_engine = RiskEngine()
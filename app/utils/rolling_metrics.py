@@ -0,0 +1,101 @@
+import logging
+import numpy as np
+import pandas as pd
+from .risk_engine import risk_engine
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class RollingMetrics:
+    """Rolling beta, volatility, Sharpe ratio and drawdown series
+
+    Window statistics come from prefix sums, so each series costs O(n)
+    regardless of window length instead of recomputing every window.
+    """
+
+    def __init__(self, risk_free_rate=0.0725, engine=None):
+        self.risk_free_rate = risk_free_rate  # Matches PerformanceAnalytics
+        self.engine = engine if engine is not None else risk_engine
+
+    @staticmethod
+    def _window_sums(x, window):
+        """Sum of every trailing window of length `window` (NaN until full)"""
+        prefix = np.concatenate([[0.0], np.cumsum(x)])
+        sums = np.full(len(x), np.nan)
+        if len(x) >= window:
+            sums[window - 1:] = prefix[window:] - prefix[:-window]
+        return sums
+
+    def compute(self, values, benchmark_values, windows=(30, 90, 252)):
+        """Compute rolling series from aligned portfolio and benchmark value curves"""
+        values = np.asarray(values, dtype=float)
+        benchmark_values = np.asarray(benchmark_values, dtype=float)
+        returns = values[1:] / values[:-1] - 1
+        benchmark_returns = benchmark_values[1:] / benchmark_values[:-1] - 1
+
+        # Centre before accumulating so the prefix-sum variance stays precise
+        x = returns - returns.mean()
+        y = benchmark_returns - benchmark_returns.mean()
+        daily_rf = self.risk_free_rate / 252
+
+        results = {}
+        for window in windows:
+            sum_x = self._window_sums(x, window)
+            sum_y = self._window_sums(y, window)
+            mean_x = sum_x / window
+            mean_y = sum_y / window
+            var_x = np.maximum(self._window_sums(x * x, window) / window - mean_x ** 2, 0)
+            var_y = np.maximum(self._window_sums(y * y, window) / window - mean_y ** 2, 0)
+            cov_xy = self._window_sums(x * y, window) / window - mean_x * mean_y
+
+            std_x = np.sqrt(var_x)
+            mean_return = mean_x + returns.mean()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                beta = np.where(var_y > 0, cov_xy / var_y, np.nan)
+                sharpe = np.where(std_x > 0, (mean_return - daily_rf) / std_x * np.sqrt(252), np.nan)
+
+            # Drawdown from the peak inside the trailing window (pandas rolling max is O(n))
+            peak = pd.Series(values[1:]).rolling(window, min_periods=window).max().to_numpy()
+            drawdown = (values[1:] / peak - 1) * 100
+
+            results[window] = {
+                'beta': beta,
+                'volatility': std_x * np.sqrt(252) * 100,
+                'sharpe_ratio': sharpe,
+                'drawdown': drawdown,
+            }
+
+        return results
+
+    def get_rolling_metrics(self, portfolio_df, windows=(30, 90, 252)):
+        """Get rolling metric series for a portfolio against the benchmark"""
+        empty = {'index': [], 'windows': {}}
+        try:
+            if portfolio_df.empty:
+                return empty
+
+            positions = portfolio_df.groupby('symbol')['value'].sum()
+            model = self.engine.get_model(positions.index)
+            if model is None:
+                return empty
+
+            position_values = positions.reindex(model['symbols']).fillna(0).to_numpy(dtype=float)
+            values = self.engine.buy_and_hold_values(model, position_values)[:, 0]
+            benchmark_values = np.concatenate([[1.0], np.cumprod(1 + model['benchmark_returns'])])
+            with metrics.timer('analytics_compute_seconds', engine='rolling'):
+                series = self.compute(values, benchmark_values, windows)
+
+            def to_list(arr):
+                return [float(v) if np.isfinite(v) else None for v in arr]
+
+            return {
+                'index': [d.strftime('%Y-%m-%d') for d in model['dates']],
+                'windows': {
+                    str(window): {name: to_list(arr) for name, arr in metrics.items()}
+                    for window, metrics in series.items()
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"Error calculating rolling metrics: {e}")
+            return empty
@@ -0,0 +1,202 @@
+"""
+Universe screener over precomputed technical signals.
+
+After each close the screener builds one close panel for the configured
+universe and computes every signal for every symbol as column-wise
+DataFrame operations (the same definitions as strategies.momentum_value
+and strategies.technicals, which download and compute one ticker at a
+time). Results go to an indexed SQLite table shared by all workers, so a
+filter/sort query is a single indexed SELECT.
+
+Usage:
+    python -m app.utils.screener
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from .metrics import metrics
+from .price_cache import price_cache
+from .symbol_index import symbol_index
+from .upstream import upstream_executor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get('SCREENER_DB', os.path.join(os.getcwd(), 'screener.db'))
+
+# Comma-separated symbols; defaults to every listed equity in the symbol index
+SCREENER_UNIVERSE = os.environ.get('SCREENER_UNIVERSE', '')
+
+# Signals older than this are refreshed in the background on the next query
+SCREENER_MAX_AGE_SECONDS = float(os.environ.get('SCREENER_MAX_AGE_SECONDS', 24 * 3600))
+
+SIGNAL_COLUMNS = ('momentum', 'value_ratio', 'rsi', 'bollinger_position', 'macd_rank', 'day_return')
+
+class Screener:
+    """Precomputed momentum, value, RSI, Bollinger and MACD signals for a universe"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, universe=None, benchmark='^NSEI', cache=None,
+                 max_age_seconds=SCREENER_MAX_AGE_SECONDS):
+        self.db_path = db_path
+        self._universe = universe
+        self.benchmark = benchmark
+        self.cache = cache if cache is not None else price_cache
+        self.max_age_seconds = max_age_seconds
+        self._refreshing = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS screener_signals ("
+                "symbol TEXT PRIMARY KEY, name TEXT, exchange TEXT, close REAL, "
+                + ", ".join(f"{column} REAL" for column in SIGNAL_COLUMNS)
+                + ", as_of TEXT, updated_at REAL)"
+            )
+            for column in SIGNAL_COLUMNS:
+                connection.execute(f"CREATE INDEX IF NOT EXISTS screener_by_{column} ON screener_signals ({column})")
+            self._initialized = True
+        return connection
+
+    def universe(self):
+        """Symbols to screen: the configured list, or every non-index listing"""
+        if self._universe is not None:
+            return list(self._universe)
+        if SCREENER_UNIVERSE:
+            return [s.strip().upper() for s in SCREENER_UNIVERSE.split(',') if s.strip()]
+        return [listing['symbol'] for listing in symbol_index.listings() if not listing['symbol'].startswith('^')]
+
+    @staticmethod
+    def compute(closes):
+        """Latest signal values per symbol from a date x symbol close panel"""
+        closes = closes.astype(float)
+        returns = closes.pct_change(fill_method=None)
+        last = closes.ffill().iloc[-1]
+
+        # momentum / value: 20-day mean return and price over its 20-day average
+        momentum = returns.rolling(20).mean().iloc[-1]
+        sma = closes.rolling(20).mean()
+        value_ratio = last / sma.iloc[-1]
+
+        # technicals.relative_strength_index
+        gain = returns.clip(lower=0).ewm(span=14, adjust=False).mean().iloc[-1]
+        loss = (-returns.clip(upper=0)).ewm(span=14, adjust=False).mean().iloc[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + gain / loss)
+
+        # technicals.bollinger_band, as the position of the close between the bands (0 lower, 1 upper)
+        std = closes.rolling(20).std().iloc[-1]
+        lower = sma.iloc[-1] - 2 * std
+        bollinger_position = (last - lower) / (4 * std)
+
+        # technicals.generate_macd_signal: percent rank of MACD - signal over 60 days, scaled to [-1, 1]
+        macd = closes.ewm(span=12).mean() - closes.ewm(span=26).mean()
+        histogram = (macd - macd.ewm(span=9).mean()).to_numpy()
+        window = histogram[-60:]
+        with np.errstate(invalid='ignore'):
+            rank = (window[:-1] < window[-1]).sum(axis=0) / (len(window) - 1)
+        macd_rank = pd.Series((rank - 0.5) * 2, index=closes.columns)
+        macd_rank[np.isnan(window).any(axis=0)] = np.nan
+
+        day_return = (closes.iloc[-1] / closes.iloc[-2] - 1) * 100
+        signals = pd.DataFrame({
+            'close': last, 'momentum': momentum, 'value_ratio': value_ratio, 'rsi': rsi,
+            'bollinger_position': bollinger_position, 'macd_rank': macd_rank, 'day_return': day_return,
+        })
+        return signals.replace([np.inf, -np.inf], np.nan)
+
+    def refresh(self):
+        """Recompute signals for the whole universe and replace the table; returns the row count"""
+        symbols = self.universe()
+        if not symbols:
+            return 0
+        # Warm the history cache in parallel; the panel build below then only reads it
+        list(upstream_executor.map(self.cache.get_history, [self.benchmark] + symbols))
+        panel, _ = self.cache.get_close_panel(symbols, self.benchmark)
+        if panel.empty:
+            logger.warning("No market data for the screener universe, signals not refreshed")
+            return 0
+
+        with metrics.timer('analytics_compute_seconds', engine='screener'):
+            signals = self.compute(panel).dropna(subset=['close'])
+
+        listings = {listing['symbol']: listing for listing in symbol_index.listings()}
+        as_of = pd.Timestamp(panel.index[-1]).strftime('%Y-%m-%d')
+        now = time.time()
+        rows = []
+        for symbol, row in signals.iterrows():
+            listing = listings.get(symbol, {})
+            values = [None if pd.isna(row[column]) else float(row[column]) for column in ('close',) + SIGNAL_COLUMNS]
+            rows.append((symbol, listing.get('name', symbol), listing.get('exchange'), *values, as_of, now))
+
+        columns = ('symbol', 'name', 'exchange', 'close') + SIGNAL_COLUMNS + ('as_of', 'updated_at')
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM screener_signals")
+            connection.executemany(
+                f"INSERT INTO screener_signals ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+        logger.info(f"Screener refreshed {len(rows)} of {len(symbols)} symbols as of {as_of}")
+        return len(rows)
+
+    def _refresh_in_background(self):
+        """Start one background refresh unless one is already running"""
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Screener refresh failed: {e}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name='screener-refresh', daemon=True).start()
+
+    def query(self, filters=None, sort='momentum', descending=True, limit=50):
+        """Rows matching {column: (min, max)} filters, sorted on one signal column
+
+        Returns (rows, as_of, refreshing). Stale or missing signals trigger a
+        background refresh; the current table is served meanwhile.
+        """
+        if sort not in SIGNAL_COLUMNS:
+            raise ValueError(f"Cannot sort on {sort}")
+        clauses, params = [], []
+        for column, (low, high) in (filters or {}).items():
+            if column not in SIGNAL_COLUMNS:
+                raise ValueError(f"Cannot filter on {column}")
+            if low is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{column} <= ?")
+                params.append(high)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = 'DESC' if descending else 'ASC'
+        # NULL signals (too little history) sort last either way
+        sql = (f"SELECT * FROM screener_signals {where} "
+               f"ORDER BY {sort} IS NULL, {sort} {order} LIMIT ?")
+
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = [dict(r) for r in connection.execute(sql, params + [limit]).fetchall()]
+            as_of, updated_at = connection.execute(
+                "SELECT MAX(as_of), MAX(updated_at) FROM screener_signals").fetchone()
+
+        if updated_at is None or time.time() - updated_at > self.max_age_seconds:
+            self._refresh_in_background()
+        return rows, as_of, self._refreshing.locked()
+
+# Create global instance
+screener = Screener()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    screener.refresh()
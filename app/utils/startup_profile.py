@@ -0,0 +1,64 @@
+"""
+Import-time breakdown for application and CLI startup.
+
+Runs the target in a fresh interpreter with ``-X importtime`` and reports
+import time per top-level package, so regressions in cold-start latency
+can be traced to the dependency that caused them.
+
+Usage:
+    python -m app.utils.startup_profile            # the Flask app (app.py)
+    python -m app.utils.startup_profile main.py    # any script
+    python -m app.utils.startup_profile -m trading # any module
+"""
+
+import re
+import subprocess
+import sys
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def profile_imports(code):
+    """Return [(module, self_us, cumulative_us, depth)] for running `code`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'startup failed')
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+def startup_report(code, top=15):
+    """Format import time per top-level package (summed self time) as text"""
+    rows = profile_imports(code)
+    packages = {}
+    for module, self_us, _, _ in rows:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    total_us = sum(packages.values())
+
+    lines = [f"{'package':<30} {'import ms':>10} {'share':>7}"]
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        share = self_us / total_us * 100 if total_us else 0.0
+        lines.append(f"{package:<30} {self_us / 1000:>10.1f} {share:>6.1f}%")
+    lines.append(f"{'total':<30} {total_us / 1000:>10.1f}")
+    return '\n'.join(lines)
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        code = "import runpy; runpy.run_path('app.py', run_name='startup_profile')"
+    elif args[0] == '-m':
+        code = f"import {args[1]}"
+    else:
+        code = f"import runpy; runpy.run_path({args[0]!r}, run_name='startup_profile')"
+    print(startup_report(code))
+
+if __name__ == '__main__':
+    main()
@@ -1,70 +1,127 @@
-import yfinance as yf
+import logging
+import threading
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from .market_data import UpstreamUnavailableError, fetch_history, fetch_info
+from .price_cache import price_cache
+
+logger = logging.getLogger(__name__)
+
+# Histories starting within this many days of the 5-year start count as full,
+# so no benchmark imputation (and no benchmark download) is needed
+FULL_HISTORY_TOLERANCE_DAYS = 7
+
+# Last good quote per symbol, served when the provider is unreachable
+_last_prices = {}
+_last_prices_lock = threading.Lock()
 
 def get_current_price(symbol):
-    """Fetch current price for a stock symbol with improved error handling"""
+    """Fetch current price for a stock symbol
+
+    When the provider is unreachable the last good price is returned
+    instead (from an earlier quote or the cached daily history), and None
+    when there is none, rather than valuing the holding at zero.
+    """
     try:
-        print(f"  -> Attempting to fetch price for {symbol}")
-        ticker = yf.Ticker(symbol)
+        logger.debug(f"Attempting to fetch price for {symbol}")
         
         # Try recent data first
-        data = ticker.history(period="1d", interval="1m")
+        data = fetch_history(symbol, period="1d", interval="1m")
         if not data.empty:
             current_price = data['Close'].iloc[-1]
-            print(f"  -> Got 1-day price: ₹{current_price:.2f}")
-            return float(current_price)
+            logger.debug(f"Got 1-day price: ₹{current_price:.2f}")
+            return _remember_price(symbol, current_price)
         
         # Fallback to 5-day daily data
-        print(f"  -> No 1-day data, trying 5-day data...")
-        data = ticker.history(period="5d")
+        logger.debug(f"No 1-day data, trying 5-day data...")
+        data = fetch_history(symbol, period="5d")
         if not data.empty:
             current_price = data['Close'].iloc[-1]
-            print(f"  -> Got 5-day price: ₹{current_price:.2f}")
-            return float(current_price)
+            logger.debug(f"Got 5-day price: ₹{current_price:.2f}")
+            return _remember_price(symbol, current_price)
         
         # Fallback to basic info
-        print(f"  -> No historical data, trying basic info...")
-        info = ticker.info
+        logger.debug(f"No historical data, trying basic info...")
+        info = fetch_info(symbol)
         if 'currentPrice' in info:
             current_price = info['currentPrice']
-            print(f"  -> Got current price from info: ₹{current_price:.2f}")
-            return float(current_price)
+            logger.debug(f"Got current price from info: ₹{current_price:.2f}")
+            return _remember_price(symbol, current_price)
         
-        print(f"  -> No price data available for {symbol}")
-        return 0.0
+        logger.warning(f"No price data available for {symbol}")
+        return None
         
     except Exception as e:
-        print(f"  -> ERROR fetching price for {symbol}: {e}")
-        return 0.0
+        logger.error(f"Error fetching price for {symbol}: {e}")
+        return _last_good_price(symbol)
+
+def _remember_price(symbol, price):
+    price = float(price)
+    with _last_prices_lock:
+        _last_prices[symbol] = price
+    return price
+
+def _last_good_price(symbol):
+    with _last_prices_lock:
+        price = _last_prices.get(symbol)
+    if price is None:
+        history = price_cache.get_history(symbol)
+        if history.empty:
+            return None
+        price = float(history['Close'].iloc[-1])
+    logger.warning(f"Serving last good price for {symbol}: ₹{price:.2f}")
+    return price
 
 def get_stock_with_benchmark_fallback(symbol, benchmark_symbol='^NSEI'):
-    """Get stock data with benchmark fallback for missing historical data"""
+    """Get stock data with benchmark fallback for missing historical data
+
+    Returns a tuple of (history, stale); stale is True when a cached copy
+    was served because the fresh one is still being fetched or failed.
+    """
     try:
-        stock = yf.Ticker(symbol)
-        benchmark = yf.Ticker(benchmark_symbol)
-        
-        # Get 5 years of data
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=5*365)
-        
-        stock_data = stock.history(start=start_date, end=end_date)
-        benchmark_data = benchmark.history(start=start_date, end=end_date)
-        
-        if stock_data.empty and not benchmark_data.empty:
-            print(f"No data for {symbol}, using benchmark as complete proxy")
-            return benchmark_data.copy()
-        
-        if not stock_data.empty and not benchmark_data.empty:
-            # Align and impute missing data
-            return _align_and_impute_stock_data(stock_data, benchmark_data, symbol)
-        
-        return stock_data
-        
+        start_date, _ = _history_range()
+        stock_data, stale = price_cache.lookup(symbol)
+        if stock_data.empty:
+            # No history of its own (typo, delisted): the caller reports it, never the benchmark in its place
+            return stock_data, stale
+        if _has_full_history(stock_data, start_date):
+            # Nothing to impute, so the benchmark download can be skipped
+            return stock_data, stale
+
+        try:
+            benchmark_data, benchmark_stale = price_cache.lookup(benchmark_symbol)
+        except UpstreamUnavailableError:
+            logger.warning(f"Benchmark unavailable, serving {symbol} without back-fill")
+            return stock_data, stale
+        return _combine_with_benchmark(stock_data, benchmark_data, symbol), stale or benchmark_stale
+        
+    except UpstreamUnavailableError:
+        # Nothing cached for the symbol itself; callers answer 503
+        raise
     except Exception as e:
-        print(f"Error in stock data retrieval for {symbol}: {e}")
-        return pd.DataFrame()
+        logger.error(f"Error in stock data retrieval for {symbol}: {e}")
+        return pd.DataFrame(), False
+
+def _history_range():
+    """Get 5 years of data"""
+    end_date = datetime.now()
+    return end_date - timedelta(days=5*365), end_date
+
+def _has_full_history(stock_data, start_date):
+    """True when the stock's history starts within a week of the requested start"""
+    if stock_data.empty:
+        return False
+    first_date = stock_data.index[0].date()
+    return first_date <= (start_date + timedelta(days=FULL_HISTORY_TOLERANCE_DAYS)).date()
+
+def _combine_with_benchmark(stock_data, benchmark_data, symbol):
+    """Back-fill a partial stock history from the benchmark; an empty history stays empty"""
+    if not stock_data.empty and not benchmark_data.empty:
+        # Align and impute missing data
+        return _align_and_impute_stock_data(stock_data, benchmark_data, symbol)
+    
+    return stock_data
 
 def _align_and_impute_stock_data(stock_data, benchmark_data, symbol):
     """Helper function to align stock data with benchmark and impute missing values"""
@@ -76,14 +133,13 @@ def _align_and_impute_stock_data(stock_data, benchmark_data, symbol):
         benchmark_returns = benchmark_data['Close'].pct_change().fillna(0)
         
         # Forward fill and then use benchmark returns for remaining gaps
-        aligned_stock['Close'] = aligned_stock['Close'].fillna(method='ffill')
+        aligned_stock['Close'] = aligned_stock['Close'].ffill()
         
         # Find still missing values
         missing_mask = aligned_stock['Close'].isna()
         
         if missing_mask.any():
-            print(f"Imputing {missing_mask.sum()} data points for {symbol}")
-            
+            logger.info(f"Imputing {missing_mask.sum()} data points for {symbol}")
             # Use benchmark returns to fill gaps
             last_known_price = None
             for i, (date, is_missing) in enumerate(missing_mask.items()):
@@ -109,5 +165,5 @@ def _align_and_impute_stock_data(stock_data, benchmark_data, symbol):
         return aligned_stock
         
     except Exception as e:
-        print(f"Error in data imputation for {symbol}: {e}")
+        logger.error(f"Error in data imputation for {symbol}: {e}")
         return stock_data
\ No newline at end of file
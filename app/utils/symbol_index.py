@@ -0,0 +1,147 @@
+import bisect
+import csv
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYMBOL_LIST = os.environ.get(
+    'SYMBOL_LIST_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'symbols.csv')
+)
+
+# Anything outside this shape cannot be a ticker, so it never reaches the provider
+SYMBOL_PATTERN = re.compile(r'^\^?[A-Z0-9][A-Z0-9&.\-=]{0,19}$')
+
+# Listings on these exchanges are offered first for the same ticker
+EXCHANGE_PRIORITY = {'NSE': 0, 'BSE': 1}
+
+class SymbolIndex:
+    """Sorted prefix index over exchange listings for autocomplete and validation
+
+    Listings are loaded from a CSV (symbol,name,exchange). Tickers (with and
+    without the exchange suffix) and the words of each name are kept in
+    sorted key lists, so a prefix query is a bisect plus a scan of at most
+    `limit` matches. Symbols the provider had no data for are remembered for
+    a day so repeated typos are rejected without an upstream call; with
+    strict validation anything not listed is rejected.
+    """
+
+    def __init__(self, path=DEFAULT_SYMBOL_LIST, strict=None, miss_ttl_seconds=24*3600):
+        self.path = path
+        self.strict = strict if strict is not None else os.environ.get('SYMBOL_VALIDATION') == 'strict'
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self._listings = []
+        self._by_symbol = {}
+        self._ticker_keys = []
+        self._name_keys = []
+        self._misses = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self, path=None):
+        """(Re)build the index from a listings CSV"""
+        path = path or self.path
+        listings, by_symbol, ticker_keys, name_keys = [], {}, [], []
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    symbol = (row.get('symbol') or '').strip().upper()
+                    if not symbol or symbol in by_symbol:
+                        continue
+                    listing = {'symbol': symbol, 'name': (row.get('name') or '').strip(),
+                               'exchange': (row.get('exchange') or '').strip().upper()}
+                    i = len(listings)
+                    listings.append(listing)
+                    by_symbol[symbol] = i
+
+                    priority = EXCHANGE_PRIORITY.get(listing['exchange'], len(EXCHANGE_PRIORITY))
+                    base = symbol.split('.')[0]
+                    ticker_keys.append((base, priority, i))
+                    if base != symbol:
+                        ticker_keys.append((symbol, priority, i))
+                    for word in set(re.findall(r'[A-Z0-9&]+', listing['name'].upper())):
+                        name_keys.append((word, priority, i))
+        except OSError as e:
+            logger.warning(f"Symbol list unavailable at {path}: {e}")
+
+        ticker_keys.sort()
+        name_keys.sort()
+        with self._lock:
+            self._listings, self._by_symbol = listings, by_symbol
+            self._ticker_keys, self._name_keys = ticker_keys, name_keys
+            self._loaded = True
+        logger.info(f"Loaded {len(listings)} listings into the symbol index")
+        return len(listings)
+
+    def _ensure_loaded(self):
+        # A concurrent first call may load twice; both builds are identical
+        if not self._loaded:
+            self.load()
+
+    @staticmethod
+    def _scan(keys, prefix, limit, seen, results, listings):
+        position = bisect.bisect_left(keys, (prefix,))
+        while position < len(keys) and len(results) < limit:
+            key, _, i = keys[position]
+            if not key.startswith(prefix):
+                break
+            if i not in seen:
+                seen.add(i)
+                results.append(listings[i])
+            position += 1
+
+    def search(self, query, limit=10):
+        """Listings whose ticker, then name words, start with the query"""
+        self._ensure_loaded()
+        prefix = query.strip().upper()
+        if not prefix:
+            return []
+        results, seen = [], set()
+        self._scan(self._ticker_keys, prefix, limit, seen, results, self._listings)
+        # Multi-word queries match names on their first word
+        self._scan(self._name_keys, prefix.split()[0], limit, seen, results, self._listings)
+        return [dict(listing) for listing in results]
+
+    def suggest(self, symbol, limit=5):
+        """Close listings for an unknown symbol, shortening the prefix until something matches"""
+        base = symbol.strip().upper().split('.')[0]
+        for length in range(len(base), 1, -1):
+            results = self.search(base[:length], limit)
+            if results:
+                return results
+        return []
+
+    def listings(self, exchange=None):
+        """All listings, optionally on one exchange"""
+        self._ensure_loaded()
+        return [dict(listing) for listing in self._listings
+                if exchange is None or listing['exchange'] == exchange.upper()]
+
+    def contains(self, symbol):
+        self._ensure_loaded()
+        return symbol.upper() in self._by_symbol
+
+    def validate(self, symbol):
+        """Whether a symbol is worth an upstream fetch"""
+        symbol = symbol.upper()
+        if not SYMBOL_PATTERN.match(symbol):
+            return False
+        if self.contains(symbol):
+            return True
+        with self._lock:
+            missed_at = self._misses.get(symbol)
+        if missed_at is not None and time.time() - missed_at < self.miss_ttl_seconds:
+            return False
+        return not self.strict
+
+    def record_miss(self, symbol):
+        """Remember that the provider had no data for a symbol"""
+        with self._lock:
+            self._misses[symbol.upper()] = time.time()
+
+# Create global instance
+symbol_index = SymbolIndex()
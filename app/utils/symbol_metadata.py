@@ -0,0 +1,114 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from .market_data import fetch_info
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get('SYMBOL_METADATA_DB', os.path.join(os.getcwd(), 'symbol_metadata.db'))
+
+class SymbolMetadataStore:
+    """Long-lived table of static symbol metadata (name, currency, exchange)
+
+    Ticker.info is one of the slowest upstream calls and the app only needs
+    these fields from it, which practically never change. Rows live in a
+    SQLite table shared by all workers, with an in-process dict in front.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl_seconds=30*24*3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS symbol_metadata ("
+                "symbol TEXT PRIMARY KEY, name TEXT, currency TEXT, exchange TEXT, updated_at REAL)"
+            )
+            self._initialized = True
+        return connection
+
+    def get(self, symbol, include_expired=False):
+        """Get cached metadata for a symbol, or None if missing (or expired, unless include_expired)"""
+        now = time.time()
+        with self._lock:
+            row = self._rows.get(symbol)
+        if row is None:
+            try:
+                with closing(self._connect()) as connection:
+                    found = connection.execute(
+                        "SELECT name, currency, exchange, updated_at FROM symbol_metadata WHERE symbol = ?",
+                        (symbol,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Symbol metadata lookup failed for {symbol}: {e}")
+                found = None
+            if found is not None:
+                row = {'symbol': symbol, 'name': found[0], 'currency': found[1],
+                       'exchange': found[2], 'updated_at': found[3]}
+                with self._lock:
+                    self._rows[symbol] = row
+
+        if row is None or (not include_expired and now - row['updated_at'] > self.ttl_seconds):
+            return None
+        return row
+
+    def put(self, symbol, info):
+        """Store the static fields of a Ticker.info payload
+
+        A payload without a quote currency (unknown symbol, partial response)
+        is not stored; the returned row then takes the currency implied by
+        the exchange suffix.
+        """
+        from .fx import fx_service  # fx imports this module
+
+        row = {
+            'symbol': symbol,
+            'name': info.get('longName') or info.get('shortName') or symbol,
+            'currency': info.get('currency') or fx_service.suffix_currency(symbol) or 'USD',
+            'exchange': info.get('exchange'),
+            'updated_at': time.time(),
+        }
+        if not info.get('currency'):
+            logger.warning(f"No currency in metadata for {symbol}, not caching it")
+            return row
+        with self._lock:
+            self._rows[symbol] = row
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO symbol_metadata (symbol, name, currency, exchange, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (symbol, row['name'], row['currency'], row['exchange'], row['updated_at'])
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist metadata for {symbol}: {e}")
+        return row
+
+    def get_metadata(self, symbol):
+        """Get metadata for a symbol, fetching Ticker.info only on a miss"""
+        row = self.get(symbol)
+        metrics.record_cache('symbol_metadata', hit=row is not None)
+        if row is not None:
+            return row
+        try:
+            info = fetch_info(symbol)
+        except Exception:
+            # An expired row is still better than failing while the provider is down
+            row = self.get(symbol, include_expired=True)
+            if row is None:
+                raise
+            logger.warning(f"Serving expired metadata for {symbol}")
+            return row
+        return self.put(symbol, info)
+
+# Create global instance
+symbol_metadata = SymbolMetadataStore()
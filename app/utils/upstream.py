@@ -0,0 +1,10 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# yfinance is blocking, so views hand independent calls to this pool to run
+# them concurrently; the cap bounds how many market-data requests one worker
+# has in flight at a time
+UPSTREAM_CONCURRENCY = int(os.environ.get('UPSTREAM_CONCURRENCY', 32))
+
+# Create global instance
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix='upstream')
@@ -0,0 +1,260 @@
+"""
+Materialized daily portfolio value snapshots.
+
+Each stored portfolio gets one row per trading day with its value, the
+holdings it was valued with, the external flow that day (positions added,
+resized or removed, valued at that day's close) and a unit value that
+grows only with market moves. Time-weighted return between any two days
+is the ratio of their unit values, so it reflects when positions were
+actually added rather than applying today's weights to the whole history.
+
+Appending a day needs only the previous row and that day's closes. The
+first run backfills from the earliest `date_added` in the holdings.
+
+Usage:
+    python -m app.utils.value_snapshots [session_dir]
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from .fx import fx_service
+from .metrics import metrics
+from .price_cache import price_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get('PORTFOLIO_SNAPSHOT_DB', os.path.join(os.getcwd(), 'portfolio_snapshots.db'))
+
+def _days(index):
+    """ISO calendar days of a (possibly tz-aware) DatetimeIndex"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.strftime('%Y-%m-%d')
+
+class PortfolioSnapshotStore:
+    """SQLite table of daily (value, flow, unit value, holdings) rows per portfolio"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, benchmark='^NSEI', cache=None):
+        self.db_path = db_path
+        self.benchmark = benchmark
+        self.cache = cache if cache is not None else price_cache
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS portfolio_snapshots ("
+                "portfolio_id TEXT, date TEXT, value REAL, flow REAL, unit_value REAL, holdings TEXT, "
+                "PRIMARY KEY (portfolio_id, date))"
+            )
+            self._initialized = True
+        return connection
+
+    def _latest_rows(self, connection, portfolio_id):
+        """The last two stored rows, newest first"""
+        return connection.execute(
+            "SELECT date, value, unit_value, holdings FROM portfolio_snapshots "
+            "WHERE portfolio_id = ? ORDER BY date DESC LIMIT 2",
+            (portfolio_id,)
+        ).fetchall()
+
+    def _closes(self, symbols, calendar, fallback_prices, currencies):
+        """INR closes on the calendar days, one column per symbol, carried over holidays"""
+        columns = {}
+        for symbol in symbols:
+            history = self.cache.get_history(symbol)
+            if history.empty:
+                logger.warning(f"No history for {symbol}, valuing it at its stored price")
+                columns[symbol] = pd.Series(fallback_prices[symbol], index=calendar, dtype=float)
+                continue
+            closes = fx_service.convert_history(history['Close'], fx_service.holding_currency(symbol, currencies.get(symbol))).dropna()
+            closes.index = _days(closes.index)
+            closes = closes[~closes.index.duplicated(keep='last')]
+            columns[symbol] = closes.reindex(closes.index.union(calendar)).ffill().reindex(calendar)
+        closes = pd.DataFrame(columns, index=calendar)
+        return closes.fillna(pd.Series(fallback_prices, dtype=float))
+
+    def update(self, portfolio_id, portfolio_df):
+        """Append the days since the last snapshot; returns the number of rows written
+
+        The latest stored day is always recomputed, since it may have been
+        taken intraday or before a holding changed. Positions count from
+        the day they were added.
+        """
+        if not portfolio_id:
+            return 0
+        with self._lock:
+            with closing(self._connect()) as connection:
+                latest = self._latest_rows(connection, portfolio_id)
+
+            benchmark_history = self.cache.get_history(self.benchmark)
+            if benchmark_history.empty:
+                logger.warning("Benchmark calendar unavailable, snapshots not updated")
+                return 0
+            calendar = _days(benchmark_history.index)
+
+            holdings = portfolio_df.assign(quantity=pd.to_numeric(portfolio_df['quantity'], errors='coerce'),
+                                           price=pd.to_numeric(portfolio_df['price'], errors='coerce'))
+            holdings = holdings.groupby('symbol').agg(
+                quantity=('quantity', 'sum'), price=('price', 'last'), date_added=('date_added', 'min'))
+            if latest:
+                # Rewrite the newest row on top of the one before it
+                base = latest[1] if len(latest) > 1 else None
+                start = latest[0][0]
+            else:
+                base = None
+                if holdings.empty:
+                    return 0
+                start = pd.to_datetime(holdings['date_added'], errors='coerce').min()
+                start = calendar[-1] if pd.isna(start) else start.strftime('%Y-%m-%d')
+            days = calendar[calendar >= start]
+            if days.empty:
+                return 0
+
+            previous_holdings = json.loads(base[3]) if base is not None else {}
+            universe = sorted(set(holdings.index) | set(previous_holdings))
+            fallback = {s: float(holdings['price'].get(s, 0.0)) for s in universe}
+            currencies = {}
+            if 'quote_currency' in portfolio_df.columns:
+                currencies = portfolio_df.groupby('symbol')['quote_currency'].last().to_dict()
+            with metrics.timer('analytics_compute_seconds', engine='value_snapshots'):
+                closes = self._closes(universe, days, fallback, currencies).to_numpy(dtype=float)
+
+                # Quantity held on each day: a position counts from the day it was added
+                added = pd.to_datetime(holdings['date_added'], errors='coerce').dt.strftime('%Y-%m-%d')
+                added = added.reindex(universe).fillna('').to_numpy(dtype=str)
+                quantities = holdings['quantity'].reindex(universe).fillna(0).to_numpy(dtype=float)
+                held = np.asarray(days, dtype=str)[:, None] >= added[None, :]
+                quantity = np.where(held, quantities, 0.0)
+                opening = np.array([previous_holdings.get(s, 0.0) for s in universe], dtype=float)
+                prior = np.vstack([opening, quantity[:-1]])
+
+                values = (quantity * closes).sum(axis=1)
+                flows = ((quantity - prior) * closes).sum(axis=1)
+                prior_values = np.concatenate([[base[1] if base is not None else 0.0], values[:-1]])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    growth = np.where(prior_values > 0, (values - flows) / prior_values, 1.0)
+                unit_values = (base[2] if base is not None else 1.0) * np.cumprod(growth)
+
+            rows = []
+            for i, day in enumerate(days):
+                day_holdings = {s: float(q) for s, q in zip(universe, quantity[i]) if q}
+                rows.append((portfolio_id, day, float(values[i]), float(flows[i]), float(unit_values[i]),
+                             json.dumps(day_holdings, sort_keys=True)))
+            try:
+                with closing(self._connect()) as connection, connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO portfolio_snapshots "
+                        "(portfolio_id, date, value, flow, unit_value, holdings) VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist snapshots for {portfolio_id}: {e}")
+                return 0
+            return len(rows)
+
+    def refresh(self, portfolio_id, portfolio_df):
+        """update() only when a trading day is missing or the holdings changed since the newest row
+
+        Reads are then a single-row SELECT; the write (and the store lock)
+        happens at most once per trading day unless a trade is made.
+        """
+        if not portfolio_id:
+            return 0
+        try:
+            with closing(self._connect()) as connection:
+                latest = self._latest_rows(connection, portfolio_id)[:1]
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot lookup failed for {portfolio_id}: {e}")
+            return 0
+        benchmark_history = self.cache.get_history(self.benchmark)
+        if latest and not benchmark_history.empty and latest[0][0] >= _days(benchmark_history.index)[-1]:
+            quantities = pd.to_numeric(portfolio_df['quantity'], errors='coerce').fillna(0).groupby(portfolio_df['symbol']).sum()
+            current = {s: round(float(q), 6) for s, q in quantities.items() if q}
+            stored = {s: round(q, 6) for s, q in json.loads(latest[0][3]).items()}
+            if current == stored:
+                return 0
+        return self.update(portfolio_id, portfolio_df)
+
+    def get_series(self, portfolio_id):
+        """Stored daily values and time-weighted return since the first snapshot"""
+        empty = {'index': [], 'values': [], 'flows': [], 'twr': []}
+        if not portfolio_id:
+            return empty
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(
+                    "SELECT date, value, flow, unit_value FROM portfolio_snapshots "
+                    "WHERE portfolio_id = ? ORDER BY date",
+                    (portfolio_id,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot lookup failed for {portfolio_id}: {e}")
+            return empty
+        if not rows:
+            return empty
+        first_unit_value = rows[0][3]
+        return {
+            'index': [r[0] for r in rows],
+            'values': [r[1] for r in rows],
+            'flows': [r[2] for r in rows],
+            'twr': [(r[3] / first_unit_value - 1) * 100 for r in rows],
+        }
+
+    def time_weighted_return(self, portfolio_id, since=None):
+        """Time-weighted return in percent from `since` (default: the first snapshot) to the latest"""
+        if not portfolio_id:
+            return 0.0
+        try:
+            with closing(self._connect()) as connection:
+                first = connection.execute(
+                    "SELECT unit_value FROM portfolio_snapshots WHERE portfolio_id = ? AND date >= ? "
+                    "ORDER BY date LIMIT 1",
+                    (portfolio_id, since or '')
+                ).fetchone()
+                last = connection.execute(
+                    "SELECT unit_value FROM portfolio_snapshots WHERE portfolio_id = ? ORDER BY date DESC LIMIT 1",
+                    (portfolio_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot lookup failed for {portfolio_id}: {e}")
+            return 0.0
+        if first is None or last is None or not first[0]:
+            return 0.0
+        return float((last[0] / first[0] - 1) * 100)
+
+    def run(self, session_dir=None):
+        """Append the latest day for every stored portfolio (the daily job)"""
+        from .batch_analytics import BatchAnalytics
+
+        analytics = BatchAnalytics(session_dir) if session_dir else BatchAnalytics()
+        written = 0
+        portfolios = 0
+        for data in analytics.load_sessions().values():
+            portfolio_id = data.get('portfolio_id')
+            if not portfolio_id or not data.get('portfolio'):
+                continue
+            try:
+                written += self.update(portfolio_id, pd.DataFrame(data['portfolio']))
+                portfolios += 1
+            except Exception as e:
+                logger.error(f"Snapshot update failed for {portfolio_id}: {e}")
+        logger.info(f"Wrote {written} snapshot rows for {portfolios} portfolios")
+        return written
+
+# Create global instance
+snapshot_store = PortfolioSnapshotStore()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    snapshot_store.run(*sys.argv[1:])
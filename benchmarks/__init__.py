@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the analytics hot paths.
+
+Run with ``python -m benchmarks.run``; see benchmarks/run.py for options.
+All market data comes from deterministic synthetic fixtures, so runs are
+offline and comparable across commits.
+"""
@@ -0,0 +1,129 @@
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BENCHMARK_SYMBOL = '^NSEI'
+
+def symbol_universe(n_holdings):
+    """Deterministic list of synthetic NSE-style symbols"""
+    return [f"SYN{i:04d}.NS" for i in range(n_holdings)]
+
+def synthetic_history(symbol, years):
+    """Deterministic daily OHLCV random walk for a symbol
+
+    Roughly one symbol in five is 'listed' part-way through the range so the
+    imputation paths get exercised the way real portfolios do.
+    """
+    return _synthetic_history(symbol, years).copy()
+
+@lru_cache(maxsize=None)
+def _synthetic_history(symbol, years):
+    end = pd.Timestamp(datetime(2026, 1, 1))
+    index = pd.bdate_range(end=end, periods=int(252 * years))
+    seed = zlib.crc32(symbol.encode())
+    rng = np.random.default_rng(seed)
+
+    returns = rng.normal(0.0004, 0.015, len(index))
+    close = 100 * np.exp(np.cumsum(returns))
+    df = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.002, len(index))),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(10_000, 1_000_000, len(index)).astype(float),
+    }, index=index)
+
+    listed_fraction = 0.6 if seed % 5 == 0 and symbol != BENCHMARK_SYMBOL else 0.0
+    start = int(len(df) * listed_fraction)
+    return df.iloc[start:]
+
+class SyntheticTicker:
+    """Stand-in for yfinance.Ticker backed by synthetic histories"""
+
+    def __init__(self, symbol, years):
+        self.symbol = symbol
+        self.years = years
+
+    def history(self, period=None, interval=None, start=None, end=None):
+        df = synthetic_history(self.symbol, self.years)
+        if period == '1d':
+            return df.iloc[-1:]
+        if period in ('2d', '5d'):
+            return df.iloc[-int(period[0]):]
+        return df
+
+    @property
+    def info(self):
+        return {'currency': 'INR', 'longName': self.symbol, 'exchange': 'NSI'}
+
+class SyntheticMarket:
+    """Module-like replacement for yfinance exposing Ticker and download"""
+
+    def __init__(self, years):
+        self.years = years
+
+    def Ticker(self, symbol):
+        return SyntheticTicker(symbol, self.years)
+
+    def download(self, tickers, **kwargs):
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        closes = {t: synthetic_history(t, self.years)['Close'] for t in tickers}
+        return pd.concat({'Close': pd.DataFrame(closes)}, axis=1)
+
+# Every upstream call goes through app.utils.market_data
+MARKET_DATA_MODULES = (
+    'app.utils.market_data',
+)
+
+@contextmanager
+def synthetic_market(years):
+    """Point every module-level ``yf`` in the app at synthetic data
+
+    Cached histories and close panels belong to the market they were
+    fetched from, so each synthetic market starts with empty caches.
+    """
+    import importlib
+    import tempfile
+    from app.utils.close_panel import SharedClosePanel
+    from app.utils.price_cache import price_cache
+    market = SyntheticMarket(years)
+    originals = {}
+    for name in MARKET_DATA_MODULES:
+        module = importlib.import_module(name)
+        originals[name] = module.yf
+        module.yf = market
+    shared_panel = price_cache.shared_panel
+    price_cache.invalidate()
+    try:
+        with tempfile.TemporaryDirectory() as panel_dir:
+            price_cache.shared_panel = SharedClosePanel(panel_dir, dtype=shared_panel.dtype)
+            yield market
+    finally:
+        price_cache.shared_panel = shared_panel
+        price_cache.invalidate()
+        for name, original in originals.items():
+            importlib.import_module(name).yf = original
+
+def synthetic_portfolio(n_holdings):
+    """Portfolio records in the PortfolioDataStore/session layout"""
+    rng = np.random.default_rng(n_holdings)
+    rows = []
+    for symbol in symbol_universe(n_holdings):
+        quantity = int(rng.integers(1, 500))
+        price = float(rng.uniform(50, 5000))
+        rows.append({
+            'symbol': symbol,
+            'quantity': quantity,
+            'price': price,
+            'value': quantity * price,
+            'day_return': float(rng.normal(0, 1)),
+            'year_return': float(rng.normal(10, 20)),
+            'name': symbol,
+            'currency': 'INR',
+            'date_added': datetime(2025, 1, 1).isoformat(),
+        })
+    return rows
@@ -0,0 +1,222 @@
+"""
+Load test for the stock API and portfolio page against stub market data.
+
+Starts the stub market-data server and one app worker (werkzeug, threaded)
+pointed at it, then drives /api/stock/<symbol>, /api/portfolio and
+/portfolio from many concurrent sessions. Each session builds its own
+portfolio first, the way a user would, then issues a weighted mix of
+requests until the duration runs out. Reports throughput, error rate and
+latency percentiles per endpoint.
+
+Pass --target to drive an already running deployment instead (start it
+with MARKET_DATA_URL set to the stub server's URL).
+
+Usage:
+    python -m benchmarks.loadtest --sessions 50 --duration 60
+    python -m benchmarks.loadtest --latency-ms 150 --failure-rate 0.02
+    python -m benchmarks.loadtest --target http://127.0.0.1:5200 --sessions 200
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import requests
+from .fixtures import symbol_universe
+from .stub_server import StubMarketDataServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weight of each request in the steady-state mix
+REQUEST_MIX = (
+    ('/api/stock/<symbol>', 3),
+    ('/api/portfolio', 5),
+    ('/portfolio', 2),
+)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def serve_app(port):
+    """Run one threaded app worker (the child process of start_app)"""
+    import logging
+    import runpy
+    from werkzeug.serving import make_server
+    sys.path.insert(0, REPO_ROOT)
+    # The per-request access log would dominate the worker's output
+    logging.getLogger('werkzeug').setLevel(os.environ.get('LOG_LEVEL', 'WARNING').upper())
+    app = runpy.run_path(os.path.join(REPO_ROOT, 'app.py'), run_name='loadtest')['app']
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+def start_app(market_data_url, log_level):
+    """Spawn an app worker in a scratch directory and wait until it answers"""
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix='loadtest_app_')
+    env = dict(os.environ, MARKET_DATA_URL=market_data_url, LOG_LEVEL=log_level)
+    process = subprocess.Popen(
+        [sys.executable, '-c', f"from benchmarks.loadtest import serve_app; serve_app({port})"],
+        cwd=workdir, env=dict(env, PYTHONPATH=REPO_ROOT))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App worker exited with code {process.returncode}")
+        try:
+            requests.get(url + '/about', timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('App worker did not start within 60s')
+
+class LoadTest:
+    def __init__(self, target, sessions=20, duration=30.0, holdings=10, universe=200,
+                 ramp_up=5.0, think_ms=0.0, timeout=60.0, seed=0):
+        self.target = target.rstrip('/')
+        self.sessions = sessions
+        self.duration = duration
+        self.holdings = holdings
+        self.symbols = symbol_universe(universe)
+        self.ramp_up = ramp_up
+        self.think_ms = think_ms
+        self.timeout = timeout
+        self.seed = seed
+        self.samples = []  # (endpoint, started_at, seconds, ok, phase)
+        self._lock = threading.Lock()
+
+    def _request(self, http, endpoint, path, phase, payload=None):
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            if payload is None:
+                response = http.get(self.target + path, timeout=self.timeout)
+            else:
+                response = http.post(self.target + path, json=payload, timeout=self.timeout)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples.append((endpoint, started_at, elapsed, ok, phase))
+
+    def _session(self, index, start_at, stop_at):
+        rng = random.Random(self.seed * 100003 + index)
+        time.sleep(max(start_at - time.time(), 0))
+        endpoints, weights = zip(*REQUEST_MIX)
+        with requests.Session() as http:
+            # Build this session's portfolio
+            for symbol in rng.sample(self.symbols, self.holdings):
+                self._request(http, '/api/portfolio/<symbol>/buy', f"/api/portfolio/{symbol}/buy", 'setup',
+                              {'quantity': rng.randint(1, 100)})
+
+            while time.time() < stop_at:
+                endpoint = rng.choices(endpoints, weights)[0]
+                path = endpoint.replace('<symbol>', rng.choice(self.symbols))
+                self._request(http, endpoint, path, 'steady')
+                if self.think_ms:
+                    time.sleep(rng.expovariate(1000 / self.think_ms))
+
+    def run(self):
+        begin = time.time()
+        stop_at = begin + self.ramp_up + self.duration
+        threads = [
+            threading.Thread(target=self._session, daemon=True,
+                             args=(i, begin + self.ramp_up * i / max(self.sessions, 1), stop_at))
+            for i in range(self.sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.time() - begin)
+
+    def report(self, wall_seconds):
+        """Throughput and latency percentiles per endpoint for the steady phase"""
+        steady = [s for s in self.samples if s[4] == 'steady']
+        groups = {endpoint: [s for s in steady if s[0] == endpoint] for endpoint, _ in REQUEST_MIX}
+        groups['all (steady)'] = steady
+        groups['portfolio setup'] = [s for s in self.samples if s[4] == 'setup']
+
+        rows = {}
+        for name, samples in groups.items():
+            if not samples:
+                continue
+            # Throughput over the span the group's requests were actually in flight
+            span = max(s[1] + s[2] for s in samples) - min(s[1] for s in samples)
+            latencies = np.array([s[2] for s in samples]) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            rows[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for s in samples if not s[3]),
+                'throughput_rps': len(samples) / max(span, 1e-9),
+                'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+                'max_ms': float(latencies.max()),
+            }
+        return {'sessions': self.sessions, 'duration_seconds': self.duration,
+                'wall_seconds': wall_seconds, 'endpoints': rows}
+
+def print_report(report):
+    print(f"\n{report['sessions']} sessions, {report['duration_seconds']:.0f}s steady state "
+          f"({report['wall_seconds']:.1f}s wall)")
+    print(f"{'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in report['endpoints'].items():
+        print(f"{name:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the app against stub market data')
+    parser.add_argument('--target', help='base URL of a running deployment (default: spawn one worker)')
+    parser.add_argument('--sessions', type=int, default=20, help='concurrent user sessions')
+    parser.add_argument('--duration', type=float, default=30.0, help='steady-state seconds after ramp-up')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds over which sessions start')
+    parser.add_argument('--holdings', type=int, default=10, help='stocks added per session portfolio')
+    parser.add_argument('--universe', type=int, default=200, help='number of distinct symbols')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between a session\'s requests')
+    parser.add_argument('--years', type=int, default=5, help='stub history length per symbol')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='stub latency per upstream request')
+    parser.add_argument('--jitter-ms', type=float, default=20.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of upstream requests that fail')
+    parser.add_argument('--stub-port', type=int, default=0, help='port for the stub server (default: any free port)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-level', default='WARNING', help='log level of the spawned app worker')
+    parser.add_argument('--json', dest='json_path', help='also write the report to this file')
+    args = parser.parse_args()
+
+    stub = StubMarketDataServer(port=args.stub_port, years=args.years, latency_ms=args.latency_ms,
+                                jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+                                seed=args.seed).start()
+    print(f"Stub market data server on {stub.url}")
+    process = None
+    try:
+        target = args.target
+        if not target:
+            process, target = start_app(stub.url, args.log_level)
+            print(f"App worker on {target}")
+
+        test = LoadTest(target, args.sessions, args.duration, args.holdings, args.universe,
+                        args.ramp_up, args.think_ms, seed=args.seed)
+        report = test.run()
+        report['upstream_requests'] = stub.requests_served
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        stub.stop()
+
+    print_report(report)
+    print(f"Upstream requests served by stub: {report['upstream_requests']}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
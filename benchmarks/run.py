@@ -0,0 +1,214 @@
+"""
+Benchmark runner with per-commit result tracking.
+
+Every case runs against synthetic market data at 10/100/1000 holdings and
+1/5/20 years of history (where those dimensions apply). Results are saved
+to benchmarks/results/<commit>.json and compared with the previous run so
+regressions show up as a ratio per case.
+
+Usage:
+    python -m benchmarks.run                          # full grid
+    python -m benchmarks.run -k macd --years 1 5      # subset
+    python -m benchmarks.run --compare results/abc123.json --fail-on-regression
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from .fixtures import (BENCHMARK_SYMBOL, symbol_universe, synthetic_history,
+                       synthetic_market, synthetic_portfolio)
+
+HOLDINGS = (10, 100, 1000)
+YEARS = (1, 5, 20)
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = []
+
+def benchmark(name, **grid):
+    """Register a case; the function gets the grid params and returns the callable to time"""
+    def register(setup):
+        BENCHMARKS.append((name, grid, setup))
+        return setup
+    return register
+
+@benchmark('get_portfolio_returns', holdings=HOLDINGS, years=YEARS)
+def bench_get_portfolio_returns(holdings, years):
+    from app.utils.performance_analytics import PerformanceAnalytics
+    portfolio_df = pd.DataFrame(synthetic_portfolio(holdings))
+    return lambda: PerformanceAnalytics().get_portfolio_returns(portfolio_df)
+
+@benchmark('ProxyModel.impute', years=YEARS)
+def bench_proxy_impute(years):
+    from app.utils.proxy_model import ProxyModel
+    # Pick a symbol that lists part-way through the range so imputation runs
+    symbol = next(s for s in symbol_universe(100) if len(synthetic_history(s, years)) < 252 * years)
+    stock = synthetic_history(symbol, years)['Close']
+    nifty = synthetic_history(BENCHMARK_SYMBOL, years)['Close']
+    model = ProxyModel()
+    return lambda: model.impute(symbol, stock, nifty)
+
+@benchmark('_calculate_performance_metrics', years=YEARS)
+def bench_performance_metrics(years):
+    from app.utils.performance_analytics import PerformanceAnalytics
+    values = list(synthetic_history(symbol_universe(1)[0], years)['Close'] * 1000)
+    benchmark_values = list(synthetic_history(BENCHMARK_SYMBOL, years)['Close'] * 1000)
+    perf = PerformanceAnalytics()
+    return lambda: perf._calculate_performance_metrics(values, benchmark_values)
+
+@benchmark('generate_macd_signal', years=YEARS)
+def bench_generate_macd_signal(years):
+    from strategies.technicals import technicals
+    strategy = technicals.__new__(technicals)  # skip the download in __init__
+    strategy.df = pd.DataFrame({'Close': synthetic_history(symbol_universe(1)[0], years)['Close']})
+    strategy.df['ret'] = strategy.df['Close'].pct_change()
+    strategy.data = strategy.df.copy(deep=True)
+    return lambda: strategy.generate_macd_signal()
+
+@benchmark('levPortfolio.calculate_characteristics', years=YEARS)
+def bench_lev_portfolio(years):
+    from main import generate_sample_data
+    from portfolio.levPortfolio import levPortfolio
+    np.random.seed(years)
+    port = levPortfolio(generate_sample_data(n_samples=252 * years), 0.04)
+    return lambda: port.calculate_characteristics(100, 50)
+
+@benchmark('PortfolioDataStore.add_stock', holdings=HOLDINGS)
+def bench_add_stock(holdings):
+    from flask import Flask
+    from app.utils.data_store import PortfolioDataStore
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    stocks = [dict(row, dayReturn=row['day_return'], yearReturn=row['year_return'])
+              for row in synthetic_portfolio(holdings)]
+
+    def run():
+        with app.test_request_context():
+            store = PortfolioDataStore()
+            for stock in stocks:
+                store.add_stock(stock)
+    return run
+
+@benchmark('/portfolio render', holdings=HOLDINGS, years=YEARS)
+def bench_portfolio_render(holdings, years):
+    import runpy
+    # Sessions are filesystem-backed under the cwd, keep them out of the repo
+    os.chdir(tempfile.mkdtemp(prefix='bench_session_'))
+    app = runpy.run_path(os.path.join(REPO_ROOT, 'app.py'), run_name='benchmark')['app']
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['portfolio'] = synthetic_portfolio(holdings)
+
+    def run():
+        response = client.get('/portfolio')
+        assert response.status_code == 200
+    return run
+
+def time_case(func, max_runs=50, budget_seconds=2.0):
+    """Time a callable: at least one run, repeating while within the time budget"""
+    durations = []
+    deadline = time.perf_counter() + budget_seconds
+    while len(durations) < max_runs and (not durations or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {'median': statistics.median(durations), 'min': min(durations), 'runs': len(durations)}
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def case_id(name, params):
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]" if params else name
+
+def run_benchmarks(keyword=None, holdings=None, years=None):
+    results = {}
+    cwd = os.getcwd()
+    filters = {'holdings': holdings, 'years': years}
+    for name, grid, setup in BENCHMARKS:
+        if keyword and keyword.lower() not in name.lower():
+            continue
+        axes = {k: [v for v in values if not filters.get(k) or v in filters[k]] for k, values in grid.items()}
+        for combo in itertools.product(*axes.values()):
+            params = dict(zip(axes.keys(), combo))
+            with synthetic_market(params.get('years', 5)):
+                try:
+                    timing = time_case(setup(**params))
+                finally:
+                    os.chdir(cwd)
+            results[case_id(name, params)] = timing
+            print(f"{case_id(name, params):<60} {timing['median'] * 1000:>12.3f} ms  ({timing['runs']} runs)")
+    return results
+
+def latest_results(exclude_commit):
+    paths = [p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json'))
+             if os.path.basename(p) != f"{exclude_commit}.json"]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def compare(results, baseline_path, threshold):
+    """Print per-case ratios against a baseline; return the regressed case ids"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline.get('commit', baseline_path)} (regression threshold {threshold:.0%})")
+    regressions = []
+    for case, timing in results.items():
+        previous = baseline['results'].get(case)
+        if previous is None:
+            continue
+        ratio = timing['median'] / previous['median'] if previous['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(case)
+        print(f"{case:<60} {ratio:>8.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark analytics hot paths on synthetic portfolios')
+    parser.add_argument('-k', dest='keyword', help='only run cases whose name contains this text')
+    parser.add_argument('--holdings', nargs='+', type=int, help='subset of holdings sizes')
+    parser.add_argument('--years', nargs='+', type=int, help='subset of history lengths')
+    parser.add_argument('--compare', help="baseline results file (default: most recent other run)")
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    # Keep per-call diagnostics from the code under test out of the timings
+    logging.basicConfig(level=logging.ERROR)
+    # A shared close panel left by an earlier run would turn every case into a cache hit, and the
+    # synthetic trades, snapshots and signals must not land in the stores next to the app
+    scratch = tempfile.mkdtemp(prefix='bench_')
+    os.environ.setdefault('PRICE_PANEL_DIR', os.path.join(scratch, 'price_panel'))
+    os.environ.setdefault('SYMBOL_METADATA_DB', os.path.join(scratch, 'symbols.db'))
+    os.environ.setdefault('LEDGER_DB', os.path.join(scratch, 'ledger.db'))
+    os.environ.setdefault('PORTFOLIO_SNAPSHOT_DB', os.path.join(scratch, 'portfolio_snapshots.db'))
+    os.environ.setdefault('SCREENER_DB', os.path.join(scratch, 'screener.db'))
+    sys.path.insert(0, REPO_ROOT)
+    commit = current_commit()
+    results = run_benchmarks(args.keyword, args.holdings, args.years)
+
+    baseline = args.compare or latest_results(commit)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{commit}.json"), 'w') as f:
+        json.dump({'commit': commit, 'timestamp': time.time(), 'python': sys.version.split()[0],
+                   'results': results}, f, indent=2)
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Local stand-in for the Yahoo Finance endpoints yfinance talks to.
+
+Serves the cookie, crumb, chart and quoteSummary endpoints from the same
+synthetic histories the benchmarks use, with configurable latency and
+failure injection. Start the app with MARKET_DATA_URL pointing here to
+keep load tests off the real market-data provider.
+
+Usage:
+    python -m benchmarks.stub_server --port 8765 --latency-ms 80 --failure-rate 0.01
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+from .fixtures import synthetic_history
+
+CHART_PATH = re.compile(r'^/v8/finance/chart/([^/]+)$')
+QUOTE_SUMMARY_PATH = re.compile(r'^/v10/finance/quoteSummary/([^/]+)$')
+TIMESERIES_PATH = re.compile(r'^/ws/fundamentals-timeseries/v1/finance/timeseries/([^/]+)$')
+logger = logging.getLogger(__name__)
+
+RANGE_DAYS = {'1d': 1, '2d': 2, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126,
+              '1y': 252, '2y': 504, '5y': 1260, '10y': 2520}
+
+class StubMarketDataServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering yfinance requests from synthetic data"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, years=5, latency_ms=0.0, jitter_ms=0.0,
+                 failure_rate=0.0, seed=None):
+        super().__init__((host, port), StubRequestHandler)
+        self.years = years
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def sample_delay(self):
+        with self._lock:
+            self.requests_served += 1
+            delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.random.random() < self.failure_rate
+        return max(delay, 0.0) / 1000, failed
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        delay, failed = self.server.sample_delay()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return self._send_json(500, {'finance': {'result': None, 'error': {'code': 'stub', 'description': 'Injected failure'}}})
+
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        match = CHART_PATH.match(parts.path)
+        if match:
+            return self._send_json(200, self._chart(unquote(match.group(1)), params))
+        match = QUOTE_SUMMARY_PATH.match(parts.path)
+        if match:
+            return self._send_json(200, self._quote_summary(unquote(match.group(1))))
+        if parts.path == '/v7/finance/quote':
+            symbols = [s for s in params.get('symbols', '').split(',') if s]
+            return self._send_json(200, {'quoteResponse': {'result': [self._quote(s) for s in symbols], 'error': None}})
+        if TIMESERIES_PATH.match(parts.path):
+            # Fundamentals requested alongside info; the app never reads them
+            return self._send_json(200, {'timeseries': {'result': [], 'error': None}})
+        if parts.path == '/v1/test/getcrumb':
+            return self._send(200, b'stubcrumb', 'text/plain')
+        if parts.path in ('/', '/consent'):
+            # Cookie fetch (basic and consent strategies); only a Set-Cookie is needed
+            return self._send(200, b'', 'text/html', extra_headers={'Set-Cookie': 'A3=stub; Path=/'})
+        logger.warning(f"Stub has no handler for {parts.path}")
+        return self._send_json(404, {'finance': {'result': None, 'error': {'code': 'Not Found'}}})
+
+    def _history(self, symbol, params):
+        df = synthetic_history(symbol, self.server.years)
+        if 'period1' in params:
+            start = pd.Timestamp(int(float(params['period1'])), unit='s')
+            end = pd.Timestamp(int(float(params.get('period2', time.time()))), unit='s')
+            return df[(df.index >= start) & (df.index < end)]
+        days = RANGE_DAYS.get(params.get('range'))
+        return df.iloc[-days:] if days else df
+
+    def _chart(self, symbol, params):
+        df = self._history(symbol, params)
+        last = float(df['Close'].iloc[-1]) if len(df) else 0.0
+        timestamps = ((df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist()
+        return {'chart': {'result': [{
+            'meta': {
+                'currency': 'INR', 'symbol': symbol, 'exchangeName': 'NSI',
+                'instrumentType': 'INDEX' if symbol.startswith('^') else 'EQUITY',
+                'regularMarketPrice': last, 'chartPreviousClose': last,
+                'exchangeTimezoneName': 'Asia/Kolkata', 'timezone': 'IST', 'gmtoffset': 19800,
+                'priceHint': 2, 'dataGranularity': params.get('interval', '1d'),
+                'range': params.get('range', ''), 'validRanges': list(RANGE_DAYS) + ['ytd', 'max'],
+                'firstTradeDate': timestamps[0] if timestamps else None,
+            },
+            'timestamp': timestamps,
+            'indicators': {
+                'quote': [{col.lower(): df[col].round(4).tolist()
+                           for col in ('Open', 'High', 'Low', 'Close', 'Volume')}],
+                'adjclose': [{'adjclose': df['Close'].round(4).tolist()}],
+            },
+        }], 'error': None}}
+
+    def _quote_summary(self, symbol):
+        df = synthetic_history(symbol, self.server.years)
+        last = float(df['Close'].iloc[-1])
+        return {'quoteSummary': {'result': [{
+            'price': {'symbol': symbol, 'currency': 'INR', 'longName': f"{symbol} Synthetic Ltd",
+                      'shortName': symbol, 'exchange': 'NSI',
+                      'regularMarketPrice': {'raw': last, 'fmt': f"{last:.2f}"}},
+            'quoteType': {'symbol': symbol, 'quoteType': 'EQUITY', 'exchange': 'NSI',
+                          'longName': f"{symbol} Synthetic Ltd"},
+            'summaryDetail': {'currency': 'INR', 'previousClose': {'raw': float(df['Close'].iloc[-2])}},
+        }], 'error': None}}
+
+    def _quote(self, symbol):
+        close = synthetic_history(symbol, self.server.years)['Close']
+        return {'symbol': symbol, 'currency': 'INR', 'longName': f"{symbol} Synthetic Ltd",
+                'regularMarketPrice': float(close.iloc[-1]),
+                'regularMarketPreviousClose': float(close.iloc[-2])}
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, body, content_type, extra_headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Yahoo Finance server backed by synthetic data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--years', type=int, default=5, help='history length per symbol')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='uniform +/- jitter on the latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = StubMarketDataServer(args.host, args.port, args.years, args.latency_ms,
+                                  args.jitter_ms, args.failure_rate, args.seed)
+    print(f"Stub market data server on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Event-driven paper-trading replay for the Trading interface.
+
+Historical bars are fed one at a time through Trading.calculate_return and
+Trading.execute_trade, exactly as live operation would call them, with
+slippage and commission charged on every rebalance. Bars come from an
+on-disk price cache so replays (and parallel workers) never re-download.
+
+Usage:
+    python simulator.py RELIANCE.NS TCS.NS --thresholds 0.5 0.7 0.9
+"""
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from trading import Trading, macd_hist
+
+PRICE_DATA_DIR = os.path.join(os.getcwd(), 'price_data')
+
+def load_bars(ticker, cache_dir=PRICE_DATA_DIR, refresh=False):
+    """Load daily closes for a ticker from the offline cache, downloading once"""
+    path = os.path.join(cache_dir, f"{ticker.replace('^', '_')}.pkl")
+    if not refresh and os.path.exists(path):
+        return pd.read_pickle(path)
+
+    import yfinance as yf  # workers reading the offline cache never pay for this import
+    closes = yf.download(ticker, progress=False)['Close']
+    if isinstance(closes, pd.DataFrame):
+        closes = closes.iloc[:, 0]
+    bars = pd.DataFrame({'Close': closes.dropna()})
+    os.makedirs(cache_dir, exist_ok=True)
+    bars.to_pickle(path)
+    return bars
+
+class SlippageModel:
+    """Price impact charged as basis points of traded notional"""
+    def __init__(self, bps=5.0):
+        self.bps = bps
+
+    def cost(self, notional):
+        return abs(notional) * self.bps / 10000
+
+class CommissionModel:
+    """Broker commission: fixed fee per trade plus basis points of notional"""
+    def __init__(self, per_trade=20.0, bps=3.0):
+        self.per_trade = per_trade
+        self.bps = bps
+
+    def cost(self, notional):
+        if notional == 0:
+            return 0.0
+        return self.per_trade + abs(notional) * self.bps / 10000
+
+class ReplayStrategy:
+    """technicals-compatible strategy whose 'today' is a movable replay cursor
+
+    The percent-rank MACD series is causal, so it is computed once for the
+    whole history and generate_macd_signal just reads the cursor's value.
+    """
+
+    def __init__(self, bars, window=60):
+        self.df = bars
+        self.cursor = len(bars) - 1
+        val = macd_hist(bars[['Close']])['Close'].to_numpy(dtype=float)
+        self.pct_rank = np.full(len(bars), np.nan)
+        if len(val) >= window:
+            windows = np.lib.stride_tricks.sliding_window_view(val, window)
+            self.pct_rank[window - 1:] = ((windows < windows[:, -1:]).sum(axis=1) / (window - 1) - 0.5) * 2
+
+    def generate_macd_signal(self, threshold=0.7, window=60):
+        return self.pct_rank[self.cursor]
+
+class ReplaySimulator:
+    def __init__(self, bars, threshold=0.7, initial_cash=100000.0,
+                 slippage=None, commission=None, gate_threshold=True):
+        self.bars = bars
+        self.threshold = threshold
+        self.initial_cash = initial_cash
+        self.slippage = slippage if slippage is not None else SlippageModel()
+        self.commission = commission if commission is not None else CommissionModel()
+        # Trading passes the threshold through without acting on it; gating here
+        # makes a threshold change observable in the replay
+        self.gate_threshold = gate_threshold
+
+    def run(self):
+        """Replay every bar through Trading and return (ledger, summary)"""
+        strategy = ReplayStrategy(self.bars)
+        dates = self.bars.index
+        n = len(dates)
+        current = pd.DataFrame({'Date': [dates[0]], 'Equity': [0.0], 'Cash': [self.initial_cash],
+                                'Total': [self.initial_cash]})
+        trader = Trading(strategy, None, current, self.threshold)
+
+        bar_returns = self.bars['Close'].pct_change().fillna(0).to_numpy(dtype=float)
+        equity = np.zeros(n)
+        cash = np.zeros(n)
+        costs = np.zeros(n)
+        cash[0] = self.initial_cash
+        n_trades = 0
+
+        for t in range(1, n):
+            trader.calculate_return(bar_returns[t])
+            strategy.cursor = t
+
+            before = trader.equity
+            signal = strategy.generate_macd_signal(self.threshold)
+            if not np.isnan(signal) and (not self.gate_threshold or abs(signal) > self.threshold):
+                trader.execute_trade('MACD')
+                traded = trader.equity - before
+                costs[t] = self.slippage.cost(traded) + self.commission.cost(traded)
+                trader.cash -= costs[t]
+                n_trades += traded != 0
+
+            equity[t] = trader.equity
+            cash[t] = trader.cash
+
+        total = equity + cash
+        ledger = pd.DataFrame({'Date': dates, 'Equity': equity, 'Cash': cash, 'Total': total, 'Costs': costs})
+        running_max = np.maximum.accumulate(total)
+        summary = {
+            'threshold': self.threshold,
+            'total_return': float((total[-1] / total[0] - 1) * 100),
+            'max_drawdown': float(((total - running_max) / running_max).min() * 100),
+            'n_trades': int(n_trades),
+            'total_costs': float(costs.sum())
+        }
+        return ledger, summary
+
+def _replay_job(job):
+    """Worker entry point: replay one ticker/threshold combination"""
+    ticker, threshold, cache_dir, options = job
+    bars = load_bars(ticker, cache_dir)
+    _, summary = ReplaySimulator(bars, threshold, **options).run()
+    summary['ticker'] = ticker
+    return summary
+
+def run_many(tickers, thresholds, cache_dir=PRICE_DATA_DIR, processes=None, **options):
+    """Replay every ticker x threshold combination across worker processes"""
+    # Populate the offline cache once so workers only read from disk
+    for ticker in tickers:
+        load_bars(ticker, cache_dir)
+
+    jobs = [(ticker, threshold, cache_dir, options) for ticker in tickers for threshold in thresholds]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return pd.DataFrame(list(pool.map(_replay_job, jobs)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the MACD strategy over history')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--thresholds', nargs='+', type=float, default=[0.7])
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--slippage-bps', type=float, default=5.0)
+    parser.add_argument('--commission', type=float, default=20.0)
+    args = parser.parse_args()
+
+    results = run_many(args.tickers, args.thresholds, processes=args.processes,
+                       slippage=SlippageModel(args.slippage_bps),
+                       commission=CommissionModel(args.commission))
+    print(results.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,24 @@ Functions:
     gaussian_prior: Creates a Gaussian prior distribution for MCMC sampling
 """
 
-from .utils import EmceeMCMC, gaussian_prior
+import importlib
 
 __version__ = "0.1.0"
 __author__ = "Dipyaman"
 
-__all__ = ['EmceeMCMC', 'gaussian_prior']
\ No newline at end of file
+__all__ = ['EmceeMCMC', 'gaussian_prior']
+
+# Submodules pull in yfinance, emcee and friends, so they are only imported
+# when one of their names is first used
+_lazy_attributes = {
+    'EmceeMCMC': 'utils',
+    'gaussian_prior': 'utils',
+    'momentum': 'momentum_value',
+    'value': 'momentum_value',
+}
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(f".{_lazy_attributes[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
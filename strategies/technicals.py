@@ -1,10 +1,7 @@
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import yfinance as yf
 import numpy as np
-import mplfinance as mpf
-import ta
 import datetime
 
 def percent_rank(window):
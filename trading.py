@@ -3,10 +3,14 @@ import numpy as np
 import datetime
 class Trading:
     def __init__(self,strategy,ticker,current_portfolio,threshold):
-        self.strat = strategy(ticker)
+        # Accept a ready strategy instance so callers can reuse its downloaded data
+        self.strat = strategy(ticker) if isinstance(strategy,type) else strategy
         self.current = current_portfolio
         self.threshold = threshold
         self.stock = self.strat.df
+        self.equity = self.current['Equity'].iloc[-1]
+        self.cash = self.current['Cash'].iloc[-1]
+        self.value = self.equity+self.cash
 
     def generate_signal(self,indicator):
         if indicator == 'MACD':
@@ -23,10 +27,110 @@ class Trading:
 
         return equity,cash
 
-    def calculate_return(self):
-        self.equity = self.current['Equity'].iloc[-1]*(1+self.stock['Close'].pct_change().iloc[-1])
-        self.value = self.equity+self.current['Cash'].iloc[-1]
-        
-    def update_portfolio(self):
-        self.current = pd.concat([self.current,pd.DataFrame({'Date':[datetime.datetime.today().date()],'Equity':[self.equity],'Cash':[self.cash],'Total':[self.value]}) ]) 
-        self.current.drop_duplicates(inplace=True)
\ No newline at end of file
+    def calculate_return(self,bar_return=None):
+        # Replays pass the bar's return directly instead of re-deriving it from the frame
+        if bar_return is None:
+            bar_return = self.stock['Close'].pct_change().iloc[-1]
+        self.equity = self.equity*(1+bar_return)
+        self.value = self.equity+self.cash
+
+    def update_portfolio(self,date=None):
+        today = date if date is not None else datetime.datetime.today().date()
+        row = {'Date':today,'Equity':self.equity,'Cash':self.cash,'Total':self.value}
+        # Only the latest row can clash, so avoid de-duplicating the whole history
+        if 'Date' in self.current.columns and len(self.current) and self.current['Date'].iloc[-1] == today:
+            self.current.iloc[-1, [self.current.columns.get_loc(c) for c in row]] = list(row.values())
+        else:
+            self.current = pd.concat([self.current,pd.DataFrame({k:[v] for k,v in row.items()})],ignore_index=True)
+
+
+def macd_hist(closes,fast=26,slow=12,length=9):
+    """MACD histogram (MACD - Signal) for every column, as in technicals.calculate_macd"""
+    macd = closes.ewm(span=slow).mean()-closes.ewm(span=fast).mean()
+    return macd-macd.ewm(span=length).mean()
+
+
+class TradingEngine:
+    """Run the MACD strategy over a universe of tickers with an array-backed ledger
+
+    Capital is split into equal sleeves, one per ticker. Each day the engine
+    marks every sleeve to market, evaluates the percent-rank MACD signal of
+    generate_macd_signal for all tickers at once and rebalances sleeves whose
+    signal clears the threshold. Equity/cash history lives in preallocated
+    arrays and trades go to an append-only log, so a run is linear in days.
+    """
+
+    def __init__(self,closes,initial_cash=100000.0,threshold=0.7,window=60):
+        self.closes = closes.sort_index().ffill()
+        self.dates = self.closes.index
+        self.tickers = list(self.closes.columns)
+        self.threshold = threshold
+        self.window = window
+
+        prices = self.closes.to_numpy(dtype=float)
+        self.returns = np.nan_to_num(np.vstack([np.zeros(len(self.tickers)),prices[1:]/prices[:-1]-1]))
+        self.macd_val = macd_hist(self.closes).to_numpy(dtype=float)
+
+        n_days,n_tickers = prices.shape
+        self.equity = np.zeros((n_days,n_tickers))
+        self.cash = np.zeros((n_days,n_tickers))
+        self.cash[0] = initial_cash/n_tickers
+        self.signal = np.full((n_days,n_tickers),np.nan)
+        self.trade_log = []
+        self.position = 0
+
+    @classmethod
+    def from_tickers(cls,tickers,**kwargs):
+        """Build an engine from one batched download of all tickers"""
+        import yfinance as yf  # only needed when fetching, keeps replays and imports light
+        closes = yf.download(list(tickers),progress=False)['Close']
+        if isinstance(closes,pd.Series):
+            closes = closes.to_frame(tickers[0])
+        return cls(closes,**kwargs)
+
+    def generate_signals(self,t):
+        """Percent-rank MACD signal in [-1, 1] for every ticker on day t"""
+        if t+1 < self.window:
+            return np.full(len(self.tickers),np.nan)
+        window = self.macd_val[t-self.window+1:t+1]
+        rank = (window < window[-1]).sum(axis=0)/(self.window-1)
+        rank = np.where(np.isnan(window).any(axis=0),np.nan,rank)
+        return (rank-0.5)*2
+
+    def step(self,t):
+        """Mark to market on day t, then rebalance on today's signals"""
+        if t > 0:
+            self.equity[t] = self.equity[t-1]*(1+self.returns[t])
+            self.cash[t] = self.cash[t-1]
+        value = self.equity[t]+self.cash[t]
+
+        signal = self.generate_signals(t)
+        self.signal[t] = signal
+        trade = np.abs(np.nan_to_num(signal)) > self.threshold
+        if trade.any():
+            target = signal*value
+            for i in np.flatnonzero(trade):
+                delta = target[i]-self.equity[t,i]
+                if delta != 0:
+                    self.trade_log.append((self.dates[t],self.tickers[i],float(signal[i]),float(delta)))
+            self.equity[t] = np.where(trade,target,self.equity[t])
+            self.cash[t] = value-self.equity[t]
+        self.position = t+1
+
+    def run(self,until=None):
+        """Advance the engine through history (or up to day index `until`)"""
+        stop = len(self.dates) if until is None else min(until,len(self.dates))
+        for t in range(self.position,stop):
+            self.step(t)
+        return self.ledger()
+
+    def ledger(self):
+        """Portfolio-level Equity/Cash/Total history in the Trading.current layout"""
+        n = self.position
+        equity = self.equity[:n].sum(axis=1)
+        cash = self.cash[:n].sum(axis=1)
+        return pd.DataFrame({'Date':self.dates[:n],'Equity':equity,'Cash':cash,'Total':equity+cash})
+
+    def trades(self):
+        """Append-only trade log as a DataFrame"""
+        return pd.DataFrame(self.trade_log,columns=['Date','Ticker','Signal','Amount'])